@@ -0,0 +1,112 @@
+"""NormDatabase单次调用延迟基准测试
+
+对比旧实现(每次调用都 sqlite3.connect/close)与长连接实现的单次调用耗时。
+
+用法:
+    python benchmarks/bench_database.py --norms 40000 --calls 2000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database import NormDatabase
+
+class LegacyNormDatabase:
+    """旧版实现: 每个方法都新建并关闭一次连接"""
+    def __init__(self, db_path):
+        self.db_path = db_path
+    
+    def get_norms(self, category=None):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        if category:
+            c.execute("SELECT id, name, path, last_page, rotation FROM norms "
+                      "WHERE category_id=(SELECT id FROM categories WHERE name=?)", (category,))
+        else:
+            c.execute("SELECT id, name, path, last_page, rotation FROM norms")
+        norms = [dict(zip(['id', 'name', 'path', 'last_page', 'rotation'], row)) for row in c.fetchall()]
+        conn.close()
+        return norms
+    
+    def update_norm_progress(self, norm_id, page, rotation):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("UPDATE norms SET last_page=?, rotation=? WHERE id=?", (page, rotation, norm_id))
+        conn.commit()
+        conn.close()
+    
+    def get_categories(self):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("SELECT name FROM categories")
+        categories = [row[0] for row in c.fetchall()]
+        conn.close()
+        return categories
+    
+    def close(self):
+        pass
+
+def populate(db_path, norm_count):
+    """生成带有norm_count条规范的测试库"""
+    db = NormDatabase(db_path)
+    with db.conn:
+        db.conn.executemany("INSERT INTO categories (name) VALUES (?)",
+                            ((f"分类{i}",) for i in range(20)))
+        db.conn.executemany(
+            "INSERT INTO norms (name, path, category_id) VALUES (?, ?, ?)",
+            ((f"GB {50000 + i}-2010 规范{i}.pdf", f"user_files/norm_{i}.pdf", i % 20 + 1)
+             for i in range(norm_count)))
+    db.close()
+
+def measure(func, calls):
+    """返回每次调用耗时(微秒)的列表"""
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+def run(norm_count, calls):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'norms.db')
+        populate(db_path, norm_count)
+        
+        for label, factory in (("legacy", LegacyNormDatabase), ("persistent", NormDatabase)):
+            db = factory(db_path)
+            cases = {
+                "update_norm_progress": lambda i: db.update_norm_progress(i % norm_count + 1, i % 500 + 1, 0),
+                "get_categories": lambda i: db.get_categories(),
+                "get_norms(category)": lambda i: db.get_norms(f"分类{i % 20}"),
+            }
+            for name, func in cases.items():
+                # 全表查询较慢, 调用次数缩减以控制总耗时
+                n = calls if name != "get_norms(category)" else max(calls // 20, 10)
+                samples = measure(func, n)
+                results.setdefault(name, {})[label] = (statistics.median(samples),
+                                                       statistics.quantiles(samples, n=100)[94])
+            db.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="NormDatabase单次调用延迟基准")
+    parser.add_argument("--norms", type=int, default=40000, help="测试库中的规范数量")
+    parser.add_argument("--calls", type=int, default=2000, help="每个操作的调用次数")
+    args = parser.parse_args()
+    
+    results = run(args.norms, args.calls)
+    print(f"{'操作':<24}{'旧实现 p50/p95 (us)':>24}{'长连接 p50/p95 (us)':>24}{'加速比':>10}")
+    for name, row in results.items():
+        legacy, persistent = row["legacy"], row["persistent"]
+        print(f"{name:<24}{legacy[0]:>12.1f}/{legacy[1]:<11.1f}"
+              f"{persistent[0]:>12.1f}/{persistent[1]:<11.1f}{legacy[0] / persistent[0]:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
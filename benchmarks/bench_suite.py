@@ -0,0 +1,413 @@
+"""无界面基准测试套件
+
+生成合成语料(PDF文件 + 指定行数的规范库), 测量数据库操作和批量写入吞吐量、文件导入吞吐量、名称和全文检索、
+打开文档以及翻页渲染的耗时和拖动滚动的合帧情况, 结果写入JSON文件, 可与之前版本的结果对比。
+默认使用offscreen平台, 不需要显示器。
+
+用法:
+    python benchmarks/bench_suite.py --pdfs 1000 --pages 20 --norms 100000 -o results.json
+    python benchmarks/bench_suite.py --corpus /tmp/corpus -o new.json --compare results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import PySide6
+from PySide6.QtCore import QEvent, QEventLoop, QPointF, QTimer, Qt, qVersion
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtWidgets import QApplication
+
+from modules.database import NormDatabase
+from modules.db_executor import DatabaseExecutor
+from modules.content_store import ContentStore
+from modules.file_importer import ImportWorker, IMPORT_BATCH_SIZE, OBJECTS_DIR
+from modules.fulltext_index import FullTextIndexer, build_match_query
+from modules.document_manifest import ManifestBuilder
+from modules.norm_model import FETCH_BATCH_SIZE
+from modules.pdf_viewer import PdfViewer
+from corpus import generate_pdfs, synthetic_norms, CATEGORIES
+
+# 名称检索(子串/拼音首字母)和全文检索使用的查询
+NAME_QUERIES = ["混凝土", "hntjg", "GB 5001", "抗震设计", "不存在的规范"]
+TEXT_QUERIES = ["混凝土", "seismic load", "钢筋 配筋", "foundation", "不存在"]
+
+# 批量写入基准的行数, 以及逐行提交对照组的行数(逐行提交太慢, 只取少量估算吞吐量)
+BULK_ROWS = 20000
+SINGLE_ROWS = 500
+
+# 等待后台渲染或导入完成的超时(秒)
+WAIT_TIMEOUT = 600
+
+# 拖动基准: 模拟1000Hz回报率的鼠标, 拖动持续的时间(毫秒)
+DRAG_EVENT_INTERVAL_MS = 1
+DRAG_DURATION_MS = 1000
+
+def summarize(samples, unit="ms"):
+    """耗时样本的统计: 中位数、p95、平均值、最小值和最大值"""
+    ordered = sorted(samples)
+    return {
+        "unit": unit,
+        "n": len(ordered),
+        "p50": statistics.median(ordered),
+        "p95": ordered[round(0.95 * (len(ordered) - 1))],
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+def single(value, unit):
+    """只有一个测量值的结果(吞吐量、总耗时等)"""
+    return {"unit": unit, "value": value}
+
+def measure(func, calls):
+    """返回每次调用耗时(毫秒)的列表, func的参数为调用序号"""
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def wait_until(app, condition, timeout=WAIT_TIMEOUT):
+    """处理事件直到condition()为真"""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待超时")
+        app.processEvents(QEventLoop.WaitForMoreEvents)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def prepare_corpus(directory, pdf_count, pages):
+    """生成(或复用目录中已有的)合成PDF文件, 返回文件路径和生成耗时(秒)"""
+    marker = os.path.join(directory, "corpus.json")
+    expected = {"pdfs": pdf_count, "pages": pages}
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            existing = json.load(f)
+        if existing["params"] == expected:
+            return existing["files"], 0.0
+    
+    start = time.perf_counter()
+    files = generate_pdfs(directory, pdf_count, pages)
+    elapsed = time.perf_counter() - start
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"params": expected, "files": files}, f, ensure_ascii=False)
+    return files, elapsed
+
+def bench_import(db_executor, files):
+    """文件导入: 与FileImporter.import_files使用同一个ImportWorker, 在当前线程中运行以免弹出结果对话框"""
+    summaries = []
+    worker = ImportWorker(db_executor, files, ContentStore(OBJECTS_DIR))
+    worker.import_finished.connect(summaries.append)
+    total_bytes = sum(os.path.getsize(path) for path in files)
+    
+    start = time.perf_counter()
+    worker.run()
+    elapsed = time.perf_counter() - start
+    return {
+        "import.total": single(elapsed, "s"),
+        "import.files_per_s": single(len(files) / elapsed, "files/s"),
+        "import.mb_per_s": single(total_bytes / elapsed / 1024 / 1024, "MB/s"),
+        "import.imported": single(summaries[0]['imported'], "files"),
+    }
+
+def bench_database(db, first_id, norm_count, calls):
+    """数据库: 批量写入把库填充到norm_count行, 再测量常用查询和写入"""
+    results = {}
+    existing = db.conn.execute("SELECT COUNT(*) FROM norms").fetchone()[0]
+    rows = list(synthetic_norms(first_id, max(0, norm_count - existing)))
+    batches = [rows[i:i + IMPORT_BATCH_SIZE] for i in range(0, len(rows), IMPORT_BATCH_SIZE)]
+    if batches:
+        samples = measure(lambda i: db.add_norms(batches[i]), len(batches))
+        results["db.add_norms.batch"] = summarize(samples)
+        results["db.add_norms.rows_per_s"] = single(len(rows) / (sum(samples) / 1000), "rows/s")
+    
+    max_id = db.conn.execute("SELECT MAX(id) FROM norms").fetchone()[0]
+    rng = random.Random(0)
+    cases = {
+        "db.get_norm_rows.first_batch": lambda i: db.get_norm_rows(None, 0, FETCH_BATCH_SIZE),
+        "db.get_norm_rows.deep_batch": lambda i: db.get_norm_rows(
+            None, rng.randrange(max_id // 2, max_id), FETCH_BATCH_SIZE),
+        "db.get_norm_rows.category_batch": lambda i: db.get_norm_rows(
+            CATEGORIES[i % len(CATEGORIES)], 0, FETCH_BATCH_SIZE),
+        "db.get_norm": lambda i: db.get_norm(rng.randrange(1, max_id + 1)),
+        "db.update_norms_last_page": lambda i: db.update_norms_last_page(
+            [(i % 500 + 1, rng.randrange(1, max_id + 1)) for _ in range(20)]),
+        "db.get_categories": lambda i: db.get_categories(),
+    }
+    for name, func in cases.items():
+        results[name] = summarize(measure(func, calls))
+    # 整个分类的完整列表较慢, 调用次数缩减以控制总耗时
+    results["db.get_norms.category"] = summarize(
+        measure(lambda i: db.get_norms(CATEGORIES[i % len(CATEGORIES)]), max(calls // 20, 5)))
+    return results
+
+def bench_bulk(db, first_id):
+    """批量写入: upsert_norms/assign_category/delete_norms的行吞吐量, 对照逐行提交的add_norm"""
+    results = {}
+    
+    def timed(label, func, count):
+        start = time.perf_counter()
+        outcome = func()
+        elapsed = time.perf_counter() - start
+        results[f"db.{label}.total"] = single(elapsed * 1000, "ms")
+        results[f"db.{label}.rows_per_s"] = single(count / elapsed, "rows/s")
+        return outcome
+    
+    singles = list(synthetic_norms(first_id, SINGLE_ROWS))
+    timed("add_norm.single", lambda: [db.add_norm(*row) for row in singles], len(singles))
+    
+    rows = list(synthetic_norms(first_id + SINGLE_ROWS, BULK_ROWS))
+    timed("upsert_norms.insert", lambda: db.upsert_norms(rows), len(rows))
+    # 同一批路径再写一次, 全部走ON CONFLICT更新
+    renamed = [(name + " (修订)", path, category, digest) for name, path, category, digest in rows]
+    timed("upsert_norms.update", lambda: db.upsert_norms(renamed), len(renamed))
+    
+    ids = [row[0] for row in db.conn.execute(
+        "SELECT id FROM norms ORDER BY id DESC LIMIT ?", (BULK_ROWS + SINGLE_ROWS,))]
+    timed("assign_category", lambda: db.assign_category(ids, CATEGORIES[0]), len(ids))
+    timed("delete_norms", lambda: db.delete_norms(ids), len(ids))
+    return results
+
+def bench_search(app, db, viewer, calls):
+    """名称检索(列表搜索框)和全文检索"""
+    results = {}
+    
+    def search_names(i):
+        viewer.search_box.setText(NAME_QUERIES[i % len(NAME_QUERIES)])
+        viewer.search_norms()
+        wait_until(app, lambda: not viewer.is_busy())
+    
+    # 第一次检索需要读出全部名称建立索引, 单独统计
+    viewer.search_box.blockSignals(True)
+    results["search.name.cold"] = summarize(measure(search_names, 1))
+    results["search.name"] = summarize(measure(search_names, calls))
+    viewer.search_box.clear()
+    viewer.search_norms()
+    wait_until(app, lambda: not viewer.is_busy())
+    viewer.search_box.blockSignals(False)
+    
+    indexer = FullTextIndexer(db)
+    pages_before = db.conn.execute("SELECT COALESCE(SUM(pages_done), 0) FROM text_index_state").fetchone()[0]
+    start = time.perf_counter()
+    indexer.process()
+    elapsed = time.perf_counter() - start
+    pages = db.conn.execute("SELECT COALESCE(SUM(pages_done), 0) FROM text_index_state").fetchone()[0] - pages_before
+    results["index.total"] = single(elapsed, "s")
+    if pages:
+        results["index.pages_per_s"] = single(pages / elapsed, "pages/s")
+    
+    results["search.fulltext"] = summarize(measure(
+        lambda i: db.search_page_text(build_match_query(TEXT_QUERIES[i % len(TEXT_QUERIES)])), calls))
+    return results
+
+def bench_manifest(db):
+    """生成文档清单(页数、页面尺寸、书签), 打开文档时据此先布局"""
+    results = {}
+    builder = ManifestBuilder(db)
+    start = time.perf_counter()
+    builder.process()
+    elapsed = time.perf_counter() - start
+    documents = db.conn.execute("SELECT COUNT(*) FROM document_manifest").fetchone()[0]
+    results["manifest.total"] = single(elapsed, "s")
+    if documents:
+        results["manifest.docs_per_s"] = single(documents / elapsed, "docs/s")
+    return results
+
+def bench_viewer(app, viewer, pdf_count, pages, calls):
+    """打开文档和翻页: 计时到当前页渲染完成为止"""
+    results = {}
+    view = viewer.pdf_view
+    
+    def until_rendered():
+        view.viewport().repaint()
+        wait_until(app, view.isPageRendered)
+    
+    def open_row(row):
+        viewer.load_norm(viewer.norm_model.index(row))
+        wait_until(app, lambda: not viewer.is_busy())
+        until_rendered()
+    
+    # 规范列表按id排列, 前pdf_count行是导入的真实文件
+    rows = min(pdf_count, FETCH_BATCH_SIZE, viewer.norm_model.rowCount())
+    opened = min(rows, calls)
+    results["viewer.load_norm.cold"] = summarize(measure(open_row, opened))
+    # 最近打开的文档仍在文档池中
+    recent = list(range(max(0, opened - viewer.document_pool.max_documents + 1), opened))
+    if len(recent) > 1:
+        results["viewer.load_norm.pooled"] = summarize(
+            measure(lambda i: open_row(recent[i % len(recent)]), calls))
+    
+    open_row(0)
+    viewer.go_to_page(1)
+    viewer.page_spin.setValue(1)
+    until_rendered()
+    
+    def next_page(i):
+        if viewer.page_spin.value() >= pages:
+            viewer.page_spin.setValue(1)
+        else:
+            viewer.next_page()
+        until_rendered()
+    results["viewer.next_page"] = summarize(measure(next_page, calls))
+    
+    rng = random.Random(0)
+    
+    def jump(i):
+        viewer.page_spin.setValue(rng.randrange(1, pages + 1))
+        until_rendered()
+    results["viewer.jump_page"] = summarize(measure(jump, calls))
+    
+    def zoom(i):
+        viewer.zoom_in() if i % 2 == 0 else viewer.zoom_out()
+        until_rendered()
+    results["viewer.zoom"] = summarize(measure(zoom, calls))
+    results.update(bench_drag(app, view))
+    return results
+
+def bench_drag(app, view):
+    """高回报率鼠标拖动: 移动事件应合并为每帧至多一次滚动"""
+    viewport = view.viewport()
+    center = QPointF(viewport.width() / 2, viewport.height() / 2)
+    
+    def send(event_type, pos, buttons):
+        button = Qt.NoButton if event_type == QEvent.MouseMove else Qt.LeftButton
+        QApplication.sendEvent(viewport, QMouseEvent(event_type, pos, viewport.mapToGlobal(pos),
+                                                     button, buttons, Qt.NoModifier))
+    
+    view.drag_events = view.drag_frames = 0
+    send(QEvent.MouseButtonPress, center, Qt.LeftButton)
+    start = time.perf_counter()
+    step = 0
+    while (time.perf_counter() - start) * 1000 < DRAG_DURATION_MS:
+        step += 1
+        send(QEvent.MouseMove, center + QPointF(0, -(step % 200)), Qt.LeftButton)
+        app.processEvents()
+        time.sleep(DRAG_EVENT_INTERVAL_MS / 1000)
+    send(QEvent.MouseButtonRelease, center, Qt.NoButton)
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    # 释放时会立即应用剩余的位移, 多算一帧
+    vsync_ticks = int(elapsed / view._drag_timer.interval()) + 1
+    if view.drag_frames > vsync_ticks:
+        print(f"警告: 拖动滚动{view.drag_frames}次, 超过同期的刷新次数{vsync_ticks}", file=sys.stderr)
+    return {
+        "viewer.drag.events": single(view.drag_events, "events"),
+        "viewer.drag.frames": single(view.drag_frames, "frames"),
+        "viewer.drag.vsync_ticks": single(vsync_ticks, "frames"),
+    }
+
+def run(args):
+    app = QApplication.instance() or QApplication([])
+    # 让WaitForMoreEvents定期返回, 检查不依赖事件的等待条件
+    heartbeat = QTimer()
+    heartbeat.start(10)
+    
+    workdir = tempfile.mkdtemp(prefix="normviewer-bench-")
+    corpus_dir = args.corpus or os.path.join(workdir, "corpus")
+    files, generate_time = prepare_corpus(os.path.abspath(corpus_dir), args.pdfs, args.pages)
+    os.chdir(workdir)
+    os.makedirs("user_files", exist_ok=True)
+    
+    results = {}
+    if generate_time:
+        results["corpus.generate"] = single(generate_time, "s")
+    db = NormDatabase(os.path.join("user_files", "norms.db"))
+    db_executor = DatabaseExecutor(db)
+    db_executor.start()
+    results.update(bench_import(db_executor, files))
+    results.update(bench_bulk(db, max(len(files), args.norms) + 1))
+    results.update(bench_database(db, len(files), args.norms, args.calls))
+    
+    viewer = PdfViewer(db_executor)
+    viewer.resize(1200, 900)
+    viewer.show()
+    wait_until(app, lambda: viewer.norm_model.rowCount() > 0)
+    results.update(bench_search(app, db, viewer, args.calls))
+    results.update(bench_manifest(db))
+    results.update(bench_viewer(app, viewer, len(files), args.pages, args.calls))
+    
+    viewer.thumbnail_bar.shutdown()
+    viewer.document_loader.stop()
+    viewer.progress_journal.flush()
+    viewer.document_pool.clear()
+    viewer.close()
+    db_executor.stop()
+    db.close()
+    heartbeat.stop()
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def print_results(results, baseline=None):
+    """打印结果表, 有基准结果时附加p50(或单值)的变化比例"""
+    for name, result in results.items():
+        if "p50" in result:
+            text = f"p50 {result['p50']:10.2f}  p95 {result['p95']:10.2f} {result['unit']}"
+            value, key = result["p50"], "p50"
+        else:
+            text = f"{result['value']:14.2f} {result['unit']}"
+            value, key = result["value"], "value"
+        old = (baseline or {}).get(name, {}).get(key)
+        if old:
+            text += f"   {(value - old) / old * 100:+7.1f}%"
+        print(f"{name:<36}{text}")
+
+def main():
+    parser = argparse.ArgumentParser(description="NormViewer无界面基准测试套件")
+    parser.add_argument("--pdfs", type=int, default=1000, help="生成并导入的PDF文件数")
+    parser.add_argument("--pages", type=int, default=20, help="每个PDF的页数")
+    parser.add_argument("--norms", type=int, default=100000, help="规范库的总行数(不足部分用合成记录填充)")
+    parser.add_argument("--calls", type=int, default=200, help="每项延迟测试的调用次数")
+    parser.add_argument("--corpus", help="合成PDF的存放目录, 参数相同时复用已生成的文件")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="结果JSON文件")
+    parser.add_argument("--compare", help="与之前的结果JSON对比")
+    args = parser.parse_args()
+    
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    
+    results = run(args)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "pyside": PySide6.__version__,
+            "qt": qVersion(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {"pdfs": args.pdfs, "pages": args.pages, "norms": args.norms, "calls": args.calls},
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_results(results, baseline)
+    print(f"结果已写入 {output}")
+
+if __name__ == "__main__":
+    main()
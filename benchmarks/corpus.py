@@ -0,0 +1,72 @@
+"""合成测试语料: 生成带文字和线条的PDF文件, 以及指定行数的规范数据库
+
+需要先创建QGuiApplication(或QApplication), QPdfWriter绘制文字依赖字体系统。
+"""
+import os
+import random
+from PySide6.QtCore import QMarginsF, QPointF, QRectF
+from PySide6.QtGui import QPdfWriter, QPainter, QPageSize, QPageLayout, QFont
+
+# 规范名称和正文使用的词汇, 名称检索和全文检索的基准查询也从这里选取
+SUBJECTS = [
+    "混凝土结构设计规范", "建筑抗震设计规范", "钢结构设计标准", "建筑地基基础设计规范",
+    "砌体结构设计规范", "建筑结构荷载规范", "给水排水管道工程施工及验收规范",
+    "通风与空调工程施工质量验收规范", "建筑设计防火规范", "城市道路工程设计规范",
+    "公路桥涵设计通用规范", "建筑照明设计标准", "民用建筑热工设计规范", "地下工程防水技术规范",
+]
+WORDS = [
+    "concrete", "steel", "beam", "column", "load", "foundation", "seismic", "reinforcement",
+    "混凝土", "钢筋", "荷载", "抗震", "基础", "梁", "柱", "强度", "配筋", "验收", "施工", "设计值",
+]
+
+CATEGORIES = ["土建", "机械", "电气", "给排水", "暖通", "道路", "桥梁", "消防"]
+
+def norm_name(index):
+    """第index条规范的名称, 如"GB 50010-2010 混凝土结构设计规范.pdf" """
+    subject = SUBJECTS[index % len(SUBJECTS)]
+    return f"GB {50000 + index}-{2000 + index % 24} {subject}.pdf"
+
+def write_pdf(path, pages, seed=0):
+    """生成一个pages页的A4文档: 每页一个标题、若干段文字和一张简单的线条图"""
+    rng = random.Random(seed)
+    writer = QPdfWriter(path)
+    writer.setPageSize(QPageSize(QPageSize.A4))
+    writer.setPageMargins(QMarginsF(15, 15, 15, 15), QPageLayout.Millimeter)
+    writer.setResolution(72)
+    
+    painter = QPainter(writer)
+    painter.setFont(QFont("Sans", 10))
+    width = writer.width()
+    for page in range(pages):
+        if page:
+            writer.newPage()
+        painter.drawText(QPointF(0, 20), f"{SUBJECTS[seed % len(SUBJECTS)]}  第{page + 1}页")
+        y = 50
+        for _ in range(30):
+            line = " ".join(rng.choice(WORDS) for _ in range(12))
+            painter.drawText(QPointF(0, y), line)
+            y += 14
+        # 线条图: 模拟图纸中的网格和构件轮廓
+        top = y + 10
+        for i in range(11):
+            painter.drawLine(QPointF(i * width / 10, top), QPointF(i * width / 10, top + 250))
+            painter.drawLine(QPointF(0, top + i * 25), QPointF(width, top + i * 25))
+        for _ in range(20):
+            painter.drawRect(QRectF(rng.uniform(0, width - 60), rng.uniform(top, top + 200), 60, 40))
+    painter.end()
+
+def generate_pdfs(directory, count, pages=20):
+    """在directory中生成count个文档, 返回文件路径列表"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, norm_name(i))
+        write_pdf(path, pages, seed=i)
+        paths.append(path)
+    return paths
+
+def synthetic_norms(start, count):
+    """不对应实际文件的规范记录(名称, 路径, 分类, 内容哈希), 用于把数据库填充到指定行数"""
+    for i in range(start, start + count):
+        yield (norm_name(i), os.path.join("user_files", "synthetic", f"norm_{i}.pdf"),
+               CATEGORIES[i % len(CATEGORIES)], None)
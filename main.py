@@ -1,19 +1,40 @@
 import sys
 import os
+import time
+
+# 启动计时从导入模块之前开始(--profile-startup)
+STARTUP_TIME = time.perf_counter()
+
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                              QHBoxLayout, QTabWidget, QStatusBar)
-from PySide6.QtCore import Qt, QStandardPaths
+                              QHBoxLayout, QTabWidget, QStatusBar, QMessageBox,
+                              QStackedLayout, QLabel)
+from PySide6.QtCore import Qt, QStandardPaths, QTimer, QByteArray, QPoint
 
 # 导入自定义模块
+# PDF查看、全文索引和OCR依赖QtPdf, 在第一次用到时才导入, 不拖慢窗口显示
 from modules.database import NormDatabase
+from modules.db_executor import DatabaseExecutor, BACKGROUND
 from modules.file_importer import FileImporter
-from modules.pdf_viewer import PdfViewer
 from modules.category_manager import CategoryManager
 from modules.settings import SettingsManager
+from modules.startup_profiler import StartupProfiler
+from modules.instrumentation import instrumentation
+from modules.session import SessionStore
+
+# 窗口显示后延迟启动后台全文索引和OCR的时间(毫秒)
+BACKGROUND_SERVICES_DELAY_MS = 2000
+
+# 上次会话截图最长显示时间(毫秒), 超时后即使页面尚未渲染也切换到查看页
+SNAPSHOT_TIMEOUT_MS = 3000
+
+# 检查其他程序实例是否写入过同一个数据库的间隔(毫秒)
+EXTERNAL_CHANGES_INTERVAL_MS = 2000
 
 class NormViewer(QMainWindow):
-    def __init__(self):
+    def __init__(self, profiler=None, diagnostics=False):
         super().__init__()
+        self.profiler = profiler
+        self._after_first_paint = None
         self.setWindowTitle("工程规范管理系统")
         self.resize(1400, 900)
         
@@ -21,8 +42,15 @@ class NormViewer(QMainWindow):
         self.init_directories()
         
         # 初始化模块
-        self.db = NormDatabase(os.path.join('user_files', 'norms.db'))
         self.settings = SettingsManager()
+        # 性能计时: 在设置中开启, 或以--diagnostics启动
+        instrumentation.configure(diagnostics or self.settings.get_bool("diagnostics/enabled"),
+                                  self.settings.get("diagnostics/slow_thresholds_ms"))
+        self.db = NormDatabase(os.path.join('user_files', 'norms.db'))
+        # 界面中的数据库查询由数据库线程执行; 后台服务在各自的线程中直接访问self.db
+        self.db_executor = DatabaseExecutor(self.db, self)
+        self.db_executor.start()
+        self.mark_startup("打开数据库")
         
         # 主界面布局
         self.main_widget = QWidget()
@@ -44,32 +72,344 @@ class NormViewer(QMainWindow):
         os.makedirs('resources', exist_ok=True)
         os.makedirs('user_files', exist_ok=True)
     
+    def mark_startup(self, phase):
+        """启动分析模式下记录一个阶段的耗时"""
+        if self.profiler is not None:
+            self.profiler.mark(phase)
+    
     def setup_modules(self):
-        """设置各个功能模块"""
-        # 文件导入模块
-        self.importer = FileImporter(self.db)
-        self.tabs.addTab(self.importer, "导入规范")
+        """设置各个功能模块, 标签页第一次切换到时才创建"""
+        self.importer = None
+        self.viewer = None
+        self.category_manager = None
+        self.text_indexer = None
+        self.manifest_builder = None
+        self.ocr_service = None
+        self.folder_sync = None
+        self.session = SessionStore(self.settings)
+        self.session_state = self.session.load()
+        self.snapshot_label = None
+        
+        self._tab_builders = {}  # 标签页序号 -> 创建函数
+        self.add_lazy_tab("导入规范", self.build_importer)
+        self.viewer_tab = self.add_lazy_tab("查看规范", self.build_viewer)
+        self.add_lazy_tab("分类管理", self.build_category_manager)
+        if instrumentation.enabled:
+            self.add_lazy_tab("性能诊断", self.build_diagnostics_panel)
+        
+        # 恢复上次的窗口大小和标签页; 停在查看页时先显示上次的截图, 首次绘制后再创建查看页
+        index = self.restore_window_state()
+        self.tabs.currentChanged.connect(self.ensure_tab)
+        if index == self.viewer_tab and self.show_session_snapshot():
+            self._after_first_paint = lambda: self.ensure_tab(index)
+        else:
+            self.ensure_tab(index)
+        
+        # 后台全文索引、OCR和文件夹同步, 窗口显示后再开始
+        self.services_timer = QTimer(self)
+        self.services_timer.setSingleShot(True)
+        self.services_timer.timeout.connect(self.start_background_services)
+        self.services_timer.start(BACKGROUND_SERVICES_DELAY_MS)
+        
+        # 本程序的写入在提交后立即通知; 其他实例的写入靠定时检查PRAGMA data_version发现
+        self.db.changes_lost.connect(self.refresh_norms)
+        self.external_changes_timer = QTimer(self)
+        self.external_changes_timer.timeout.connect(
+            lambda: self.db_executor.submit('check_external_changes', priority=BACKGROUND))
+        self.external_changes_timer.start(EXTERNAL_CHANGES_INTERVAL_MS)
+    
+    def add_lazy_tab(self, title, builder):
+        """添加一个空白标签页, builder()返回的部件在第一次显示该页时放入"""
+        page = QWidget()
+        QStackedLayout(page)
+        index = self.tabs.addTab(page, title)
+        self._tab_builders[index] = builder
+        return index
+    
+    def ensure_tab(self, index):
+        """创建标签页的内容(只执行一次)"""
+        builder = self._tab_builders.pop(index, None)
+        if builder is None:
+            return
+        self.tabs.widget(index).layout().addWidget(builder())
+        if self.snapshot_label is not None:
+            # 会话截图留在新建的内容上方, 页面渲染完成后再撤掉
+            self.snapshot_label.raise_()
+        self.mark_startup(f"创建标签页: {self.tabs.tabText(index)}")
+    
+    def ensure_all_tabs(self):
+        for index in list(self._tab_builders):
+            self.ensure_tab(index)
+    
+    def build_importer(self):
+        """文件导入模块"""
+        self.importer = FileImporter(self.db_executor)
+        self.importer.file_imported.connect(self.on_file_imported)
+        return self.importer
+    
+    def build_viewer(self):
+        """PDF查看模块"""
+        from modules.pdf_viewer import PdfViewer
+        self.viewer = PdfViewer(self.db_executor)
+        self.viewer.ocr_requested.connect(self.start_ocr)
+        self.db.norms_changed.connect(self.viewer.on_norms_changed)
+        if self.ocr_service is not None:
+            self.ocr_service.page_done.connect(self.viewer.on_ocr_page_done)
+        
+        # 惯性滚动开关, 保存在设置中
+        self.viewer.kinetic_btn.setChecked(self.settings.get_bool("view/kinetic_scrolling"))
+        self.viewer.kinetic_btn.toggled.connect(
+            lambda enabled: self.settings.set("view/kinetic_scrolling", enabled))
+        
+        # 重新打开上次会话的文档, 当前页渲染完成后再撤掉截图
+        if self.session_state and self.session_state.get('current'):
+            self.viewer.restore_session(self.session_state)
+        self.session_state = None
+        if self.snapshot_label is not None:
+            self.viewer.pdf_view.renderer.page_ready.connect(self.on_session_page_ready)
+            QTimer.singleShot(SNAPSHOT_TIMEOUT_MS, self.remove_session_snapshot)
+        return self.viewer
+    
+    def build_category_manager(self):
+        """分类管理模块"""
+        self.category_manager = CategoryManager(self.db_executor)
+        self.db.categories_changed.connect(self.category_manager.on_categories_changed)
+        self.db.norms_changed.connect(self.category_manager.norms_model.apply_changes)
+        return self.category_manager
+    
+    def build_diagnostics_panel(self):
+        """性能诊断面板"""
+        from modules.diagnostics_panel import DiagnosticsPanel
+        return DiagnosticsPanel(lambda: self.viewer.render_cache_stats() if self.viewer is not None else None)
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._after_first_paint is not None:
+            # 等这一帧绘制完成后再执行
+            callback, self._after_first_paint = self._after_first_paint, None
+            QTimer.singleShot(0, callback)
+    
+    def restore_window_state(self):
+        """恢复上次的窗口位置大小和当前标签页, 返回标签页序号"""
+        state = self.session_state or {}
+        if state.get('geometry'):
+            self.restoreGeometry(QByteArray.fromBase64(state['geometry'].encode('ascii')))
+        index = state.get('tab', 0)
+        if isinstance(index, int) and 0 <= index < self.tabs.count():
+            self.tabs.setCurrentIndex(index)
+        return self.tabs.currentIndex()
+    
+    def show_session_snapshot(self):
+        """在上次页面显示区域的位置显示退出时的截图, 没有截图时返回False"""
+        state = self.session_state or {}
+        rect = state.get('snapshot_rect')
+        if not state.get('current') or not isinstance(rect, list) or len(rect) != 4:
+            return False
+        snapshot = self.session.snapshot()
+        if snapshot is None:
+            return False
+        # 截图不放入布局, 叠在查看页上方, 查看页在下面照常创建和渲染
+        self.snapshot_label = QLabel(self.tabs.widget(self.viewer_tab))
+        self.snapshot_label.setPixmap(snapshot)
+        self.snapshot_label.setScaledContents(True)
+        self.snapshot_label.setGeometry(*rect)
+        self.snapshot_label.show()
+        return True
+    
+    def on_session_page_ready(self, key):
+        if self.viewer.pdf_view.isPageRendered():
+            self.remove_session_snapshot()
+    
+    def remove_session_snapshot(self):
+        if self.snapshot_label is None:
+            return
+        self.viewer.pdf_view.renderer.page_ready.disconnect(self.on_session_page_ready)
+        self.snapshot_label.deleteLater()
+        self.snapshot_label = None
+    
+    def save_session(self):
+        """保存窗口状态和打开的文档; 停在查看页时一并保存页面显示区域的截图及其位置"""
+        state = {
+            'tab': self.tabs.currentIndex(),
+            'geometry': self.saveGeometry().toBase64().data().decode('ascii'),
+        }
+        snapshot = None
+        if self.viewer is not None:
+            documents = self.viewer.session_state()
+            if documents:
+                state.update(documents)
+                if self.tabs.currentIndex() == self.viewer_tab and self.snapshot_label is None:
+                    viewport = self.viewer.pdf_view.viewport()
+                    snapshot = viewport.grab()
+                    top_left = viewport.mapTo(self.tabs.widget(self.viewer_tab), QPoint(0, 0))
+                    state['snapshot_rect'] = [top_left.x(), top_left.y(), viewport.width(), viewport.height()]
+        elif self.session_state:
+            # 本次没有打开查看页, 保留上次的文档
+            state.update({key: value for key, value in self.session_state.items()
+                          if key in ('current', 'documents', 'scroll')})
+        self.session.save(state, snapshot)
+    
+    def setup_services(self):
+        """创建后台全文索引和OCR服务(只执行一次), 不立即开始处理"""
+        if self.text_indexer is not None:
+            return
+        from modules.fulltext_index import FullTextIndexer
+        from modules.document_manifest import ManifestBuilder
+        from modules.ocr import OcrService
         
-        # PDF查看模块
-        self.viewer = PdfViewer(self.db)
-        self.tabs.addTab(self.viewer, "查看规范")
+        self.text_indexer = FullTextIndexer(self.db, self)
+        self.text_indexer.progress.connect(self.show_index_progress)
+        self.manifest_builder = ManifestBuilder(self.db, self)
         
-        # 分类管理模块
-        self.category_manager = CategoryManager(self.db)
-        self.tabs.addTab(self.category_manager, "分类管理")
+        self.ocr_service = OcrService(self.db, self.settings.get("ocr/engine", "tesseract"), self)
+        self.ocr_service.progress.connect(self.show_ocr_progress)
+        self.ocr_service.norm_queued.connect(self.on_ocr_queued)
+        if self.viewer is not None:
+            self.ocr_service.page_done.connect(self.viewer.on_ocr_page_done)
+    
+    def start_background_services(self):
+        """开始生成文档清单和全文索引, 稍后继续上次退出时未完成的OCR任务; 配置了同步文件夹时开始同步"""
+        self.setup_services()
+        self.manifest_builder.request_update()
+        self.text_indexer.request_update()
+        QTimer.singleShot(1000, self.ocr_service.request_update)
+        self.start_folder_sync()
+    
+    def start_folder_sync(self):
+        """同步设置项sync/folders中的文件夹"""
+        folders = self.settings.get("sync/folders", [])
+        # ini格式下只有一项的列表读出来是字符串
+        if isinstance(folders, str):
+            folders = [folders]
+        if not folders or self.folder_sync is not None:
+            return
+        from modules.folder_sync import FolderSync
         
-        # 连接模块信号
-        self.importer.file_imported.connect(self.viewer.refresh_norms)
-        self.category_manager.category_updated.connect(self.viewer.refresh_norms)
+        self.folder_sync = FolderSync(self.db, folders, self)
+        self.folder_sync.sync_finished.connect(self.on_folders_synced)
+        self.folder_sync.start_watching()
+    
+    def on_folders_synced(self, summary):
+        """文件夹同步有变化时更新文档清单和全文索引(列表由变更通知更新)"""
+        changes = summary['added'] + summary['updated'] + summary['removed']
+        if changes:
+            self.on_file_imported()
+            self.statusBar().showMessage(
+                f"文件夹同步: 新增 {summary['added']}, 更新 {summary['updated']}, "
+                f"删除 {summary['removed']}", 5000)
+    
+    def refresh_norms(self):
+        """变更记录已被清理、无法增量更新时, 重新读取规范和分类列表(标签页尚未创建时无需处理)"""
+        if self.viewer is not None:
+            self.viewer.refresh_norms(self.viewer.norm_model.category())
+        if self.category_manager is not None:
+            self.category_manager.load_categories()
+            category = self.category_manager.norms_model.category()
+            if category is not None:
+                self.category_manager.norms_model.set_category(category)
+    
+    def on_file_imported(self):
+        if self.text_indexer is not None:
+            self.manifest_builder.request_update()
+            self.text_indexer.request_update()
+    
+    def show_index_progress(self, done, total):
+        """在状态栏显示全文索引进度"""
+        if done < total:
+            self.statusBar().showMessage(f"正在建立全文索引: {done}/{total} 个文档")
+        else:
+            self.statusBar().showMessage("全文索引已完成", 5000)
+    
+    def start_ocr(self, norm_id, page):
+        """把规范加入OCR队列"""
+        self.setup_services()
+        if not self.ocr_service.engine_available():
+            QMessageBox.information(self, "OCR", "OCR功能需要安装Tesseract OCR引擎以及pytesseract和pillow")
+            return
+        self.ocr_service.enqueue_norm(norm_id, page)
+    
+    def on_ocr_queued(self, norm_id, queued):
+        if not queued:
+            self.statusBar().showMessage("该规范的页面都已识别", 5000)
+    
+    def show_ocr_progress(self, done, total):
+        """在状态栏显示OCR进度"""
+        if done < total:
+            self.statusBar().showMessage(f"正在OCR识别: {done}/{total} 页")
+        else:
+            self.statusBar().showMessage("OCR识别已完成", 5000)
+    
+    def closeEvent(self, event):
+        """关闭窗口时写入未保存的阅读进度并释放数据库连接"""
+        self.services_timer.stop()
+        self.external_changes_timer.stop()
+        self.save_session()
+        if self.importer is not None:
+            self.importer.shutdown()
+        if self.viewer is not None:
+            self.viewer.thumbnail_bar.shutdown()
+            self.viewer.document_loader.stop()
+            self.viewer.document_pool.clear()
+        if self.folder_sync is not None:
+            self.folder_sync.stop()
+        if self.text_indexer is not None:
+            self.manifest_builder.stop()
+            self.text_indexer.stop()
+            self.ocr_service.stop()
+        if self.viewer is not None:
+            self.viewer.progress_journal.flush()
+        # 执行完已提交的写入后再关闭连接
+        self.db_executor.stop()
+        self.db.close()
+        self.dump_diagnostics()
+        super().closeEvent(event)
+    
+    def dump_diagnostics(self):
+        """设置了diagnostics/dump_path时, 退出前把性能统计写入该JSON文件"""
+        path = self.settings.get("diagnostics/dump_path")
+        if instrumentation.enabled and path:
+            try:
+                instrumentation.dump_json(path)
+            except OSError:
+                pass
+
+def profile_startup(profiler, window):
+    """首次绘制后创建其余标签页, 输出各阶段耗时并退出"""
+    window.ensure_all_tabs()
+    print(profiler.report())
+    QTimer.singleShot(0, window.close)
 
 if __name__ == "__main__":
+    # 全文索引使用多进程, 打包后的程序需要先处理子进程启动参数
+    # (未打包时freeze_support不起作用, 也就不必在启动时导入multiprocessing)
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    
+    # --profile-startup: 输出启动各阶段耗时后退出
+    profiler = None
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        profiler = StartupProfiler(STARTUP_TIME)
+        profiler.mark("导入模块")
+    
+    # --diagnostics: 本次运行开启性能计时和诊断面板
+    diagnostics = "--diagnostics" in sys.argv
+    if diagnostics:
+        sys.argv.remove("--diagnostics")
+    
     app = QApplication(sys.argv)
+    if profiler is not None:
+        profiler.mark("创建QApplication")
     
     # 打包后资源路径处理
     if getattr(sys, 'frozen', False):
         # 如果是打包后的程序
         os.chdir(sys._MEIPASS)
     
-    viewer = NormViewer()
+    viewer = NormViewer(profiler, diagnostics)
     viewer.show()
+    if profiler is not None:
+        profiler.mark("显示窗口")
+        profiler.watch_first_paint(viewer, lambda: profile_startup(profiler, viewer))
     sys.exit(app.exec())
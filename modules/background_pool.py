@@ -0,0 +1,105 @@
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from PySide6.QtCore import QThread
+
+class BackgroundPoolWorker(QThread):
+    """后台任务线程的基类: 由工作进程池执行任务, 本线程负责调度和写库
+    
+    request_update()开始一轮处理(子类实现process()); 运行期间再次请求时, 本轮结束后
+    再处理一轮。请求标记和线程退出的判断在同一把锁下进行, 线程判断退出之后、
+    真正结束之前到达的请求由finished信号的处理函数重新启动线程, 不会丢失。
+    """
+    def __init__(self, workers, parent=None):
+        super().__init__(parent)
+        self.workers = workers
+        self._stop_requested = False
+        self._lock = threading.Lock()
+        self._rerun = False  # 有尚未处理的请求
+        self._active = False  # 已请求且线程尚未决定退出
+        self.finished.connect(self._on_finished)
+    
+    def request_update(self):
+        """开始处理; 正在运行时在本轮结束后再处理一次(如导入了新文件)"""
+        with self._lock:
+            self._rerun = True
+            if self._active:
+                return
+            self._active = True
+            self._stop_requested = False
+        if not self.isRunning():
+            self.start(QThread.LowPriority)
+    
+    def stop(self):
+        """停止处理并等待线程退出, 已写入的结果会保留"""
+        with self._lock:
+            self._stop_requested = True
+        self.wait()
+    
+    def _on_finished(self):
+        # 线程退出前到达的请求没能启动线程, 这里补上
+        with self._lock:
+            restart = self._active and not self._stop_requested
+        if restart and not self.isRunning():
+            self.start(QThread.LowPriority)
+    
+    def run(self):
+        while True:
+            with self._lock:
+                if self._stop_requested or not self._rerun:
+                    self._active = False
+                    return
+                self._rerun = False
+            try:
+                self.process()
+            except BrokenProcessPool:
+                # 工作进程异常退出, 已写入的结果保留, 其余留待下次处理
+                pass
+    
+    def process(self):
+        """(在本线程中执行) 处理一轮, 由子类实现"""
+        raise NotImplementedError
+    
+    @contextmanager
+    def process_pool(self):
+        """spawn方式启动的工作进程池, 退出时取消尚未开始的任务
+        
+        请求停止时不等待正在执行的任务(OCR识别一页可能需要数秒), 直接结束工作进程;
+        这些任务的结果没有写入, 下次启动时重新执行。
+        """
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(self.workers, mp_context=context) as pool:
+            try:
+                yield pool
+            finally:
+                if self._stop_requested:
+                    for process in list((pool._processes or {}).values()):
+                        process.terminate()
+                pool.shutdown(wait=True, cancel_futures=True)
+    
+    def run_tasks(self, pool, tasks, handle_result):
+        """在进程池中执行tasks, 直到全部完成或请求停止
+        
+        tasks为(函数, 参数元组, 上下文)列表, 从末尾取出, 同时在执行的任务不超过工作进程数的两倍;
+        handle_result(上下文, 结果, 异常)在本线程中按完成顺序调用, 其中可以向tasks追加后续任务。
+        工作进程异常退出时抛出BrokenProcessPool。
+        """
+        in_flight = {}
+        while (tasks or in_flight) and not self._stop_requested:
+            while tasks and len(in_flight) < self.workers * 2:
+                function, args, context = tasks.pop()
+                in_flight[pool.submit(function, *args)] = context
+            
+            finished, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in finished:
+                context = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    handle_result(context, None, e)
+                else:
+                    handle_result(context, result, None)
@@ -1,14 +1,17 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                              QLineEdit, QPushButton, QListWidget, 
+                              QLineEdit, QPushButton, QListWidget, QListWidgetItem, QListView,
                               QMessageBox, QInputDialog)
-from PySide6.QtCore import Signal
+from PySide6.QtCore import Qt
+from modules.norm_model import NormListModel
 
 class CategoryManager(QWidget):
-    category_updated = Signal()
+    """分类管理; 数据库读写都提交给数据库线程, 结果在回调中处理
     
-    def __init__(self, db):
+    分类列表只在创建时完整读取一次, 之后按数据库的变更通知(on_categories_changed)增量更新。
+    """
+    def __init__(self, db_executor):
         super().__init__()
-        self.db = db
+        self.db_executor = db_executor
         self.setup_ui()
         self.load_categories()
     
@@ -46,15 +49,59 @@ class CategoryManager(QWidget):
         self.norms_label = QLabel("该分类下的规范:")
         layout.addWidget(self.norms_label)
         
-        self.norms_list = QListWidget()
+        self.norms_model = NormListModel(self.db_executor, self)
+        # 选中分类之前不显示规范, 否则视图会读取全部规范
+        self.norms_model.clear()
+        self.norms_list = QListView()
+        self.norms_list.setUniformItemSizes(True)
+        self.norms_list.setModel(self.norms_model)
         layout.addWidget(self.norms_list)
     
     def load_categories(self):
         """加载所有分类"""
+        self.db_executor.submit('get_category_entries', callback=self.show_categories)
+    
+    def show_categories(self, entries):
+        """entries为(id, 名称), 列表项的UserRole保存分类id"""
         self.category_list.clear()
-        categories = self.db.get_categories()
-        for category in categories:
-            self.category_list.addItem(category)
+        for category_id, name in entries:
+            self.set_category_item(category_id, name)
+    
+    def find_category_item(self, category_id):
+        for row in range(self.category_list.count()):
+            item = self.category_list.item(row)
+            if item.data(Qt.UserRole) == category_id:
+                return item
+        return None
+    
+    def set_category_item(self, category_id, name):
+        """更新分类的列表项, 没有时追加"""
+        item = self.find_category_item(category_id)
+        if item is None:
+            item = QListWidgetItem(name)
+            item.setData(Qt.UserRole, category_id)
+            self.category_list.addItem(item)
+            return
+        if self.norms_model.category() == item.text():
+            self.norms_model.rename_category(name)
+        item.setText(name)
+    
+    def on_categories_changed(self, inserted, updated, deleted):
+        """数据库的变更通知: 删除的分类直接移除, 新增和改名的分类读出名称后更新"""
+        for category_id in deleted:
+            item = self.find_category_item(category_id)
+            if item is None:
+                continue
+            if self.norms_model.category() == item.text():
+                self.norms_model.clear()
+            self.category_list.takeItem(self.category_list.row(item))
+        changed = list(inserted) + list(updated)
+        if changed:
+            self.db_executor.submit('get_category_entries', changed, callback=self._on_category_entries)
+    
+    def _on_category_entries(self, entries):
+        for category_id, name in entries:
+            self.set_category_item(category_id, name)
     
     def add_category(self):
         """添加新分类"""
@@ -63,10 +110,11 @@ class CategoryManager(QWidget):
             QMessageBox.warning(self, "错误", "分类名称不能为空")
             return
         
-        if self.db.add_category(name):
+        self.db_executor.submit('add_category', name, callback=self._on_category_added)
+    
+    def _on_category_added(self, added):
+        if added:
             self.new_category_input.clear()
-            self.load_categories()
-            self.category_updated.emit()
         else:
             QMessageBox.warning(self, "错误", "分类已存在")
     
@@ -80,9 +128,14 @@ class CategoryManager(QWidget):
         new_name, ok = QInputDialog.getText(
             self, "重命名分类", "输入新名称:", text=old_name)
         
-        if ok and new_name:
-            # 这里需要扩展数据库方法来实现重命名
-            QMessageBox.information(self, "提示", "重命名功能需要数据库支持")
+        new_name = new_name.strip()
+        if ok and new_name and new_name != old_name:
+            self.db_executor.submit('rename_category', old_name, new_name,
+                                    callback=self._on_category_renamed)
+    
+    def _on_category_renamed(self, renamed):
+        if not renamed:
+            QMessageBox.warning(self, "错误", "分类已存在")
     
     def delete_category(self):
         """删除分类"""
@@ -97,14 +150,9 @@ class CategoryManager(QWidget):
             QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            # 这里需要扩展数据库方法来实现删除
-            QMessageBox.information(self, "提示", "删除功能需要数据库支持")
+            # 列表由数据库的变更通知更新
+            self.db_executor.submit('delete_category', name)
     
     def show_category_norms(self, item):
         """显示分类下的规范"""
-        category = item.text()
-        norms = self.db.get_norms(category)
-        
-        self.norms_list.clear()
-        for norm in norms:
-            self.norms_list.addItem(norm['name'])
\ No newline at end of file
+        self.norms_model.set_category(item.text())
@@ -0,0 +1,91 @@
+import os
+import shutil
+import hashlib
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl, 无法使用reflink
+    fcntl = None
+
+# 流式哈希每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Linux FICLONE ioctl: 在btrfs/xfs等文件系统上创建写时复制的reflink
+FICLONE = 0x40049409
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """流式计算文件的SHA-256, 内存占用与文件大小无关"""
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+def _reflink(src_path, dest_path):
+    """尝试创建reflink, 文件系统不支持时返回False"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+            fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        shutil.copystat(src_path, dest_path)
+        return True
+    except OSError:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        return False
+
+class ContentStore:
+    """按内容哈希寻址的文件存储, 文件保存为 root/ab/abcdef....pdf
+    
+    相同内容只保存一份; 源文件与存储目录在同一文件系统时优先使用reflink或硬链接,
+    避免完整复制。
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+    
+    def path_for(self, digest, ext='.pdf'):
+        return os.path.join(self.root, digest[:2], digest + ext)
+    
+    def add(self, src_path, digest):
+        """把源文件放入存储, 返回(存储路径, 方式), 方式为existing/reflink/hardlink/copy"""
+        ext = os.path.splitext(src_path)[1].lower() or '.pdf'
+        dest_path = self.path_for(digest, ext)
+        if os.path.exists(dest_path):
+            return dest_path, 'existing'
+        
+        dest_dir = os.path.dirname(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        
+        # 先写到同目录的临时文件再原子改名, 并发导入相同内容时不会产生半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix='.tmp')
+        os.close(fd)
+        os.remove(tmp_path)
+        try:
+            if _reflink(src_path, tmp_path):
+                method = 'reflink'
+            elif os.stat(src_path).st_dev == os.stat(dest_dir).st_dev and self._hardlink(src_path, tmp_path):
+                method = 'hardlink'
+            else:
+                shutil.copy2(src_path, tmp_path)
+                method = 'copy'
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return dest_path, method
+    
+    @staticmethod
+    def _hardlink(src_path, dest_path):
+        try:
+            os.link(src_path, dest_path)
+            return True
+        except OSError:
+            return False
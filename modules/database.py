@@ -1,92 +1,770 @@
+import json
 import os
 import sqlite3
+import threading
+from functools import wraps
 from PySide6.QtCore import QObject, Signal
+from modules.instrumentation import instrument_methods
 
+# 连接级PRAGMA调优: WAL日志 + NORMAL同步在断电时只会丢失最后一次提交,
+# 换来的是每次提交不再强制fsync; 负数cache_size单位为KiB
+CONNECTION_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -20000),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+    ("foreign_keys", "ON"),
+)
+
+# sqlite3模块按SQL文本缓存预编译语句, 这里放宽缓存上限,
+# 所有查询都使用固定的SQL常量以保证命中
+STATEMENT_CACHE_SIZE = 256
+
+# 规范通过category_id关联分类, 接口上仍按分类名称传参, 由子查询换成id
+SQL_CATEGORY_ID = "(SELECT id FROM categories WHERE name=?)"
+SQL_INSERT_NORM = f"INSERT INTO norms (name, path, category_id, content_hash) VALUES (?, ?, {SQL_CATEGORY_ID}, ?)"
+SQL_INSERT_NORM_IF_ABSENT = f"INSERT OR IGNORE INTO norms (name, path, category_id, content_hash) VALUES (?, ?, {SQL_CATEGORY_ID}, ?)"
+# 批量写入: 路径已存在时更新, 未给出的分类/哈希保留原值
+SQL_UPSERT_NORM = f"""INSERT INTO norms (name, path, category_id, content_hash) VALUES (?, ?, {SQL_CATEGORY_ID}, ?)
+                      ON CONFLICT(path) DO UPDATE SET
+                          name=excluded.name,
+                          category_id=COALESCE(excluded.category_id, category_id),
+                          content_hash=COALESCE(excluded.content_hash, content_hash)"""
+SQL_ASSIGN_CATEGORY = f"UPDATE norms SET category_id={SQL_CATEGORY_ID} WHERE id=?"
+# 批量操作判断各行结果时按IN列表查询已有的行, 每次查询的参数个数
+BULK_LOOKUP_CHUNK = 500
+SQL_SELECT_NORM_BY_HASH = "SELECT id FROM norms WHERE content_hash=? LIMIT 1"
+SQL_SELECT_NORMS = "SELECT id, name, path, last_page, rotation FROM norms"
+SQL_SELECT_NORMS_BY_CATEGORY = f"SELECT id, name, path, last_page, rotation FROM norms WHERE category_id={SQL_CATEGORY_ID}"
+SQL_SELECT_NORM_NAMES = "SELECT id, name FROM norms WHERE id > ? ORDER BY id LIMIT ?"
+SQL_SELECT_NORM_NAMES_BY_CATEGORY = f"SELECT id, name FROM norms WHERE category_id={SQL_CATEGORY_ID} AND id > ? ORDER BY id LIMIT ?"
+# 列表行附带文档清单中的页数, 不需要打开文件; 尚未生成清单时为NULL
+SQL_SELECT_NORM_ROWS = """SELECT n.id, n.name, m.page_count FROM norms n
+                          LEFT JOIN document_manifest m ON m.norm_id = n.id
+                          WHERE n.id > ? ORDER BY n.id LIMIT ?"""
+SQL_SELECT_NORM_ROWS_BY_CATEGORY = f"""SELECT n.id, n.name, m.page_count FROM norms n
+                                       LEFT JOIN document_manifest m ON m.norm_id = n.id
+                                       WHERE n.category_id={SQL_CATEGORY_ID} AND n.id > ? ORDER BY n.id LIMIT ?"""
+SQL_UPDATE_PROGRESS = "UPDATE norms SET last_page=?, rotation=? WHERE id=?"
+SQL_UPDATE_LAST_PAGE = "UPDATE norms SET last_page=? WHERE id=?"
+# 页面旋转按页保存; norms.rotation作为没有单独记录的页面的默认旋转(兼容旧数据)
+SQL_SELECT_PAGE_ROTATIONS = "SELECT page, rotation FROM page_rotations WHERE norm_id=?"
+SQL_UPSERT_PAGE_ROTATION = """INSERT INTO page_rotations (norm_id, page, rotation) VALUES (?, ?, ?)
+                              ON CONFLICT(norm_id, page) DO UPDATE SET rotation=excluded.rotation"""
+SQL_INSERT_CATEGORY = "INSERT INTO categories (name) VALUES (?)"
+SQL_ENSURE_CATEGORY = "INSERT OR IGNORE INTO categories (name) VALUES (?)"
+SQL_SELECT_CATEGORIES = "SELECT name FROM categories"
+SQL_RENAME_CATEGORY = "UPDATE categories SET name=? WHERE name=?"
+# 规范的category_id外键为ON DELETE SET NULL, 删除分类时由SQLite借助索引批量解除关联
+SQL_DELETE_CATEGORY = "DELETE FROM categories WHERE name=?"
+SQL_SELECT_NORM = "SELECT id, name, path, last_page, rotation FROM norms WHERE id=?"
+
+# 全文索引: page_text的rowid编码为 norm_id * PAGE_ROWID_STRIDE + 页码,
+# 这样按规范删除/定位页面都是rowid范围操作, 不需要扫描FTS表
+PAGE_ROWID_STRIDE = 100000
+SQL_SELECT_TEXT_INDEX_STATE = """SELECT n.id, n.path, s.file_size, s.file_mtime, s.page_count, s.pages_done
+                                 FROM norms n LEFT JOIN text_index_state s ON s.norm_id = n.id"""
+SQL_DELETE_PAGE_TEXT = "DELETE FROM page_text WHERE rowid BETWEEN ? AND ?"
+SQL_INSERT_PAGE_TEXT = "INSERT OR REPLACE INTO page_text (rowid, text) VALUES (?, ?)"
+SQL_UPSERT_TEXT_INDEX_STATE = """INSERT INTO text_index_state (norm_id, file_size, file_mtime, page_count, pages_done)
+                                 VALUES (?, ?, ?, ?, ?)
+                                 ON CONFLICT(norm_id) DO UPDATE SET
+                                     file_size=excluded.file_size, file_mtime=excluded.file_mtime,
+                                     page_count=excluded.page_count, pages_done=excluded.pages_done"""
+SQL_UPDATE_TEXT_INDEX_DONE = "UPDATE text_index_state SET page_count=?, pages_done=? WHERE norm_id=?"
+# 同时检索PDF自带文本和OCR文本, 同一页两边都命中时只保留相关度较高的一条
+SQL_SEARCH_PAGE_TEXT = f"""SELECT id, name, page, snippet FROM
+                             (SELECT norms.id, norms.name, hits.rowid % {PAGE_ROWID_STRIDE} AS page,
+                                     hits.snippet, MIN(hits.rank) AS best
+                              FROM (SELECT rowid, snippet(page_text, 0, '【', '】', '…', 40) AS snippet, rank
+                                    FROM page_text WHERE page_text MATCH ?1
+                                    UNION ALL
+                                    SELECT rowid, snippet(ocr_page_text, 0, '【', '】', '…', 40), rank
+                                    FROM ocr_page_text WHERE ocr_page_text MATCH ?1) AS hits
+                              JOIN norms ON norms.id = hits.rowid / {PAGE_ROWID_STRIDE}
+                              GROUP BY hits.rowid)
+                           ORDER BY best LIMIT ?2"""
+
+# OCR: 结果按(文件哈希, 页码)保存, 同样内容的文件不会重复识别;
+# 可检索的文本按规范写入ocr_page_text, rowid编码与page_text相同
+SQL_SELECT_NORM_HASH = "SELECT content_hash FROM norms WHERE id=?"
+SQL_UPDATE_NORM_HASH = "UPDATE norms SET content_hash=? WHERE id=?"
+SQL_ENQUEUE_OCR_JOB = """INSERT OR IGNORE INTO ocr_jobs (content_hash, page, norm_id, priority)
+                         SELECT ?1, ?2, ?3, ?4
+                         WHERE NOT EXISTS (SELECT 1 FROM ocr_pages WHERE content_hash=?1 AND page=?2)"""
+SQL_COUNT_OCR_JOBS = "SELECT COUNT(*) FROM ocr_jobs"
+SQL_SELECT_OCR_JOBS = """SELECT j.content_hash, j.page, j.norm_id, n.path
+                         FROM ocr_jobs j JOIN norms n ON n.id = j.norm_id
+                         ORDER BY j.priority DESC, j.seq LIMIT ?"""
+SQL_DELETE_OCR_JOB = "DELETE FROM ocr_jobs WHERE content_hash=? AND page=?"
+SQL_INSERT_OCR_PAGE = "INSERT OR REPLACE INTO ocr_pages (content_hash, page, engine, text) VALUES (?, ?, ?, ?)"
+SQL_INSERT_OCR_PAGE_TEXT = f"""INSERT OR REPLACE INTO ocr_page_text (rowid, text)
+                               SELECT id * {PAGE_ROWID_STRIDE} + ?1, ?2 FROM norms WHERE content_hash=?3"""
+SQL_SELECT_OCR_TEXT = """SELECT o.text FROM ocr_pages o JOIN norms n ON n.content_hash = o.content_hash
+                         WHERE n.id=? AND o.page=?"""
+
+# 文件夹同步: 按路径前缀范围查询(借助path的唯一索引), 文件大小/修改时间未变的文件不再哈希
+SQL_SELECT_FILES_UNDER = "SELECT id, path, content_hash, file_size, file_mtime FROM norms WHERE path > ? AND path < ?"
+SQL_INSERT_SYNCED_NORM = """INSERT OR IGNORE INTO norms (name, path, content_hash, file_size, file_mtime)
+                            VALUES (?, ?, ?, ?, ?)"""
+SQL_UPDATE_SYNCED_NORM = "UPDATE norms SET content_hash=?, file_size=?, file_mtime=? WHERE id=?"
+SQL_DELETE_NORM = "DELETE FROM norms WHERE id=?"
+SQL_DELETE_OCR_PAGE_TEXT = "DELETE FROM ocr_page_text WHERE rowid BETWEEN ? AND ?"
+SQL_DELETE_OCR_JOBS_OF_NORM = "DELETE FROM ocr_jobs WHERE norm_id=?"
+SQL_DELETE_TEXT_INDEX_STATE = "DELETE FROM text_index_state WHERE norm_id=?"
+
+# 变更通知: 触发器把norms/categories的增删改记入change_log(任何连接、任何进程的写入都会记录),
+# 本连接写入后以及PRAGMA data_version显示其他连接有提交时, 读出上次之后的记录发出通知
+SQL_SELECT_CHANGES = "SELECT seq, tbl, row_id, op FROM change_log WHERE seq > ? ORDER BY seq"
+SQL_MAX_CHANGE_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM change_log"
+SQL_PRUNE_CHANGES = "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?"
+# 关闭时保留的变更记录数; 落后更多的其他实例只能整体重新读取
+CHANGE_LOG_KEEP = 10000
+SQL_SELECT_NORM_ENTRIES = '''SELECT n.id, n.name, c.name, m.page_count FROM norms n
+                             LEFT JOIN categories c ON c.id = n.category_id
+                             LEFT JOIN document_manifest m ON m.norm_id = n.id
+                             WHERE n.id IN ({placeholders})'''
+SQL_SELECT_PAGE_COUNTS = "SELECT norm_id, page_count FROM document_manifest WHERE norm_id IN ({placeholders})"
+SQL_SELECT_CATEGORY_ENTRIES = "SELECT id, name FROM categories"
+SQL_SELECT_CATEGORY_ENTRIES_BY_ID = "SELECT id, name FROM categories WHERE id IN ({placeholders})"
+
+# 文档清单: 页数、各页尺寸和书签目录, 打开文档前即可布局; 文件大小/修改时间用于发现过期的清单
+SQL_SELECT_MANIFEST_STATE = """SELECT n.id, n.path, m.file_size, m.file_mtime
+                               FROM norms n LEFT JOIN document_manifest m ON m.norm_id = n.id"""
+SQL_SELECT_MANIFEST = """SELECT file_size, file_mtime, page_count, page_sizes, outline
+                         FROM document_manifest WHERE norm_id=?"""
+SQL_UPSERT_MANIFEST = """INSERT INTO document_manifest (norm_id, file_size, file_mtime, page_count, page_sizes, outline)
+                         SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM norms WHERE id=?1)
+                         ON CONFLICT(norm_id) DO UPDATE SET
+                             file_size=excluded.file_size, file_mtime=excluded.file_mtime,
+                             page_count=excluded.page_count, page_sizes=excluded.page_sizes,
+                             outline=excluded.outline"""
+
+NORM_FIELDS = ['id', 'name', 'path', 'last_page', 'rotation']
+
+def _ensure_column(cursor, table, column, declaration):
+    """表中缺少该列时追加"""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def _migration_base_schema(c):
+    """版本1: 未做版本管理之前的表结构, 旧库中已存在的表和列保持不变"""
+    # 创建规范表
+    c.execute('''CREATE TABLE IF NOT EXISTS norms
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL,
+                  path TEXT NOT NULL UNIQUE,
+                  category TEXT,
+                  last_page INTEGER DEFAULT 1,
+                  rotation INTEGER DEFAULT 0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    # 创建分类表
+    c.execute('''CREATE TABLE IF NOT EXISTS categories
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL UNIQUE)''')
+    
+    # 内容哈希(SHA-256), 用于按内容去重
+    _ensure_column(c, 'norms', 'content_hash', 'TEXT')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_norms_content_hash ON norms(content_hash)")
+    
+    # 全文索引: 每页一行, 文本已按字切分(见fulltext_index.segment_text)
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS page_text
+                 USING fts5(text, tokenize='unicode61')''')
+    
+    # 全文索引进度: 文件大小/修改时间用于发现变更, pages_done用于断点续建
+    c.execute('''CREATE TABLE IF NOT EXISTS text_index_state
+                 (norm_id INTEGER PRIMARY KEY,
+                  file_size INTEGER,
+                  file_mtime REAL,
+                  page_count INTEGER,
+                  pages_done INTEGER DEFAULT 0)''')
+
+def _migration_category_foreign_key(c):
+    """版本2: 分类文本列改为categories表的外键, 并为常用查询建立索引
+    
+    SQLite不能给已有列加外键约束, 按官方推荐的步骤新建表、复制数据后替换。
+    """
+    # 规范中用过但不在分类表里的分类名先补进分类表
+    c.execute('''INSERT OR IGNORE INTO categories (name)
+                 SELECT DISTINCT category FROM norms WHERE LENGTH(category) > 0''')
+    c.execute('''CREATE TABLE norms_new
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT NOT NULL,
+                  path TEXT NOT NULL UNIQUE,
+                  category_id INTEGER REFERENCES categories(id) ON DELETE SET NULL,
+                  last_page INTEGER DEFAULT 1,
+                  rotation INTEGER DEFAULT 0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  content_hash TEXT)''')
+    c.execute('''INSERT INTO norms_new (id, name, path, category_id, last_page, rotation, created_at, content_hash)
+                 SELECT n.id, n.name, n.path, c.id, n.last_page, n.rotation, n.created_at, n.content_hash
+                 FROM norms n LEFT JOIN categories c ON c.name = n.category''')
+    c.execute("DROP TABLE norms")
+    c.execute("ALTER TABLE norms_new RENAME TO norms")
+    
+    # path的UNIQUE约束自带索引; 分类索引同时覆盖按id分页(索引隐含rowid)
+    c.execute("CREATE INDEX idx_norms_content_hash ON norms(content_hash)")
+    c.execute("CREATE INDEX idx_norms_category ON norms(category_id)")
+    c.execute("CREATE INDEX idx_norms_name ON norms(name)")
+
+def _migration_ocr(c):
+    """版本3: OCR结果、持久化的OCR任务队列和OCR文本的全文索引"""
+    c.execute('''CREATE TABLE ocr_pages
+                 (content_hash TEXT NOT NULL,
+                  page INTEGER NOT NULL,
+                  engine TEXT NOT NULL,
+                  text TEXT NOT NULL,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  PRIMARY KEY (content_hash, page)) WITHOUT ROWID''')
+    # seq保持入队顺序; 规范删除时其任务一并删除
+    c.execute('''CREATE TABLE ocr_jobs
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                  content_hash TEXT NOT NULL,
+                  page INTEGER NOT NULL,
+                  norm_id INTEGER NOT NULL REFERENCES norms(id) ON DELETE CASCADE,
+                  priority INTEGER DEFAULT 0,
+                  UNIQUE (content_hash, page))''')
+    c.execute("CREATE INDEX idx_ocr_jobs_order ON ocr_jobs(priority DESC, seq)")
+    c.execute("CREATE INDEX idx_ocr_jobs_norm ON ocr_jobs(norm_id)")
+    c.execute('''CREATE VIRTUAL TABLE ocr_page_text
+                 USING fts5(text, tokenize='unicode61')''')
+
+def _migration_page_rotations(c):
+    """版本4: 按页保存旋转角度, 横向图纸可以单独旋转而不影响其他页面"""
+    c.execute('''CREATE TABLE page_rotations
+                 (norm_id INTEGER NOT NULL REFERENCES norms(id) ON DELETE CASCADE,
+                  page INTEGER NOT NULL,
+                  rotation INTEGER NOT NULL,
+                  PRIMARY KEY (norm_id, page)) WITHOUT ROWID''')
+
+def _migration_file_stat(c):
+    """版本5: 记录规范文件的大小和修改时间, 文件夹同步据此跳过未变化的文件"""
+    _ensure_column(c, 'norms', 'file_size', 'INTEGER')
+    _ensure_column(c, 'norms', 'file_mtime', 'REAL')
+
+def _migration_change_log(c):
+    """版本6: 变更记录表和记录norms/categories增删改的触发器
+    
+    norms只记录影响列表显示的列(名称、路径、分类), 阅读进度等频繁更新的列不记录。
+    """
+    c.execute('''CREATE TABLE change_log
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                  tbl TEXT NOT NULL,
+                  row_id INTEGER NOT NULL,
+                  op TEXT NOT NULL)''')
+    for table, columns in (('norms', 'name, path, category_id'), ('categories', 'name')):
+        c.execute(f'''CREATE TRIGGER {table}_insert_log AFTER INSERT ON {table} BEGIN
+                          INSERT INTO change_log (tbl, row_id, op) VALUES ('{table}', NEW.id, 'I');
+                      END''')
+        c.execute(f'''CREATE TRIGGER {table}_update_log AFTER UPDATE OF {columns} ON {table} BEGIN
+                          INSERT INTO change_log (tbl, row_id, op) VALUES ('{table}', NEW.id, 'U');
+                      END''')
+        c.execute(f'''CREATE TRIGGER {table}_delete_log AFTER DELETE ON {table} BEGIN
+                          INSERT INTO change_log (tbl, row_id, op) VALUES ('{table}', OLD.id, 'D');
+                      END''')
+
+def _migration_document_manifest(c):
+    """版本7: 文档清单, page_sizes为各页尺寸(点)的JSON数组, outline为书签树的JSON"""
+    c.execute('''CREATE TABLE document_manifest
+                 (norm_id INTEGER PRIMARY KEY REFERENCES norms(id) ON DELETE CASCADE,
+                  file_size INTEGER NOT NULL,
+                  file_mtime REAL NOT NULL,
+                  page_count INTEGER NOT NULL,
+                  page_sizes TEXT NOT NULL,
+                  outline TEXT NOT NULL)''')
+
+def _merge_changes(operations):
+    """合并同一行的多次变更, operations为{id: [op, ...]}, 返回(新增, 修改, 删除)的id列表"""
+    inserted, updated, deleted = [], [], []
+    for row_id, ops in operations.items():
+        if ops[0] == 'I':
+            if ops[-1] != 'D':
+                inserted.append(row_id)
+        elif ops[-1] == 'D':
+            deleted.append(row_id)
+        else:
+            updated.append(row_id)
+    return inserted, updated, deleted
+
+def _publishes_changes(method):
+    """写入方法装饰器: 执行后发出规范/分类的变更通知"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._publish_changes()
+    return wrapper
+
+# 按顺序执行的数据库迁移, 第i项把PRAGMA user_version从i升级到i + 1;
+# 已发布的迁移不要修改, 表结构变化时在末尾追加
+MIGRATIONS = (
+    _migration_base_schema,
+    _migration_category_foreign_key,
+    _migration_ocr,
+    _migration_page_rotations,
+    _migration_file_stat,
+    _migration_change_log,
+    _migration_document_manifest,
+)
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# 每个公开方法(查询/写入)都计时, 操作名为 db.方法名
+@instrument_methods('db.', exclude=('close', 'init_db'))
 class NormDatabase(QObject):
+    """规范库; 规范和分类的变更(包括其他程序实例写入的)以信号通知, 信号在写入所在的线程发出"""
+    norms_changed = Signal(list, list, list)  # 新增, 修改, 删除的规范id
+    categories_changed = Signal(list, list, list)  # 新增, 修改, 删除的分类id
+    changes_lost = Signal()  # 所需的变更记录已被清理, 只能整体重新读取
+    
     def __init__(self, db_path):
         super().__init__()
         self.db_path = db_path
+        self._lock = threading.RLock()
+        self.conn = self._connect()
         self.init_db()
+        self._change_seq = self.conn.execute(SQL_MAX_CHANGE_SEQ).fetchone()[0]
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _connect(self):
+        """打开长连接并应用PRAGMA调优"""
+        # 连接在整个程序生命周期内复用, 由self._lock串行化跨线程访问
+        conn = sqlite3.connect(self.db_path,
+                               check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma, value in CONNECTION_PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}={value}")
+        return conn
+    
+    def close(self):
+        """关闭数据库连接(程序退出时调用)"""
+        with self._lock:
+            if self.conn is None:
+                return
+            try:
+                with self.conn:
+                    self.conn.execute(SQL_PRUNE_CHANGES, (CHANGE_LOG_KEEP,))
+                # 把WAL中的内容合并回主库, 并让SQLite更新统计信息
+                self.conn.execute("PRAGMA optimize")
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                self.conn.close()
+                self.conn = None
     
     def init_db(self):
-        """初始化数据库"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        """初始化数据库: 按PRAGMA user_version依次执行未完成的迁移"""
+        with self._lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                self._migrate(MIGRATIONS[target - 1], target)
+    
+    def _migrate(self, migration, target):
+        """在单个事务中执行一步迁移, 失败时回滚, 数据库保持在原版本"""
+        # 重建表期间关闭外键检查(只能在事务外切换), 提交前统一校验
+        self.conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            self.conn.execute("BEGIN")
+            try:
+                migration(self.conn.cursor())
+                violations = self.conn.execute("PRAGMA foreign_key_check").fetchall()
+                if violations:
+                    raise sqlite3.IntegrityError(f"迁移到版本{target}后外键校验失败: {violations[:5]}")
+                self.conn.execute(f"PRAGMA user_version={target}")
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        finally:
+            self.conn.execute("PRAGMA foreign_keys=ON")
+    
+    @_publishes_changes
+    def add_norm(self, name, path, category=None, content_hash=None):
+        """添加规范, 分类不存在时自动创建"""
+        with self._lock:
+            try:
+                with self.conn:
+                    if category:
+                        self.conn.execute(SQL_ENSURE_CATEGORY, (category,))
+                    self.conn.execute(SQL_INSERT_NORM, (name, path, category, content_hash))
+                return True
+            except sqlite3.IntegrityError:
+                return False
+    
+    @_publishes_changes
+    def add_norms(self, rows):
+        """批量添加规范, rows为(name, path, category, content_hash)序列, 单个事务提交
         
-        # 创建规范表
-        c.execute('''CREATE TABLE IF NOT EXISTS norms
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      name TEXT NOT NULL,
-                      path TEXT NOT NULL UNIQUE,
-                      category TEXT,
-                      last_page INTEGER DEFAULT 1,
-                      rotation INTEGER DEFAULT 0,
-                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        返回与rows一一对应的布尔列表, 路径已存在(或在rows中重复)的行为False
+        """
+        rows = list(rows)
+        with self._lock, self.conn:
+            self._ensure_categories(row[2] for row in rows)
+            seen = self._existing_values('path', [row[1] for row in rows])
+            results = []
+            for row in rows:
+                results.append(row[1] not in seen)
+                seen.add(row[1])
+            self.conn.executemany(SQL_INSERT_NORM_IF_ABSENT, rows)
+        return results
+    
+    @_publishes_changes
+    def upsert_norms(self, rows):
+        """批量添加或更新规范, rows为(name, path, category, content_hash)序列, 单个事务提交
         
-        # 创建分类表
-        c.execute('''CREATE TABLE IF NOT EXISTS categories
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      name TEXT NOT NULL UNIQUE)''')
+        路径已存在时更新名称, category/content_hash为None时保留原值;
+        返回与rows一一对应的结果列表, 每项为'inserted'或'updated'
+        """
+        rows = list(rows)
+        with self._lock, self.conn:
+            self._ensure_categories(row[2] for row in rows)
+            seen = self._existing_values('path', [row[1] for row in rows])
+            results = []
+            for row in rows:
+                results.append('updated' if row[1] in seen else 'inserted')
+                seen.add(row[1])
+            self.conn.executemany(SQL_UPSERT_NORM, rows)
+        return results
+    
+    @_publishes_changes
+    def assign_category(self, norm_ids, category):
+        """把一批规范归入分类(不存在时自动创建), category为None时改为未分类, 单个事务提交
         
-        conn.commit()
-        conn.close()
+        返回与norm_ids一一对应的布尔列表, 规范不存在的为False
+        """
+        norm_ids = list(norm_ids)
+        with self._lock, self.conn:
+            self._ensure_categories((category,))
+            existing = self._existing_values('id', norm_ids)
+            self.conn.executemany(SQL_ASSIGN_CATEGORY, ((category, norm_id) for norm_id in norm_ids))
+        return [norm_id in existing for norm_id in norm_ids]
     
-    def add_norm(self, name, path, category=None):
-        """添加规范"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+    @_publishes_changes
+    def delete_norms(self, norm_ids):
+        """删除一批规范及其全文索引、OCR任务和页面旋转, 单个事务提交
         
-        try:
-            c.execute("INSERT INTO norms (name, path, category) VALUES (?, ?, ?)",
-                     (name, path, category))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
+        返回与norm_ids一一对应的布尔列表, 规范不存在(或在norm_ids中重复)的为False
+        """
+        norm_ids = list(norm_ids)
+        with self._lock, self.conn:
+            existing = self._existing_values('id', norm_ids)
+            results = []
+            for norm_id in norm_ids:
+                results.append(norm_id in existing)
+                existing.discard(norm_id)
+            self._delete_norm_rows(norm_ids)
+        return results
+    
+    def _publish_changes(self):
+        """读出上次通知之后的变更记录, 按表合并后发出信号"""
+        # 在锁内发出信号, 多个线程写入时通知的顺序与提交顺序一致
+        with self._lock:
+            if self.conn is None:
+                return
+            rows = self.conn.execute(SQL_SELECT_CHANGES, (self._change_seq,)).fetchall()
+            if not rows:
+                return
+            # seq连续递增, 中间缺号说明记录已被其他实例清理
+            lost = rows[0][0] > self._change_seq + 1
+            self._change_seq = rows[-1][0]
+            if lost:
+                self.changes_lost.emit()
+                return
+            operations = {'norms': {}, 'categories': {}}
+            for _, table, row_id, op in rows:
+                operations[table].setdefault(row_id, []).append(op)
+            # 新增后又删除的行互相抵消, 没有剩余变更时不发信号
+            for table, signal in (('norms', self.norms_changed), ('categories', self.categories_changed)):
+                changes = _merge_changes(operations[table])
+                if any(changes):
+                    signal.emit(*changes)
+    
+    def check_external_changes(self):
+        """其他连接(如另一个程序实例)提交过写入时发出变更通知
+        
+        PRAGMA data_version只在其他连接提交后变化, 不读取任何表, 可以频繁调用。
+        """
+        with self._lock:
+            if self.conn is None:
+                return
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            self._publish_changes()
+    
+    def get_norm_entries(self, norm_ids):
+        """按id批量获取规范的(id, 名称, 分类名称, 页数), 不存在的id不返回; 没有文档清单时页数为None"""
+        with self._lock:
+            return self._select_in(SQL_SELECT_NORM_ENTRIES, norm_ids)
+    
+    def get_page_counts(self, norm_ids):
+        """按id批量获取文档清单中的页数, 返回{norm_id: 页数}, 没有清单的规范不返回"""
+        with self._lock:
+            return dict(self._select_in(SQL_SELECT_PAGE_COUNTS, norm_ids))
+    
+    def get_category_entries(self, category_ids=None):
+        """获取分类的(id, 名称), category_ids为None时返回全部"""
+        with self._lock:
+            if category_ids is None:
+                return self.conn.execute(SQL_SELECT_CATEGORY_ENTRIES).fetchall()
+            return self._select_in(SQL_SELECT_CATEGORY_ENTRIES_BY_ID, category_ids)
+    
+    def _ensure_categories(self, categories):
+        self.conn.executemany(SQL_ENSURE_CATEGORY, ((name,) for name in set(categories) if name))
+    
+    def _select_in(self, sql, values):
+        """执行带IN ({placeholders})的查询, values去重后按BULK_LOOKUP_CHUNK分块, 返回所有行"""
+        rows = []
+        values = list(set(values))
+        for start in range(0, len(values), BULK_LOOKUP_CHUNK):
+            chunk = values[start:start + BULK_LOOKUP_CHUNK]
+            rows.extend(self.conn.execute(sql.format(placeholders=",".join("?" * len(chunk))), chunk))
+        return rows
+    
+    def _existing_values(self, column, values):
+        """values中已存在于norms表column列的值(集合)"""
+        sql = f"SELECT {column} FROM norms WHERE {column} IN ({{placeholders}})"
+        return {row[0] for row in self._select_in(sql, values)}
+    
+    def _delete_norm_rows(self, norm_ids):
+        """(在事务中调用) 删除规范; page_text/ocr_page_text按rowid范围删除,
+        ocr_jobs、page_rotations和document_manifest随外键级联删除"""
+        ranges = [(norm_id * PAGE_ROWID_STRIDE, norm_id * PAGE_ROWID_STRIDE + PAGE_ROWID_STRIDE - 1)
+                  for norm_id in norm_ids]
+        self.conn.executemany(SQL_DELETE_PAGE_TEXT, ranges)
+        self.conn.executemany(SQL_DELETE_OCR_PAGE_TEXT, ranges)
+        self.conn.executemany(SQL_DELETE_TEXT_INDEX_STATE, ((norm_id,) for norm_id in norm_ids))
+        self.conn.executemany(SQL_DELETE_NORM, ((norm_id,) for norm_id in norm_ids))
+    
+    def find_norm_by_hash(self, content_hash):
+        """按内容哈希查找规范, 返回id或None"""
+        with self._lock:
+            row = self.conn.execute(SQL_SELECT_NORM_BY_HASH, (content_hash,)).fetchone()
+        return row[0] if row else None
     
     def get_norms(self, category=None):
         """获取规范列表"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        if category:
-            c.execute("SELECT id, name, path, last_page, rotation FROM norms WHERE category=?", (category,))
-        else:
-            c.execute("SELECT id, name, path, last_page, rotation FROM norms")
+        with self._lock:
+            if category:
+                rows = self.conn.execute(SQL_SELECT_NORMS_BY_CATEGORY, (category,)).fetchall()
+            else:
+                rows = self.conn.execute(SQL_SELECT_NORMS).fetchall()
         
-        norms = [dict(zip(['id', 'name', 'path', 'last_page', 'rotation'], row)) for row in c.fetchall()]
-        conn.close()
-        return norms
+        return [dict(zip(NORM_FIELDS, row)) for row in rows]
+    
+    def get_norm_names(self, category=None, after_id=0, limit=-1):
+        """按id顺序分页获取规范的(id, 名称), 从after_id之后开始, limit为负数时不限数量"""
+        with self._lock:
+            if category:
+                return self.conn.execute(SQL_SELECT_NORM_NAMES_BY_CATEGORY,
+                                         (category, after_id, limit)).fetchall()
+            return self.conn.execute(SQL_SELECT_NORM_NAMES, (after_id, limit)).fetchall()
+    
+    def get_norm_rows(self, category=None, after_id=0, limit=-1):
+        """与get_norm_names相同, 返回(id, 名称, 页数), 供规范列表显示; 没有文档清单时页数为None"""
+        with self._lock:
+            if category:
+                return self.conn.execute(SQL_SELECT_NORM_ROWS_BY_CATEGORY,
+                                         (category, after_id, limit)).fetchall()
+            return self.conn.execute(SQL_SELECT_NORM_ROWS, (after_id, limit)).fetchall()
+    
+    def get_norm(self, norm_id):
+        """按id获取单个规范, 不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute(SQL_SELECT_NORM, (norm_id,)).fetchone()
+        return dict(zip(NORM_FIELDS, row)) if row else None
     
     def update_norm_progress(self, norm_id, page, rotation):
         """更新阅读进度和旋转状态"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("UPDATE norms SET last_page=?, rotation=? WHERE id=?", (page, rotation, norm_id))
-        conn.commit()
-        conn.close()
+        with self._lock, self.conn:
+            self.conn.execute(SQL_UPDATE_PROGRESS, (page, rotation, norm_id))
+    
+    def update_norms_last_page(self, updates):
+        """批量更新阅读进度, updates为(page, norm_id)序列, 单个事务提交"""
+        with self._lock, self.conn:
+            self.conn.executemany(SQL_UPDATE_LAST_PAGE, updates)
+    
+    def get_page_rotations(self, norm_id):
+        """规范中单独设置过旋转的页面, 返回{页码(从1开始): 旋转角度}"""
+        with self._lock:
+            return dict(self.conn.execute(SQL_SELECT_PAGE_ROTATIONS, (norm_id,)).fetchall())
     
+    def set_page_rotation(self, norm_id, page, rotation):
+        with self._lock, self.conn:
+            self.conn.execute(SQL_UPSERT_PAGE_ROTATION, (norm_id, page, rotation))
+    
+    @_publishes_changes
     def add_category(self, name):
         """添加分类"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        try:
-            c.execute("INSERT INTO categories (name) VALUES (?)", (name,))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.execute(SQL_INSERT_CATEGORY, (name,))
+                return True
+            except sqlite3.IntegrityError:
+                return False
+    
+    @_publishes_changes
+    def rename_category(self, old_name, new_name):
+        """重命名分类, 规范通过外键关联, 只需更新一行; 新名称已存在或原分类不存在时返回False"""
+        with self._lock:
+            try:
+                with self.conn:
+                    cursor = self.conn.execute(SQL_RENAME_CATEGORY, (new_name, old_name))
+                return cursor.rowcount == 1
+            except sqlite3.IntegrityError:
+                return False
+    
+    @_publishes_changes
+    def delete_category(self, name):
+        """删除分类, 该分类下的规范变为未分类(规范本身不删除)"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute(SQL_DELETE_CATEGORY, (name,))
+        return cursor.rowcount == 1
     
     def get_categories(self):
         """获取所有分类"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT name FROM categories")
-        categories = [row[0] for row in c.fetchall()]
-        conn.close()
-        return categories
\ No newline at end of file
+        with self._lock:
+            rows = self.conn.execute(SQL_SELECT_CATEGORIES).fetchall()
+        return [row[0] for row in rows]
+    
+    def get_files_under(self, root):
+        """路径位于目录root下的规范, 返回(id, 路径, 内容哈希, 文件大小, 修改时间)列表"""
+        prefix = os.path.join(root, '')
+        # 以分隔符结尾的前缀, 上界把最后一个字符加一, 构成[prefix, upper)的路径范围
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self._lock:
+            return self.conn.execute(SQL_SELECT_FILES_UNDER, (prefix, upper)).fetchall()
+    
+    @_publishes_changes
+    def apply_file_changes(self, added=(), updated=(), removed=()):
+        """在单个事务中写入文件夹同步发现的变化, 返回新增的规范数
+        
+        added为(name, path, content_hash, file_size, file_mtime)序列;
+        updated为(content_hash, file_size, file_mtime, norm_id)序列, 内容变化时清除旧的OCR文本;
+        removed为norm_id序列, 连同其全文索引一起删除。
+        """
+        with self._lock, self.conn:
+            inserted = self.conn.executemany(SQL_INSERT_SYNCED_NORM, added).rowcount if added else 0
+            for content_hash, file_size, file_mtime, norm_id in updated:
+                row = self.conn.execute(SQL_SELECT_NORM_HASH, (norm_id,)).fetchone()
+                if row is not None and row[0] != content_hash:
+                    first = norm_id * PAGE_ROWID_STRIDE
+                    self.conn.execute(SQL_DELETE_OCR_PAGE_TEXT, (first, first + PAGE_ROWID_STRIDE - 1))
+                    self.conn.execute(SQL_DELETE_OCR_JOBS_OF_NORM, (norm_id,))
+                self.conn.execute(SQL_UPDATE_SYNCED_NORM, (content_hash, file_size, file_mtime, norm_id))
+            self._delete_norm_rows(removed)
+        return inserted
+    
+    def get_text_index_state(self):
+        """获取所有规范的全文索引进度
+        
+        返回字典列表, 未建立过索引的规范各进度字段为None
+        """
+        with self._lock:
+            rows = self.conn.execute(SQL_SELECT_TEXT_INDEX_STATE).fetchall()
+        fields = ['id', 'path', 'file_size', 'file_mtime', 'page_count', 'pages_done']
+        return [dict(zip(fields, row)) for row in rows]
+    
+    def reset_text_indexes(self, entries):
+        """清空规范的已有全文索引(文件变更或首次建立时调用), entries为(id, 文件大小, 修改时间)序列, 单个事务提交"""
+        with self._lock, self.conn:
+            for norm_id, file_size, file_mtime in entries:
+                first = norm_id * PAGE_ROWID_STRIDE
+                self.conn.execute(SQL_DELETE_PAGE_TEXT, (first, first + PAGE_ROWID_STRIDE - 1))
+                self.conn.execute(SQL_UPSERT_TEXT_INDEX_STATE, (norm_id, file_size, file_mtime, None, 0))
+    
+    def add_page_texts(self, norm_id, pages, page_count, pages_done):
+        """写入一批页面文本并推进索引进度, pages为(页码, 文本)序列, 单个事务提交"""
+        first = norm_id * PAGE_ROWID_STRIDE
+        with self._lock, self.conn:
+            self.conn.executemany(SQL_INSERT_PAGE_TEXT,
+                                  ((first + page, text) for page, text in pages))
+            self.conn.execute(SQL_UPDATE_TEXT_INDEX_DONE, (page_count, pages_done, norm_id))
+    
+    def search_page_text(self, match, limit=100):
+        """全文检索, 返回按相关度排序的(norm_id, 名称, 页码, 摘要)列表"""
+        with self._lock:
+            return self.conn.execute(SQL_SEARCH_PAGE_TEXT, (match, limit)).fetchall()
+    
+    def get_norm_hash(self, norm_id):
+        """规范文件的内容哈希, 未记录时返回None"""
+        with self._lock:
+            row = self.conn.execute(SQL_SELECT_NORM_HASH, (norm_id,)).fetchone()
+        return row[0] if row else None
+    
+    def set_norm_hash(self, norm_id, content_hash):
+        with self._lock, self.conn:
+            self.conn.execute(SQL_UPDATE_NORM_HASH, (content_hash, norm_id))
+    
+    def enqueue_ocr_pages(self, norm_id, content_hash, pages, first_page=1):
+        """把尚未识别的页面加入OCR队列, first_page优先处理; 返回新入队的页数"""
+        with self._lock, self.conn:
+            queued = 0
+            for page in pages:
+                cursor = self.conn.execute(SQL_ENQUEUE_OCR_JOB,
+                                           (content_hash, page, norm_id, 1 if page == first_page else 0))
+                queued += cursor.rowcount
+        return queued
+    
+    def count_ocr_jobs(self):
+        with self._lock:
+            return self.conn.execute(SQL_COUNT_OCR_JOBS).fetchone()[0]
+    
+    def get_ocr_jobs(self, limit):
+        """按优先级和入队顺序取出OCR任务, 返回(哈希, 页码, norm_id, 路径)列表"""
+        with self._lock:
+            return self.conn.execute(SQL_SELECT_OCR_JOBS, (limit,)).fetchall()
+    
+    def drop_ocr_job(self, content_hash, page):
+        with self._lock, self.conn:
+            self.conn.execute(SQL_DELETE_OCR_JOB, (content_hash, page))
+    
+    def add_ocr_result(self, content_hash, page, engine, text, segmented_text):
+        """保存一页的OCR结果并移出队列, segmented_text写入全文索引"""
+        with self._lock, self.conn:
+            self.conn.execute(SQL_INSERT_OCR_PAGE, (content_hash, page, engine, text))
+            self.conn.execute(SQL_INSERT_OCR_PAGE_TEXT, (page, segmented_text, content_hash))
+            self.conn.execute(SQL_DELETE_OCR_JOB, (content_hash, page))
+    
+    def get_ocr_text(self, norm_id, page):
+        """规范某页(从1开始)的OCR文本, 未识别时返回None"""
+        with self._lock:
+            row = self.conn.execute(SQL_SELECT_OCR_TEXT, (norm_id, page)).fetchone()
+        return row[0] if row else None
+    
+    def get_manifest_state(self):
+        """所有规范及其文档清单对应的文件大小和修改时间, 返回(id, 路径, 大小, 修改时间)列表, 没有清单时后两项为None"""
+        with self._lock:
+            return self.conn.execute(SQL_SELECT_MANIFEST_STATE).fetchall()
+    
+    def get_document_manifest(self, norm_id):
+        """规范的文档清单, 没有时返回None
+        
+        返回字典: file_size, file_mtime, page_count, page_sizes([(宽, 高), ...], 单位为点),
+        outline([(标题, 页码(从0开始), 子项列表), ...])
+        """
+        with self._lock:
+            row = self.conn.execute(SQL_SELECT_MANIFEST, (norm_id,)).fetchone()
+        if row is None:
+            return None
+        file_size, file_mtime, page_count, page_sizes, outline = row
+        return {
+            'file_size': file_size,
+            'file_mtime': file_mtime,
+            'page_count': page_count,
+            'page_sizes': [tuple(size) for size in json.loads(page_sizes)],
+            'outline': json.loads(outline),
+        }
+    
+    def set_document_manifests(self, manifests):
+        """批量保存文档清单, manifests为(norm_id, 清单字典)序列, 单个事务提交; 已删除的规范跳过"""
+        rows = [(norm_id, manifest['file_size'], manifest['file_mtime'], manifest['page_count'],
+                 json.dumps(manifest['page_sizes']), json.dumps(manifest['outline'], ensure_ascii=False))
+                for norm_id, manifest in manifests]
+        with self._lock, self.conn:
+            self.conn.executemany(SQL_UPSERT_MANIFEST, rows)
@@ -0,0 +1,83 @@
+import itertools
+import queue
+import sys
+import time
+from concurrent.futures import Future
+from PySide6.QtCore import QThread, Signal
+from modules.instrumentation import instrumentation
+
+# 请求优先级, 数值小的先执行; 同一优先级按提交顺序执行
+INTERACTIVE = 0  # 界面等待结果的查询, 以及需要在这些查询之前生效的写入
+BACKGROUND = 1   # 批量写入等不影响界面响应的操作
+
+# 停止请求排在所有请求之后, 已提交的请求都会执行完
+_STOP_PRIORITY = sys.maxsize
+
+class DatabaseExecutor(QThread):
+    """数据库工作线程: 界面线程只提交请求, 不在数据库(可能位于网络共享上)上等待
+    
+    请求为NormDatabase的方法名和参数, 在本线程中按优先级执行;
+    submit返回concurrent.futures.Future, 给出callback时结果在界面线程中回调,
+    请求失败时改为回调errback(异常)。
+    """
+    _completed = Signal(object, object, object, object)  # 回调, 出错回调, 结果, 异常
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._completed.connect(self._dispatch)
+    
+    def submit(self, method, *args, priority=INTERACTIVE, callback=None, errback=None):
+        """提交请求, 返回Future; callback(result)或请求失败时的errback(error)在界面线程中调用,
+        请求被取消时都不调用
+        
+        记录了请求状态(如正在读取)的调用方应给出errback并在其中复位, 否则请求失败后状态不会被清除。
+        """
+        future = Future()
+        self._queue.put((priority, next(self._sequence), time.perf_counter(), method, args, future,
+                         callback, errback))
+        return future
+    
+    def call(self, method, *args, priority=BACKGROUND):
+        """提交请求并等待结果, 供后台线程使用(界面线程请使用submit)"""
+        return self.submit(method, *args, priority=priority).result()
+    
+    def pending_count(self):
+        return self._queue.qsize()
+    
+    def stop(self):
+        """执行完已提交的请求后退出线程"""
+        if self.isRunning():
+            self._queue.put((_STOP_PRIORITY, next(self._sequence), 0.0, None, (), None, None, None))
+            self.wait()
+    
+    def run(self):
+        while True:
+            _, _, submitted, method, args, future, callback, errback = self._queue.get()
+            if method is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            # 请求在队列中等待的时间, 反映后台写入对界面查询的阻塞
+            instrumentation.record('db.executor.wait', (time.perf_counter() - submitted) * 1000, method)
+            try:
+                result = getattr(self.db, method)(*args)
+            except Exception as e:
+                future.set_exception(e)
+                if callback is not None or errback is not None:
+                    self._completed.emit(callback, errback, None, e)
+            else:
+                future.set_result(result)
+                if callback is not None:
+                    self._completed.emit(callback, errback, result, None)
+    
+    def _dispatch(self, callback, errback, result, error):
+        if error is None:
+            callback(result)
+        elif errback is not None:
+            errback(error)
+        else:
+            # 调用方没有处理时在界面线程中重新抛出, 与同步调用时的表现一致
+            raise error
@@ -0,0 +1,119 @@
+import datetime
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                              QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog,
+                              QPlainTextEdit, QMessageBox)
+from PySide6.QtCore import Qt, QTimer
+from modules.instrumentation import instrumentation
+
+# 面板可见时的自动刷新间隔(毫秒)
+REFRESH_INTERVAL_MS = 1000
+
+class DiagnosticsPanel(QWidget):
+    """性能诊断面板: 各操作的次数和延迟、最近的慢操作, 以及页面渲染缓存的命中率和内存占用
+    
+    cache_stats()返回PageCache.stats()的结果, 查看页尚未创建时返回None。
+    """
+    COLUMNS = ["操作", "次数", "平均(ms)", "p50(ms)", "p95(ms)", "最大(ms)", "合计(ms)"]
+    
+    def __init__(self, cache_stats=None, parent=None):
+        super().__init__(parent)
+        self.cache_stats = cache_stats
+        self.setup_ui()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+    
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        
+        btn_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        btn_layout.addWidget(self.status_label)
+        btn_layout.addStretch()
+        self.refresh_btn = QPushButton("刷新")
+        self.refresh_btn.clicked.connect(self.refresh)
+        btn_layout.addWidget(self.refresh_btn)
+        self.reset_btn = QPushButton("清空统计")
+        self.reset_btn.clicked.connect(self.reset)
+        btn_layout.addWidget(self.reset_btn)
+        self.export_btn = QPushButton("导出JSON")
+        self.export_btn.clicked.connect(self.export_json)
+        btn_layout.addWidget(self.export_btn)
+        layout.addLayout(btn_layout)
+        
+        self.cache_label = QLabel()
+        layout.addWidget(self.cache_label)
+        
+        # 操作统计, 按合计耗时排序
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table, 3)
+        
+        layout.addWidget(QLabel("慢操作(最近的在前):"))
+        self.slow_log = QPlainTextEdit()
+        self.slow_log.setReadOnly(True)
+        layout.addWidget(self.slow_log, 2)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+    
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+    
+    def refresh(self):
+        snapshot = instrumentation.snapshot()
+        if not instrumentation.enabled:
+            self.status_label.setText("性能计时未开启")
+        else:
+            started = datetime.datetime.fromtimestamp(snapshot['started'])
+            self.status_label.setText(f"统计开始于 {started:%H:%M:%S}")
+        self.refresh_cache_stats()
+        
+        operations = sorted(snapshot['operations'].items(), key=lambda item: -item[1]['total_ms'])
+        self.table.setRowCount(len(operations))
+        for row, (name, stats) in enumerate(operations):
+            values = [name, stats['count'], stats['mean_ms'], stats['p50_ms'], stats['p95_ms'],
+                      stats['max_ms'], stats['total_ms']]
+            for column, value in enumerate(values):
+                text = value if isinstance(value, str) else (
+                    str(value) if isinstance(value, int) else f"{value:.2f}")
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        
+        lines = []
+        for entry in snapshot['slow_operations']:
+            when = datetime.datetime.fromtimestamp(entry['time'])
+            detail = f"  {entry['detail']}" if entry['detail'] is not None else ""
+            lines.append(f"{when:%H:%M:%S}  {entry['operation']}  {entry['ms']:.1f} ms{detail}")
+        self.slow_log.setPlainText("\n".join(lines))
+    
+    def refresh_cache_stats(self):
+        stats = self.cache_stats() if self.cache_stats is not None else None
+        if stats is None:
+            self.cache_label.setText("渲染缓存: 查看页尚未打开")
+            return
+        self.cache_label.setText(
+            f"渲染缓存: 命中率 {stats['hit_rate']:.1%} (命中 {stats['hits']}, 未命中 {stats['misses']}), "
+            f"{stats['entries']} 张图像, {stats['bytes'] / 1048576:.1f} / {stats['max_bytes'] / 1048576:.0f} MB, "
+            f"淘汰 {stats['evictions']} 次")
+    
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+    
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能统计", "diagnostics.json", "JSON文件 (*.json)")
+        if not path:
+            return
+        try:
+            instrumentation.dump_json(path)
+        except OSError as e:
+            QMessageBox.warning(self, "错误", f"导出失败: {e}")
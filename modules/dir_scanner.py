@@ -0,0 +1,109 @@
+import os
+import stat
+import threading
+import time
+from PySide6.QtCore import QThread, Signal
+
+# 不进入的系统/回收站目录(小写比较)
+SKIPPED_DIR_NAMES = {
+    '$recycle.bin', 'recycler', 'system volume information', '__macosx',
+    '.trash', '.trashes', '.spotlight-v100', '.fseventsd', 'lost+found',
+}
+
+# Windows下的隐藏/系统属性
+_HIDDEN_ATTRIBUTES = getattr(stat, 'FILE_ATTRIBUTE_HIDDEN', 0x2) | getattr(stat, 'FILE_ATTRIBUTE_SYSTEM', 0x4)
+
+def _is_hidden(entry):
+    if entry.name.startswith('.'):
+        return True
+    if os.name != 'nt':
+        return False
+    attributes = getattr(entry.stat(follow_symlinks=False), 'st_file_attributes', 0)
+    return bool(attributes & _HIDDEN_ATTRIBUTES)
+
+def scan_files(root, extensions=('.pdf',), min_size=1, max_size=None, stop_event=None,
+               directories=None, skipped=None):
+    """递归遍历root, 逐个产出符合条件的文件(路径, 大小, 修改时间)
+    
+    基于os.scandir, 目录项自带的类型信息可以省去大部分stat调用;
+    跳过隐藏目录和系统目录, 无权限的目录直接忽略。
+    directories为列表时, 遍历过的目录(含root)依次追加到其中;
+    skipped为列表时, 跳过或未能完整读取的目录以及无法读取的目录项追加到其中,
+    这些路径下的文件不在结果中, 但不代表已被删除。
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    stack = [root]
+    while stack:
+        if stop_event is not None and stop_event.is_set():
+            return
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            if skipped is not None:
+                skipped.append(directory)
+            continue
+        if directories is not None:
+            directories.append(directory)
+        
+        with entries:
+            try:
+                for entry in entries:
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name.lower() not in SKIPPED_DIR_NAMES and not _is_hidden(entry):
+                                stack.append(entry.path)
+                            elif skipped is not None:
+                                skipped.append(entry.path)
+                        elif entry.name.lower().endswith(extensions) and entry.is_file():
+                            info = entry.stat()
+                            if info.st_size < min_size or (max_size is not None and info.st_size > max_size):
+                                continue
+                            yield entry.path, info.st_size, info.st_mtime
+                    except OSError:
+                        if skipped is not None:
+                            skipped.append(entry.path)
+            except OSError:
+                # 读取目录中途出错(如网络共享断开), 该目录下的结果不完整
+                if skipped is not None:
+                    skipped.append(directory)
+
+class DirectoryScanner(QThread):
+    """后台目录扫描, 分批把找到的文件发送给界面"""
+    files_found = Signal(list)  # 一批文件路径
+    scan_finished = Signal(int, bool)  # 找到的文件总数, 是否被中途停止
+    
+    def __init__(self, roots, extensions=('.pdf',), min_size=1, max_size=None,
+                 batch_size=200, batch_interval=0.1, parent=None):
+        super().__init__(parent)
+        self.roots = roots
+        self.extensions = extensions
+        self.min_size = min_size
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._stop_event = threading.Event()
+    
+    def stop(self):
+        self._stop_event.set()
+    
+    def run(self):
+        batch = []
+        found = 0
+        last_emit = time.monotonic()
+        for root in self.roots:
+            for path, _, _ in scan_files(root, self.extensions, self.min_size,
+                                         self.max_size, self._stop_event):
+                batch.append(path)
+                found += 1
+                # 按数量或时间间隔分批发送, 避免逐条发信号淹没事件循环
+                now = time.monotonic()
+                if len(batch) >= self.batch_size or now - last_emit >= self.batch_interval:
+                    self.files_found.emit(batch)
+                    batch = []
+                    last_emit = now
+        if batch:
+            self.files_found.emit(batch)
+        self.scan_finished.emit(found, self._stop_event.is_set())
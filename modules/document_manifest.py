@@ -0,0 +1,107 @@
+import os
+from PySide6.QtCore import QModelIndex
+from PySide6.QtPdf import QPdfDocument, QPdfBookmarkModel
+from modules.background_pool import BackgroundPoolWorker
+
+# 读取清单的工作进程数; 每个文档只需解析文档结构, 不提取文本或渲染
+MANIFEST_WORKERS = 2
+
+# 每写入一次数据库的清单数
+MANIFEST_BATCH_SIZE = 50
+
+def read_outline(document):
+    """已加载文档的书签树, 返回[(标题, 页码(从0开始), 子项列表), ...]"""
+    model = QPdfBookmarkModel()
+    model.setDocument(document)
+    
+    def children(parent):
+        items = []
+        for row in range(model.rowCount(parent)):
+            index = model.index(row, 0, parent)
+            items.append((index.data(QPdfBookmarkModel.Role.Title) or "",
+                          index.data(QPdfBookmarkModel.Role.Page), children(index)))
+        return items
+    
+    outline = children(QModelIndex())
+    model.setDocument(None)
+    return outline
+
+def read_manifest(path):
+    """(在工作进程中执行) 读取文档清单: 文件大小和修改时间、页数、各页尺寸(点)和书签树
+    
+    先取文件信息再解析, 解析期间文件被修改时清单会被视为过期, 下次重新读取。
+    """
+    stat = os.stat(path)
+    doc = QPdfDocument()
+    page_sizes, outline = [], []
+    # 损坏或加密的文档记为0页, 文件变更后会重新读取
+    if doc.load(path) == QPdfDocument.Error.None_:
+        for page in range(doc.pageCount()):
+            size = doc.pagePointSize(page)
+            page_sizes.append((round(size.width(), 2), round(size.height(), 2)))
+        outline = read_outline(doc)
+    doc.close()
+    return {
+        'file_size': stat.st_size,
+        'file_mtime': stat.st_mtime,
+        'page_count': len(page_sizes),
+        'page_sizes': page_sizes,
+        'outline': outline,
+    }
+
+def manifest_is_current(manifest, path):
+    """清单是否与文件当前的大小和修改时间一致(文件不存在时为False)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return manifest['file_size'] == stat.st_size and manifest['file_mtime'] == stat.st_mtime
+
+class ManifestBuilder(BackgroundPoolWorker):
+    """后台生成文档清单: 导入后的新规范和清单已过期(文件大小或修改时间变化)的规范
+    
+    生成清单时的解析在工作进程池中进行, 不与界面进程的页面渲染争用QtPdf的全局锁;
+    本线程负责调度和分批写库。打开文档查看时仍在界面进程中加载(DocumentLoader或同步加载)。
+    """
+    def __init__(self, db, parent=None, workers=MANIFEST_WORKERS):
+        super().__init__(workers, parent)
+        self.db = db
+    
+    def process(self):
+        self._build(self._pending_jobs())
+    
+    def _pending_jobs(self):
+        """没有清单或清单已过期的规范, 返回(norm_id, 路径)列表; 文件不存在的跳过"""
+        jobs = []
+        for norm_id, path, file_size, file_mtime in self.db.get_manifest_state():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if file_size != stat.st_size or file_mtime != stat.st_mtime:
+                jobs.append((norm_id, path))
+        return jobs
+    
+    def _build(self, jobs):
+        if not jobs:
+            return
+        
+        results = []
+        
+        def handle_result(norm_id, manifest, error):
+            nonlocal results
+            # 读取期间文件被删除或无法访问时不记录清单
+            if error is None:
+                results.append((norm_id, manifest))
+            if len(results) >= MANIFEST_BATCH_SIZE:
+                self.db.set_document_manifests(results)
+                results = []
+        
+        tasks = [(read_manifest, (path,), norm_id) for norm_id, path in reversed(jobs)]
+        try:
+            with self.process_pool() as pool:
+                self.run_tasks(pool, tasks, handle_result)
+        finally:
+            # 工作进程异常退出时也写入已读取的清单, 其余下次启动时重新生成
+            if results:
+                self.db.set_document_manifests(results)
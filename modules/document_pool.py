@@ -0,0 +1,163 @@
+import os
+import threading
+from collections import OrderedDict
+from PySide6.QtCore import QCoreApplication, QThread, Signal
+from PySide6.QtPdf import QPdfDocument
+from modules.instrumentation import instrumentation
+
+# 同时保持打开的文档数量上限
+MAX_OPEN_DOCUMENTS = 4
+
+# 打开文档的内存预算(字节), 按文件大小估算每个文档的占用
+MAX_DOCUMENT_BYTES = 512 * 1024 * 1024
+
+class PooledDocument:
+    """池中的一个已打开文档及其查看状态"""
+    def __init__(self, path, document, cost):
+        self.path = path
+        self.document = document
+        self.cost = cost
+        self.page = None  # 页码(从1开始), None表示尚未浏览
+        self.zoom = None
+    
+    def save_view(self, page, zoom):
+        self.page = page
+        self.zoom = zoom
+
+class DocumentPool:
+    """最近使用文档的LRU池, 切换回池中的文档时无需重新解析PDF
+    
+    按文档数量和估算内存两个上限淘汰最久未使用的文档; 当前文档总是最近使用的,
+    不会被淘汰。
+    """
+    def __init__(self, max_documents=MAX_OPEN_DOCUMENTS, max_bytes=MAX_DOCUMENT_BYTES,
+                 on_evict=None):
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict  # 回调(路径), 用于清理该文档的渲染缓存
+        self._entries = OrderedDict()  # 路径 -> PooledDocument
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def __contains__(self, path):
+        return path in self._entries
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def entries(self):
+        """池中的文档, 最久未使用的在前"""
+        return list(self._entries.values())
+    
+    def peek(self, path):
+        """查看池中的文档, 不改变使用顺序"""
+        return self._entries.get(path)
+    
+    def acquire(self, path):
+        """取出已打开的文档, 不在池中时加载; 加载失败返回None
+        
+        新加载的文档不会立即触发淘汰, 调用方把视图切换到新文档后再调用trim(),
+        避免关闭仍在显示或渲染的文档。
+        """
+        entry = self._entries.get(path)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(path)
+            return entry
+        
+        self.misses += 1
+        document = QPdfDocument()
+        with instrumentation.span('document.load', path):
+            error = document.load(path)
+        if error != QPdfDocument.Error.None_:
+            document.close()
+            document.deleteLater()
+            return None
+        return self.add(path, document)
+    
+    def add(self, path, document):
+        """放入已在别处(如DocumentLoader)加载好的文档, 返回其条目; 与acquire一样不立即淘汰"""
+        try:
+            cost = os.path.getsize(path)
+        except OSError:
+            cost = 0
+        entry = PooledDocument(path, document, cost)
+        self._entries[path] = entry
+        self._bytes += cost
+        return entry
+    
+    def clear(self):
+        while self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._close(entry)
+    
+    def trim(self):
+        """淘汰最久未使用的文档直到满足上限, 至少保留最近使用的一个"""
+        while len(self._entries) > 1 and (len(self._entries) > self.max_documents
+                                          or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._close(entry)
+    
+    def _close(self, entry):
+        self._bytes -= entry.cost
+        entry.document.close()
+        # 渲染线程可能还持有该文档, 交给事件循环延迟释放
+        entry.document.deleteLater()
+        if self.on_evict is not None:
+            self.on_evict(entry.path)
+    
+    def stats(self):
+        return {
+            'open': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+class DocumentLoader(QThread):
+    """后台加载PDF文档, 加载完成的QPdfDocument移交给界面线程
+    
+    只处理最新的请求: 快速切换文档时, 尚未开始加载的旧请求直接丢弃。
+    """
+    loaded = Signal(str, object)  # 路径, QPdfDocument(加载失败时为None)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._condition = threading.Condition()
+        self._path = None
+        self._stopping = False
+    
+    def load(self, path):
+        with self._condition:
+            self._path = path
+            self._condition.notify()
+        if not self.isRunning():
+            self.start()
+    
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self.wait()
+    
+    def run(self):
+        gui_thread = QCoreApplication.instance().thread()
+        while True:
+            with self._condition:
+                while self._path is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    break
+                path, self._path = self._path, None
+            
+            document = QPdfDocument()
+            with instrumentation.span('document.load', path):
+                error = document.load(path)
+            if error != QPdfDocument.Error.None_:
+                document.close()
+                document = None
+            else:
+                # 文档对象属于界面线程, 由DocumentPool在界面线程中关闭和释放
+                document.moveToThread(gui_thread)
+            self.loaded.emit(path, document)
@@ -1,16 +1,139 @@
 import os
-import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                               QLineEdit, QPushButton, QFileDialog, QListWidget,
-                              QMessageBox)
-from PySide6.QtCore import Qt, Signal
+                              QMessageBox, QProgressBar)
+from PySide6.QtCore import Qt, Signal, QThread
+from modules.content_store import ContentStore, hash_file
+from modules.dir_scanner import DirectoryScanner
+from modules.instrumentation import instrumentation
+
+# 同时处理(哈希+复制)的文件数, 以及每批写入数据库的记录数
+IMPORT_WORKERS = 4
+IMPORT_BATCH_SIZE = 200
+
+# 规范文件按内容哈希存放的目录
+OBJECTS_DIR = os.path.join("user_files", "objects")
+
+class ImportWorker(QThread):
+    """后台导入: 线程池并发计算内容哈希并存入内容寻址存储, 分批写入数据库
+    
+    内容与库中已有规范相同的文件只做一次哈希, 不会再复制或入库。
+    数据库查询和写入以后台优先级交给数据库线程, 不影响界面的查询。
+    """
+    file_progress = Signal(int, int, str, float)  # 已处理数, 总数, 当前文件, 吞吐量(字节/秒)
+    file_failed = Signal(str, str)  # 源文件, 错误信息
+    import_finished = Signal(dict)  # 导入统计
+    
+    def __init__(self, db_executor, files, store, category=None, parent=None):
+        super().__init__(parent)
+        self.db_executor = db_executor
+        self.files = files
+        self.store = store
+        self.category = category
+        self._cancel_event = threading.Event()
+    
+    def cancel(self):
+        """请求取消, 已复制完成的文件仍会写入数据库"""
+        self._cancel_event.set()
+    
+    def run(self):
+        summary = {'total': len(self.files), 'imported': 0, 'skipped': 0,
+                   'failed': 0, 'cancelled': False}
+        batch = []
+        done = 0
+        processed_bytes = 0
+        seen_hashes = set()
+        started = time.perf_counter()
+        pending = list(reversed(self.files))
+        
+        in_flight = {}
+        try:
+            with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+                while pending or in_flight:
+                    # 有界提交: 队列中最多保留两倍于线程数的任务, 取消时可以尽快停下
+                    while pending and len(in_flight) < IMPORT_WORKERS * 2 and not self._cancel_event.is_set():
+                        src_path = pending.pop()
+                        in_flight[pool.submit(self._import_file, src_path)] = src_path
+                    if self._cancel_event.is_set():
+                        summary['cancelled'] = True
+                        pending.clear()
+                    if not in_flight:
+                        break
+                    
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        src_path = in_flight.pop(future)
+                        done += 1
+                        try:
+                            filename, dest_path, digest, size = future.result()
+                        except Exception as e:
+                            # 单个文件失败(读取出错、数据库查询出错等)不影响其余文件
+                            summary['failed'] += 1
+                            self.file_failed.emit(src_path, str(e))
+                        else:
+                            processed_bytes += size
+                            if dest_path is None or digest in seen_hashes:
+                                # 库中或本批次中已有相同内容
+                                summary['skipped'] += 1
+                            else:
+                                seen_hashes.add(digest)
+                                batch.append((filename, dest_path, self.category, digest))
+                                if len(batch) >= IMPORT_BATCH_SIZE:
+                                    self._commit_batch(batch, summary)
+                        
+                        elapsed = time.perf_counter() - started
+                        self.file_progress.emit(done, summary['total'], src_path,
+                                                processed_bytes / elapsed if elapsed > 0 else 0.0)
+        finally:
+            # 中途出错时也要提交已处理的文件并发出完成通知, 否则导入界面一直处于导入中
+            self._commit_batch(batch, summary)
+            instrumentation.record('import.total', (time.perf_counter() - started) * 1000,
+                                   f"{summary['total']} 个文件")
+            self.import_finished.emit(summary)
+    
+    def _import_file(self, src_path):
+        """(在线程池中执行) 返回(文件名, 存储路径, 内容哈希, 文件大小)
+        
+        库中已有相同内容时存储路径为None
+        """
+        size = os.path.getsize(src_path)
+        with instrumentation.span('import.hash', src_path):
+            digest = hash_file(src_path)
+        if self.db_executor.call('find_norm_by_hash', digest) is not None:
+            return os.path.basename(src_path), None, digest, size
+        with instrumentation.span('import.copy', src_path):
+            dest_path, _ = self.store.add(src_path, digest)
+        return os.path.basename(src_path), dest_path, digest, size
+    
+    def _commit_batch(self, batch, summary):
+        """写入一批规范; 写入失败时整批计为失败, 后续批次照常写入"""
+        if not batch:
+            return
+        try:
+            with instrumentation.span('import.commit_batch', len(batch)):
+                inserted_rows = self.db_executor.call('add_norms', batch)
+        except Exception as e:
+            summary['failed'] += len(batch)
+            for filename, _, _, _ in batch:
+                self.file_failed.emit(filename, str(e))
+        else:
+            for inserted in inserted_rows:
+                summary['imported' if inserted else 'skipped'] += 1
+        batch.clear()
 
 class FileImporter(QWidget):
     file_imported = Signal()
     
-    def __init__(self, db):
+    def __init__(self, db_executor):
         super().__init__()
-        self.db = db
+        self.db_executor = db_executor
+        self.import_worker = None
+        self.failed_imports = []
+        self.scanner = None
+        self.scanned_count = 0
         self.setup_ui()
     
     def setup_ui(self):
@@ -34,8 +157,16 @@ class FileImporter(QWidget):
         self.select_dir_btn = QPushButton("选择文件夹")
         self.select_dir_btn.clicked.connect(self.select_directory)
         btn_layout.addWidget(self.select_dir_btn)
+        
+        self.stop_scan_btn = QPushButton("停止扫描")
+        self.stop_scan_btn.clicked.connect(self.stop_scan)
+        self.stop_scan_btn.setEnabled(False)
+        btn_layout.addWidget(self.stop_scan_btn)
         layout.addLayout(btn_layout)
         
+        self.scan_label = QLabel()
+        layout.addWidget(self.scan_label)
+        
         # 文件列表
         self.file_list = QListWidget()
         layout.addWidget(self.file_list)
@@ -48,18 +179,37 @@ class FileImporter(QWidget):
         layout.addWidget(self.category_input)
         
         # 导入按钮
+        import_layout = QHBoxLayout()
         self.import_btn = QPushButton("导入选中文件")
         self.import_btn.clicked.connect(self.import_files)
-        layout.addWidget(self.import_btn)
+        import_layout.addWidget(self.import_btn)
+        
+        self.cancel_btn = QPushButton("取消导入")
+        self.cancel_btn.clicked.connect(self.cancel_import)
+        self.cancel_btn.setEnabled(False)
+        import_layout.addWidget(self.cancel_btn)
+        layout.addLayout(import_layout)
+        
+        # 导入进度
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+        self.progress_label = QLabel()
+        layout.addWidget(self.progress_label)
     
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
             event.acceptProposedAction()
     
     def dropEvent(self, event):
-        files = [url.toLocalFile() for url in event.mimeData().urls() 
-                if url.toLocalFile().lower().endswith('.pdf')]
+        paths = [url.toLocalFile() for url in event.mimeData().urls()]
+        files = [path for path in paths if path.lower().endswith('.pdf')]
         self.add_files_to_list(files)
+        
+        # 拖入的文件夹递归扫描
+        dirs = [path for path in paths if os.path.isdir(path)]
+        if dirs:
+            self.scan_directories(dirs)
     
     def select_files(self):
         files, _ = QFileDialog.getOpenFileNames(self, "选择PDF文件", "", "PDF文件 (*.pdf)")
@@ -68,38 +218,109 @@ class FileImporter(QWidget):
     def select_directory(self):
         dir_path = QFileDialog.getExistingDirectory(self, "选择包含PDF的文件夹")
         if dir_path:
-            files = [os.path.join(dir_path, f) for f in os.listdir(dir_path) 
-                    if f.lower().endswith('.pdf')]
-            self.add_files_to_list(files)
+            self.scan_directories([dir_path])
+    
+    def scan_directories(self, dirs):
+        """在后台递归扫描文件夹, 找到的文件分批加入列表"""
+        if self.scanner is not None:
+            return
+        
+        self.scanned_count = 0
+        self.scanner = DirectoryScanner(dirs, parent=self)
+        self.scanner.files_found.connect(self.on_files_found)
+        self.scanner.scan_finished.connect(self.on_scan_finished)
+        self.select_dir_btn.setEnabled(False)
+        self.stop_scan_btn.setEnabled(True)
+        self.scan_label.setText("正在扫描...")
+        self.scanner.start()
+    
+    def stop_scan(self):
+        if self.scanner is not None:
+            self.stop_scan_btn.setEnabled(False)
+            self.scanner.stop()
+    
+    def on_files_found(self, files):
+        self.add_files_to_list(files)
+        self.scanned_count += len(files)
+        self.scan_label.setText(f"正在扫描... 已找到 {self.scanned_count} 个文件")
+    
+    def on_scan_finished(self, count, stopped):
+        self.scanner.wait()
+        self.scanner.deleteLater()
+        self.scanner = None
+        self.select_dir_btn.setEnabled(True)
+        self.stop_scan_btn.setEnabled(False)
+        state = "扫描已停止" if stopped else "扫描完成"
+        self.scan_label.setText(f"{state}, 共找到 {count} 个文件")
     
     def add_files_to_list(self, files):
-        for file in files:
-            self.file_list.addItem(file)
+        self.file_list.addItems(files)
     
     def import_files(self):
+        """在后台线程中导入列表中的文件"""
+        if self.import_worker is not None or self.file_list.count() == 0:
+            return
+        
         category = self.category_input.text().strip() or None
-        dest_dir = "user_files"
-        
-        for i in range(self.file_list.count()):
-            src_path = self.file_list.item(i).text()
-            if not os.path.exists(src_path):
-                continue
-            
-            # 移动文件到用户目录
-            filename = os.path.basename(src_path)
-            dest_path = os.path.join(dest_dir, filename)
-            
-            try:
-                if not os.path.exists(dest_path):
-                    shutil.copy2(src_path, dest_path)
-                
-                # 添加到数据库
-                self.db.add_norm(filename, dest_path, category)
-            
-            except Exception as e:
-                QMessageBox.warning(self, "导入错误", f"导入文件失败: {str(e)}")
-                continue
-        
-        self.file_list.clear()
-        self.file_imported.emit()
-        QMessageBox.information(self, "完成", "文件导入完成")
\ No newline at end of file
+        files = [self.file_list.item(i).text() for i in range(self.file_list.count())]
+        self.failed_imports = []
+        
+        self.import_worker = ImportWorker(self.db_executor, files, ContentStore(OBJECTS_DIR), category, self)
+        self.import_worker.file_progress.connect(self.update_import_progress)
+        self.import_worker.file_failed.connect(self.record_import_failure)
+        self.import_worker.import_finished.connect(self.finish_import)
+        
+        self.import_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setRange(0, len(files))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.import_worker.start()
+    
+    def cancel_import(self):
+        """取消正在进行的导入"""
+        if self.import_worker is not None:
+            self.cancel_btn.setEnabled(False)
+            self.progress_label.setText("正在取消...")
+            self.import_worker.cancel()
+    
+    def shutdown(self):
+        """程序退出时停止扫描和导入, 等待已复制的文件写入数据库"""
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner.wait()
+        if self.import_worker is not None:
+            self.import_worker.cancel()
+            self.import_worker.wait()
+    
+    def update_import_progress(self, done, total, path, bytes_per_sec):
+        self.progress_bar.setValue(done)
+        self.progress_label.setText(
+            f"{done}/{total}  {bytes_per_sec / 1024 / 1024:.1f} MB/s  {os.path.basename(path)}")
+    
+    def record_import_failure(self, path, error):
+        self.failed_imports.append(f"{os.path.basename(path)}: {error}")
+    
+    def finish_import(self, summary):
+        """导入结束: 统一通知一次, 并汇总显示失败的文件"""
+        self.import_worker.wait()
+        self.import_worker.deleteLater()
+        self.import_worker = None
+        self.import_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.hide()
+        self.progress_label.clear()
+        if not summary['cancelled']:
+            self.file_list.clear()
+        
+        if summary['imported']:
+            self.file_imported.emit()
+        
+        title = "已取消" if summary['cancelled'] else "完成"
+        message = (f"导入 {summary['imported']} 个, 跳过 {summary['skipped']} 个, "
+                   f"失败 {summary['failed']} 个")
+        if self.failed_imports:
+            message += "\n\n" + "\n".join(self.failed_imports[:10])
+            if len(self.failed_imports) > 10:
+                message += f"\n... 等 {len(self.failed_imports)} 个文件"
+        QMessageBox.information(self, title, message)
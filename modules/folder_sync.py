@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QThread, QTimer, QFileSystemWatcher, Signal
+from modules.content_store import hash_file
+from modules.dir_scanner import scan_files
+from modules.instrumentation import instrumentation
+
+# 同时计算哈希的文件数, 以及每个事务写入的变更数
+SYNC_HASH_WORKERS = 4
+SYNC_BATCH_SIZE = 500
+
+# 目录变化后等待这么久(毫秒)再重新扫描, 合并复制大量文件时的连续通知
+SYNC_DEBOUNCE_MS = 2000
+
+# 定时轮询间隔(毫秒): 目录监视收不到文件内容原地修改的通知, 低频轮询兜底;
+# 系统无法监视全部目录(如inotify数量达到上限)时改用较短的间隔
+SYNC_POLL_INTERVAL_MS = 10 * 60 * 1000
+SYNC_FALLBACK_POLL_INTERVAL_MS = 60 * 1000
+
+class FolderSync(QThread):
+    """监视文件夹, 把其中PDF文件的增加、修改和删除增量同步到规范库
+    
+    同步的规范直接引用文件夹中的文件(不复制到内容存储); 只有大小或修改时间变化的
+    文件才重新计算哈希, 变化分批在单个事务中写入。未变化的目录树重新扫描只需遍历目录。
+    目录变化由QFileSystemWatcher通知, 同时定时轮询兜底。
+    """
+    folder_synced = Signal(str, list, dict)  # 文件夹, 扫描到的目录, 同步统计
+    sync_finished = Signal(dict)  # 本轮所有文件夹的合计统计
+    
+    def __init__(self, db, folders, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.folders = [os.path.normpath(folder) for folder in folders]
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._stop_event = threading.Event()
+        self._summary = self._empty_summary()
+        
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self._sync_dirty)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.request_sync)
+        self._dirty = set()
+        self._watch_failed = set()  # 无法监视的文件夹
+        
+        self.folder_synced.connect(self.on_folder_synced)
+        self.finished.connect(self._on_finished)
+    
+    @staticmethod
+    def _empty_summary():
+        return {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'hashed': 0, 'failed': 0}
+    
+    def start_watching(self):
+        """同步所有文件夹并开始监视"""
+        self.poll_timer.start(SYNC_POLL_INTERVAL_MS)
+        self.request_sync()
+    
+    def request_sync(self, folders=None):
+        """重新同步指定的文件夹(默认全部); 正在同步时排到本轮之后"""
+        with self._lock:
+            self._pending.update(self.folders if folders is None else folders)
+        if not self.isRunning():
+            self._stop_event.clear()
+            self.start(QThread.LowPriority)
+    
+    def stop(self):
+        """停止同步并等待线程退出, 已提交的批次会保留"""
+        self.debounce_timer.stop()
+        self.poll_timer.stop()
+        self._stop_event.set()
+        self.wait()
+    
+    def run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                if not self._pending:
+                    break
+                folder = self._pending.pop()
+            directories = []
+            started = time.perf_counter()
+            summary = self.sync_folder(folder, directories)
+            instrumentation.record('import.sync_folder', (time.perf_counter() - started) * 1000, folder)
+            self.folder_synced.emit(folder, directories, summary)
+    
+    def sync_folder(self, folder, directories=None):
+        """(在同步线程中执行) 同步单个文件夹, 返回统计; directories收集扫描到的目录"""
+        summary = self._empty_summary()
+        directories = [] if directories is None else directories
+        known = {path: (norm_id, size, mtime)
+                 for norm_id, path, _, size, mtime in self.db.get_files_under(folder)}
+        
+        # 大小和修改时间都相同的文件视为未变化, 其余的需要计算哈希
+        changed = []
+        skipped = []
+        for path, size, mtime in scan_files(folder, stop_event=self._stop_event, directories=directories,
+                                            skipped=skipped):
+            entry = known.pop(path, None)
+            if entry is None:
+                changed.append((None, path, size, mtime))
+            elif entry[1] != size or entry[2] != mtime:
+                changed.append((entry[0], path, size, mtime))
+            else:
+                summary['unchanged'] += 1
+        if self._stop_event.is_set() or not directories:
+            # 扫描不完整或文件夹无法访问(如网络共享未连接), 不能据此判断哪些文件已被删除
+            return summary
+        
+        # 跳过或未能读取的目录(隐藏目录、无权限、读取中途出错)下的文件不视为已删除
+        prefixes = tuple(os.path.join(path, '') for path in skipped)
+        unseen = set(skipped)
+        removed = [norm_id for path, (norm_id, _, _) in known.items()
+                   if path not in unseen and not path.startswith(prefixes)]
+        for start in range(0, len(removed), SYNC_BATCH_SIZE):
+            self.db.apply_file_changes(removed=removed[start:start + SYNC_BATCH_SIZE])
+        summary['removed'] = len(removed)
+        
+        with ThreadPoolExecutor(max_workers=SYNC_HASH_WORKERS) as pool:
+            for start in range(0, len(changed), SYNC_BATCH_SIZE):
+                if self._stop_event.is_set():
+                    break
+                batch = changed[start:start + SYNC_BATCH_SIZE]
+                added, updated = [], []
+                for (norm_id, path, size, mtime), digest in zip(batch, pool.map(self._hash, batch)):
+                    if digest is None:
+                        summary['failed'] += 1
+                    elif norm_id is None:
+                        added.append((os.path.basename(path), path, digest, size, mtime))
+                    else:
+                        updated.append((digest, size, mtime, norm_id))
+                summary['hashed'] += len(added) + len(updated)
+                with instrumentation.span('import.commit_batch', len(batch)):
+                    summary['added'] += self.db.apply_file_changes(added, updated)
+                summary['updated'] += len(updated)
+        return summary
+    
+    def _hash(self, item):
+        """(在线程池中执行) 文件读取失败(如正在写入或已被删除)时返回None"""
+        path = item[1]
+        try:
+            with instrumentation.span('import.hash', path):
+                return hash_file(path)
+        except OSError:
+            return None
+    
+    def on_folder_synced(self, folder, directories, summary):
+        """更新监视的目录(新建的子目录加入, 已删除的移除)并累计统计"""
+        if directories:
+            prefix = os.path.join(folder, '')
+            watched = {path for path in self.watcher.directories()
+                       if path == folder or path.startswith(prefix)}
+            current = set(directories)
+            if watched - current:
+                self.watcher.removePaths(list(watched - current))
+            failed = self.watcher.addPaths(list(current - watched)) if current - watched else []
+            if failed:
+                self._watch_failed.add(folder)
+            else:
+                self._watch_failed.discard(folder)
+            self.poll_timer.setInterval(SYNC_FALLBACK_POLL_INTERVAL_MS if self._watch_failed
+                                        else SYNC_POLL_INTERVAL_MS)
+        for key, value in summary.items():
+            self._summary[key] += value
+    
+    def on_directory_changed(self, path):
+        """记下目录所属的文件夹, 稍后一起重新同步"""
+        for folder in self.folders:
+            if path == folder or path.startswith(os.path.join(folder, '')):
+                self._dirty.add(folder)
+        self.debounce_timer.start(SYNC_DEBOUNCE_MS)
+    
+    def _sync_dirty(self):
+        dirty, self._dirty = self._dirty, set()
+        if dirty:
+            self.request_sync(dirty)
+    
+    def _on_finished(self):
+        # 线程退出前的瞬间提交的请求不会被run处理, 在这里补上
+        with self._lock:
+            pending = bool(self._pending)
+        if pending and not self._stop_event.is_set():
+            self.request_sync(())
+            return
+        summary, self._summary = self._summary, self._empty_summary()
+        self.sync_finished.emit(summary)
@@ -0,0 +1,184 @@
+import os
+import re
+import time
+from functools import partial
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtPdf import QPdfDocument
+from modules.instrumentation import instrumentation
+from modules.background_pool import BackgroundPoolWorker
+
+# 每个工作进程任务提取的页数, 任务内只加载一次文档; 大多数规范一个任务即可提取完
+PAGES_PER_TASK = 1024
+
+# 每次写库的页数; 每批写库后推进一次进度, 中断后从这里续建
+PAGES_PER_COMMIT = 64
+
+_CJK_RANGES = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_CJK_CHAR = re.compile(f'([{_CJK_RANGES}])')
+_SEGMENT_GAP = re.compile(f'(?<=[{_CJK_RANGES}]) | (?=[{_CJK_RANGES}])')
+_WHITESPACE = re.compile(r'\s+')
+
+def segment_text(text):
+    """在汉字两侧插入空格, 让FTS5的unicode61分词器按单字建立索引"""
+    return _CJK_CHAR.sub(r' \1 ', text)
+
+def join_segments(text):
+    """去掉segment_text插入的空格, 用于显示摘要"""
+    return _SEGMENT_GAP.sub('', _WHITESPACE.sub(' ', text)).strip()
+
+def build_match_query(query):
+    """把用户输入转换为FTS5查询: 空格分隔的每个词作为一个短语, 各短语同时出现"""
+    phrases = []
+    for term in query.split():
+        tokens = segment_text(term).split()
+        if tokens:
+            phrases.append('"' + ' '.join(tokens).replace('"', '""') + '"')
+    return ' '.join(phrases)
+
+def extract_page_texts(path, start, count):
+    """(在工作进程中执行) 提取[start, start + count)页的文本
+    
+    返回(总页数, [(页码, 切分后的文本), ...]), 页码从1开始
+    """
+    doc = QPdfDocument()
+    if doc.load(path) != QPdfDocument.Error.None_:
+        raise OSError(f"无法加载PDF文档: {path}")
+    page_count = doc.pageCount()
+    pages = [(page + 1, segment_text(doc.getAllText(page).text()))
+             for page in range(start, min(start + count, page_count))]
+    doc.close()
+    return page_count, pages
+
+class FullTextIndexer(BackgroundPoolWorker):
+    """后台全文索引: 由工作进程池提取页面文本, 本线程负责调度和写库"""
+    progress = Signal(int, int)  # 已完成文档数, 本轮待索引文档数
+    
+    def __init__(self, db, parent=None, workers=None):
+        super().__init__(workers or max(1, (os.cpu_count() or 2) - 1), parent)
+        self.db = db
+    
+    def process(self):
+        self._index(self._pending_jobs())
+    
+    def _pending_jobs(self):
+        """找出需要(重新)索引的规范, 返回(norm_id, 路径, 起始页)列表"""
+        jobs = []
+        resets = []
+        for state in self.db.get_text_index_state():
+            try:
+                stat = os.stat(state['path'])
+            except OSError:
+                continue
+            
+            if state['file_size'] != stat.st_size or state['file_mtime'] != stat.st_mtime:
+                # 首次索引或文件已变更, 旧索引作废
+                resets.append((state['id'], stat.st_size, stat.st_mtime))
+                jobs.append((state['id'], state['path'], 0))
+            elif state['page_count'] is None or state['pages_done'] < state['page_count']:
+                jobs.append((state['id'], state['path'], state['pages_done']))
+        if resets:
+            self.db.reset_text_indexes(resets)
+        return jobs
+    
+    def _index(self, jobs):
+        if not jobs:
+            return
+        
+        total = len(jobs)
+        done = 0
+        self.progress.emit(done, total)
+        
+        def extract_task(norm_id, path, start):
+            return extract_page_texts, (path, start, PAGES_PER_TASK), (norm_id, path, start)
+        
+        def handle_result(job, result, error):
+            nonlocal done
+            norm_id, path, start = job
+            # 损坏或加密的文档记为0页, 文件变更后会重新尝试
+            page_count, pages = (0, []) if error is not None else result
+            end = min(start + PAGES_PER_TASK, page_count)
+            for offset in range(0, max(len(pages), 1), PAGES_PER_COMMIT):
+                self.db.add_page_texts(norm_id, pages[offset:offset + PAGES_PER_COMMIT], page_count,
+                                       min(start + offset + PAGES_PER_COMMIT, end))
+            pages_done = end
+            if pages_done < page_count:
+                # 每个文档同一时刻只有一个任务, 保证pages_done单调推进
+                tasks.append(extract_task(norm_id, path, pages_done))
+            else:
+                done += 1
+                self.progress.emit(done, total)
+        
+        # 工作进程异常退出时已完成的批次都已落库, 下次启动时续建
+        tasks = [extract_task(*job) for job in reversed(jobs)]
+        with self.process_pool() as pool:
+            self.run_tasks(pool, tasks, handle_result)
+
+class FullTextSearchPanel(QWidget):
+    """全文检索面板: 输入关键词, 列出(规范, 页码, 摘要)命中结果"""
+    hit_activated = Signal(int, int)  # norm_id, 页码
+    
+    def __init__(self, db_executor, parent=None):
+        super().__init__(parent)
+        self.db_executor = db_executor
+        self._search = None  # 正在执行的检索(关键词, 开始时间)
+        self.setup_ui()
+    
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("全文检索, 如: 混凝土 保护层厚度 (回车搜索)")
+        self.search_box.returnPressed.connect(self.search)
+        layout.addWidget(self.search_box)
+        
+        self.result_list = QListWidget()
+        self.result_list.setWordWrap(True)
+        self.result_list.itemClicked.connect(self.open_hit)
+        self.result_list.hide()
+        layout.addWidget(self.result_list)
+    
+    def search(self):
+        """执行全文检索, 由数据库线程查询, 结果到达后显示"""
+        match = build_match_query(self.search_box.text())
+        if not match:
+            self._search = None
+            self.result_list.clear()
+            self.result_list.hide()
+            return
+        
+        search = self._search = (match, time.perf_counter())
+        self.db_executor.submit('search_page_text', match, callback=partial(self.show_hits, search),
+                                errback=partial(self.show_error, search))
+    
+    def is_searching(self):
+        return self._search is not None
+    
+    def show_hits(self, search, hits):
+        # 期间又发起了新的检索时丢弃旧结果
+        if search is not self._search:
+            return
+        self._search = None
+        self.result_list.clear()
+        for norm_id, name, page, snippet in hits:
+            item = QListWidgetItem(f"{name}  第{page}页\n{join_segments(snippet)}")
+            item.setData(Qt.UserRole, (norm_id, page))
+            self.result_list.addItem(item)
+        if not hits:
+            self.result_list.addItem("未找到匹配内容")
+        self.result_list.show()
+        instrumentation.record('search.fulltext', (time.perf_counter() - search[1]) * 1000, search[0])
+    
+    def show_error(self, search, error):
+        if search is not self._search:
+            return
+        self._search = None
+        self.result_list.clear()
+        self.result_list.addItem(f"检索失败: {error}")
+        self.result_list.show()
+    
+    def open_hit(self, item):
+        hit = item.data(Qt.UserRole)
+        if hit:
+            self.hit_activated.emit(*hit)
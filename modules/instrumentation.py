@@ -0,0 +1,182 @@
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+# 延迟直方图各桶的上限(毫秒), 最后一个桶收集超过最大上限的样本
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 慢操作阈值(毫秒), 按操作名前缀匹配, 最长的前缀优先
+DEFAULT_SLOW_THRESHOLDS_MS = {
+    '': 200,
+    'db.': 50,
+    'render.': 250,
+    'document.': 500,
+    'import.': 1000,
+    'search.': 100,
+}
+
+# 慢操作日志保留的条数
+SLOW_LOG_SIZE = 500
+
+class OperationStats:
+    """单个操作的调用次数、总耗时、最大耗时和延迟直方图"""
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+    
+    def percentile(self, fraction):
+        """按直方图估算分位数, 返回样本所在桶的上限(超出最大上限时返回最大耗时)"""
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return HISTOGRAM_BOUNDS_MS[i] if i < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+    
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'max_ms': self.max_ms,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'histogram': dict(zip([str(bound) for bound in HISTOGRAM_BOUNDS_MS] + ['inf'], self.buckets)),
+        }
+
+class _Span:
+    """计时上下文: 退出时记录耗时"""
+    __slots__ = ('registry', 'name', 'detail', 'started')
+    
+    def __init__(self, registry, name, detail):
+        self.registry = registry
+        self.name = name
+        self.detail = detail
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.registry.record(self.name, (time.perf_counter() - self.started) * 1000, self.detail)
+        return False
+
+class _NullSpan:
+    """关闭计时时使用的空上下文"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Instrumentation:
+    """性能计时: 各操作的计数和延迟直方图, 以及超过阈值的慢操作日志
+    
+    默认关闭, 关闭时各计时点只做一次属性判断。可以在多个线程中记录。
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stats = {}  # 操作名 -> OperationStats
+        self._slow_log = deque(maxlen=SLOW_LOG_SIZE)
+        self._thresholds = dict(DEFAULT_SLOW_THRESHOLDS_MS)
+        self.started = time.time()
+    
+    def configure(self, enabled, thresholds=None):
+        """开启/关闭计时; thresholds为{操作名前缀: 毫秒}, 覆盖默认的慢操作阈值"""
+        self.enabled = enabled
+        if thresholds:
+            self._thresholds.update({prefix: float(ms) for prefix, ms in thresholds.items()})
+    
+    def threshold(self, name):
+        """操作的慢操作阈值(毫秒)"""
+        prefix = max((prefix for prefix in self._thresholds if name.startswith(prefix)), key=len)
+        return self._thresholds[prefix]
+    
+    def record(self, name, elapsed_ms, detail=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = OperationStats()
+            stats.add(elapsed_ms)
+            if elapsed_ms >= self.threshold(name):
+                self._slow_log.append((time.time(), name, elapsed_ms, detail))
+    
+    def span(self, name, detail=None):
+        """用于with语句的计时点"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, detail)
+    
+    def timed(self, name):
+        """函数计时装饰器"""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, (time.perf_counter() - started) * 1000)
+            return wrapper
+        return decorate
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self.started = time.time()
+    
+    def snapshot(self):
+        """当前统计和慢操作日志(新的在前)"""
+        with self._lock:
+            return {
+                'started': self.started,
+                'operations': {name: stats.to_dict() for name, stats in sorted(self._stats.items())},
+                'slow_operations': [
+                    {'time': when, 'operation': name, 'ms': elapsed_ms, 'detail': detail}
+                    for when, name, elapsed_ms, detail in reversed(self._slow_log)
+                ],
+                'thresholds_ms': dict(self._thresholds),
+            }
+    
+    def dump_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2, default=str)
+
+def instrument_methods(prefix, exclude=()):
+    """类装饰器: 为类中所有公开方法加上计时, 操作名为 prefix + 方法名"""
+    def decorate(cls):
+        for name, value in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not inspect.isfunction(value):
+                continue
+            setattr(cls, name, instrumentation.timed(prefix + name)(value))
+        return cls
+    return decorate
+
+# 全局计时实例
+instrumentation = Instrumentation()
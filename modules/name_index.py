@@ -0,0 +1,155 @@
+import bisect
+import re
+from itertools import compress, repeat
+from operator import contains
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # pypinyin是可选依赖, 缺失时只支持GB2312一级汉字的首字母
+    lazy_pinyin = None
+
+# GB2312一级汉字按拼音排序, 每个声母首字母对应一段连续区位码
+_GB2312_INITIALS = (
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'),
+    (0xB7A2, 'f'), (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'),
+    (0xC0AC, 'l'), (0xC2E8, 'm'), (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'),
+    (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'), (0xCBFA, 't'), (0xCDDA, 'w'),
+    (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+)
+_GB2312_LEVEL1_END = 0xD7F9
+
+_CJK_CHAR = re.compile('[一-鿿]')
+
+# 每个缓存二元组的倒排表上限, 超出后淘汰最早建立的
+MAX_CACHED_GRAMS = 4096
+
+def _build_initial_table():
+    """生成 汉字 -> 拼音首字母 的str.translate映射表"""
+    starts = [code for code, _ in _GB2312_INITIALS]
+    table = {}
+    for code in range(_GB2312_INITIALS[0][0], _GB2312_LEVEL1_END + 1):
+        try:
+            ch = bytes((code >> 8, code & 0xFF)).decode('gb2312')
+        except UnicodeDecodeError:
+            continue
+        table[ord(ch)] = _GB2312_INITIALS[bisect.bisect_right(starts, code) - 1][1]
+    return table
+
+_INITIAL_TABLE = _build_initial_table()
+
+def pinyin_initials(text):
+    """把名称转换为拼音首字母串, 如'混凝土结构' -> 'hntjg'"""
+    initials = text.translate(_INITIAL_TABLE)
+    if lazy_pinyin is not None and _CJK_CHAR.search(initials):
+        # 一级字库之外的汉字交给pypinyin, 结果并入映射表供后续复用
+        for ch in set(_CJK_CHAR.findall(initials)):
+            _INITIAL_TABLE[ord(ch)] = (lazy_pinyin(ch, style=Style.FIRST_LETTER) or [ch])[0].lower()
+        initials = text.translate(_INITIAL_TABLE)
+    return initials
+
+def _grams(text):
+    """文本中的所有单字和二元组"""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+class NameIndex:
+    """规范名称的内存倒排索引
+    
+    每条规范保存"小写名称\\n拼音首字母"作为检索键。查询时从以下候选中取最小的一个,
+    逐条校验检索键是否包含关键词: 上一次查询的结果(逐字输入时新关键词包含上一次的
+    关键词)、关键词中已缓存的单字/二元组倒排表({norm_id: 检索键}), 都没有时为全部
+    检索键。单字/二元组的查询结果作为倒排表缓存, 之后的增删直接维护。
+    校验通过map/compress在C层逐条比较, 不逐条执行Python字节码。不预先建立全部
+    倒排表: 十万条名称时仅单字倒排表就需要约1.4秒和140MB内存。
+    """
+    def __init__(self):
+        self.clear()
+    
+    def clear(self):
+        self._names = {}  # norm_id -> name, 保持插入顺序
+        self._keys = {}  # norm_id -> 检索键
+        self._postings = {}  # 单字/二元组 -> {norm_id: 检索键}
+        self._last = None  # 上一次查询的(关键词, {norm_id: 检索键}), 索引变化后作废
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def __contains__(self, norm_id):
+        return norm_id in self._names
+    
+    def ids(self):
+        return self._names.keys()
+    
+    def name(self, norm_id):
+        return self._names.get(norm_id)
+    
+    def sync(self, names):
+        """与数据库中的(id, 名称)序列同步, 只处理新增、改名和删除的条目"""
+        seen = set()
+        for norm_id, name in names:
+            seen.add(norm_id)
+            if self._names.get(norm_id) != name:
+                self.add(norm_id, name)
+        for norm_id in self._names.keys() - seen:
+            self.remove(norm_id)
+    
+    @staticmethod
+    def _make_key(name):
+        lowered = name.lower()
+        initials = pinyin_initials(lowered)
+        return lowered if initials == lowered else lowered + '\n' + initials
+    
+    def add(self, norm_id, name):
+        if norm_id in self._names:
+            self.remove(norm_id)
+        
+        key = self._make_key(name)
+        self._names[norm_id] = name
+        self._keys[norm_id] = key
+        self._last = None
+        if not self._postings:
+            return
+        for gram in _grams(key):
+            entries = self._postings.get(gram)
+            if entries is not None:
+                entries[norm_id] = key
+    
+    def remove(self, norm_id):
+        key = self._keys.pop(norm_id, None)
+        if key is None:
+            return
+        del self._names[norm_id]
+        self._last = None
+        for gram in _grams(key):
+            entries = self._postings.get(gram)
+            if entries is not None:
+                del entries[norm_id]
+    
+    @staticmethod
+    def _scan(entries, text):
+        """{norm_id: 检索键}中检索键包含text的条目"""
+        return dict(compress(entries.items(), map(contains, entries.values(), repeat(text))))
+    
+    def search(self, keyword):
+        """返回名称或拼音首字母包含keyword的规范id(可迭代, 调用方不要修改)"""
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return self._keys.keys()
+        if self._last is not None and self._last[0] == keyword:
+            return self._last[1].keys()
+        
+        # 单字和二元组的倒排表就是结果
+        entries = self._postings.get(keyword) if len(keyword) <= 2 else None
+        if entries is None:
+            grams = {keyword[i:i + 2] for i in range(len(keyword) - 1)}
+            grams.update(keyword)
+            candidates = [self._postings[gram] for gram in grams if gram in self._postings]
+            if self._last is not None and self._last[0] in keyword:
+                # 结果一定是上一次结果的子集
+                candidates.append(self._last[1])
+            entries = self._scan(min(candidates, key=len, default=self._keys), keyword)
+            if len(keyword) <= 2:
+                if len(self._postings) >= MAX_CACHED_GRAMS:
+                    del self._postings[next(iter(self._postings))]
+                self._postings[keyword] = entries
+        self._last = (keyword, entries)
+        return entries.keys()
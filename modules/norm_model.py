@@ -0,0 +1,221 @@
+import bisect
+from functools import partial
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+# 每次从数据库取出的行数, 视图滚动到底部时再取下一批
+FETCH_BATCH_SIZE = 500
+
+# 行数据中的规范id
+NORM_ID_ROLE = Qt.UserRole
+# 行数据中的页数(来自文档清单), 尚未生成清单时为None
+PAGE_COUNT_ROLE = Qt.UserRole + 1
+
+class NormListModel(QAbstractListModel):
+    """规范列表模型: 按需分批从数据库读取(id, 名称, 页数), 不一次性加载全部规范
+    
+    每批由数据库线程读取, 结果到达后再插入; 列表重置后到达的旧批次直接丢弃。
+    数据库的变更通知通过apply_changes增量应用到已读取的行, 不重新读取整个列表。
+    设置过滤结果(id集合)后改为按批展示过滤结果, 名称由调用方提供的函数查询, 页数由数据库线程补上。
+    页数只在读取行时带出, 之后生成的文档清单不会刷新已读取的行。
+    """
+    def __init__(self, db_executor, parent=None, batch_size=FETCH_BATCH_SIZE):
+        super().__init__(parent)
+        self.db_executor = db_executor
+        self.batch_size = batch_size
+        self._category = None
+        self._rows = []  # (id, 名称, 页数)
+        self._matched = None  # 过滤结果id列表, None表示不过滤
+        self._name_of = None
+        self._exhausted = False
+        self._fetching = None  # 正在读取的批次(Future)
+        self._generation = 0  # 每次重置加一, 用于识别过期的批次
+    
+    def category(self):
+        return self._category
+    
+    def set_category(self, category):
+        """切换分类(None为全部)并清除过滤"""
+        self._category = category
+        self._matched = None
+        self._name_of = None
+        self._reset()
+    
+    def rename_category(self, category):
+        """当前分类改名后只更新名称, 已读取的行不变"""
+        self._category = category
+    
+    def set_filter(self, ids, name_of):
+        """只显示ids中的规范, 按id排序; name_of(norm_id)返回规范名称"""
+        self._matched = sorted(ids)
+        self._name_of = name_of
+        self._reset()
+    
+    def clear_filter(self):
+        if self._matched is not None:
+            self.set_category(self._category)
+    
+    def clear(self):
+        """清空列表, 不再从数据库读取"""
+        self._cancel_fetch()
+        self.beginResetModel()
+        self._category = None
+        self._matched = []
+        self._rows = []
+        self._exhausted = True
+        self.endResetModel()
+    
+    def _reset(self):
+        self._cancel_fetch()
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+        # 先请求第一批, 隐藏(未布局)的视图不会主动调用fetchMore
+        self.fetchMore()
+    
+    def _cancel_fetch(self):
+        self._generation += 1
+        if self._fetching is not None:
+            self._fetching.cancel()
+            self._fetching = None
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        norm_id, name, page_count = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return name
+        if role == NORM_ID_ROLE:
+            return norm_id
+        if role == PAGE_COUNT_ROLE:
+            return page_count
+        if role == Qt.ToolTipRole:
+            return name if page_count is None else f'{name}\n共{page_count}页'
+        return None
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and self._fetching is None
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._fetching is not None:
+            return
+        if self._matched is not None:
+            ids = self._matched[len(self._rows):len(self._rows) + self.batch_size]
+            self._append([(norm_id, self._name_of(norm_id), None) for norm_id in ids])
+            if ids:
+                self.db_executor.submit('get_page_counts', ids,
+                                        callback=partial(self._apply_page_counts, self._generation))
+            return
+        # 按id分页(keyset), 翻到后面的批次也不需要OFFSET扫描
+        after_id = self._rows[-1][0] if self._rows else 0
+        self._fetching = self.db_executor.submit(
+            'get_norm_rows', self._category, after_id, self.batch_size,
+            callback=partial(self._on_batch_loaded, self._generation),
+            errback=partial(self._on_batch_failed, self._generation))
+    
+    def is_loading(self):
+        """是否有批次正在读取"""
+        return self._fetching is not None
+    
+    def _on_batch_loaded(self, generation, rows):
+        if generation != self._generation:
+            return
+        self._fetching = None
+        self._append(rows)
+    
+    def _apply_page_counts(self, generation, page_counts):
+        """过滤状态下补上已追加行的页数"""
+        if generation != self._generation or not page_counts:
+            return
+        ids = [row[0] for row in self._rows]
+        for norm_id, page_count in page_counts.items():
+            row = bisect.bisect_left(ids, norm_id)
+            if row < len(ids) and ids[row] == norm_id:
+                self._rows[row] = (norm_id, self._rows[row][1], page_count)
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [PAGE_COUNT_ROLE, Qt.ToolTipRole])
+    
+    def _on_batch_failed(self, generation, error):
+        if generation == self._generation:
+            # 不再自动读取下一批(视图会立即重试), 重新设置分类或过滤时再读
+            self._fetching = None
+            self._exhausted = True
+        raise error
+    
+    def _append(self, rows):
+        if len(rows) < self.batch_size:
+            self._exhausted = True
+        if not rows:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+    
+    def apply_changes(self, inserted, updated, deleted):
+        """应用数据库的变更通知(新增、修改、删除的规范id)
+        
+        删除直接生效; 新增和修改的规范先由数据库线程读出名称和分类, 再决定更新、插入还是移除。
+        过滤状态下只处理删除, 过滤结果由调用方重新设置。
+        """
+        self._remove_ids(set(deleted))
+        if self._matched is not None:
+            return
+        changed = list(inserted) + list(updated)
+        if changed:
+            self.db_executor.submit('get_norm_entries', changed,
+                                    callback=partial(self._apply_entries, self._generation))
+    
+    def _remove_ids(self, ids):
+        if not ids:
+            return
+        if self._matched is not None:
+            self._matched = [norm_id for norm_id in self._matched if norm_id not in ids]
+        # 从后往前按连续区间删除, 前面的行号不受影响
+        row = len(self._rows) - 1
+        while row >= 0:
+            if self._rows[row][0] not in ids:
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self._rows[row - 1][0] in ids:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row, last)
+            del self._rows[row:last + 1]
+            self.endRemoveRows()
+            row -= 1
+    
+    def _apply_entries(self, generation, entries):
+        """entries为(id, 名称, 分类名称, 页数); 行按id排序, 尚未读取到的位置留给后续批次"""
+        if generation != self._generation or self._matched is not None:
+            return
+        ids = [row[0] for row in self._rows]
+        removed = set()
+        appended = []
+        for norm_id, name, category, page_count in sorted(entries):
+            belongs = self._category is None or category == self._category
+            row = bisect.bisect_left(ids, norm_id)
+            if row < len(ids) and ids[row] == norm_id:
+                if not belongs:
+                    removed.add(norm_id)
+                elif self._rows[row] != (norm_id, name, page_count):
+                    self._rows[row] = (norm_id, name, page_count)
+                    index = self.index(row)
+                    self.dataChanged.emit(index, index, [Qt.DisplayRole, PAGE_COUNT_ROLE, Qt.ToolTipRole])
+            elif belongs and row < len(ids):
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._rows.insert(row, (norm_id, name, page_count))
+                ids.insert(row, norm_id)
+                self.endInsertRows()
+            elif belongs and self._exhausted:
+                # 已读到末尾时追加, 否则下一批读取时自然会包含
+                appended.append((norm_id, name, page_count))
+        self._remove_ids(removed)
+        if appended:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(appended) - 1)
+            self._rows.extend(appended)
+            self.endInsertRows()
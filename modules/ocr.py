@@ -0,0 +1,202 @@
+import os
+import io
+import threading
+from PySide6.QtCore import Qt, Signal, QBuffer, QIODevice
+from PySide6.QtGui import QImage, QColor, QPainter
+from PySide6.QtPdf import QPdfDocument
+from modules.content_store import hash_file
+from modules.fulltext_index import segment_text
+from modules.background_pool import BackgroundPoolWorker
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # 未安装时OCR不可用, 其余功能不受影响
+    pytesseract = None
+
+# OCR渲染分辨率, 300dpi是Tesseract推荐的输入精度
+OCR_DPI = 300
+
+# 每轮从任务队列取出的页数
+OCR_JOB_BATCH = 64
+
+# 默认识别语言: 简体中文 + 英文
+TESSERACT_LANG = 'chi_sim+eng'
+
+def available_cores():
+    """当前进程可用的CPU核数"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class OcrEngine:
+    """OCR引擎接口: recognize接收白底的页面图像, 返回识别出的文本"""
+    name = None
+    
+    def available(self):
+        return True
+    
+    def recognize(self, image):
+        raise NotImplementedError
+
+class TesseractEngine(OcrEngine):
+    """基于pytesseract调用本机的Tesseract"""
+    name = 'tesseract'
+    
+    def __init__(self, lang=TESSERACT_LANG):
+        self.lang = lang
+        self._available = None
+    
+    def available(self):
+        """检测本机是否安装了Tesseract; 需要启动一次子进程, 结果缓存"""
+        if self._available is None:
+            self._available = self._probe()
+        return self._available
+    
+    @staticmethod
+    def _probe():
+        if pytesseract is None:
+            return False
+        try:
+            pytesseract.get_tesseract_version()
+            return True
+        except (pytesseract.TesseractNotFoundError, OSError):
+            return False
+    
+    def recognize(self, image):
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, "PNG")
+        with Image.open(io.BytesIO(buffer.data().data())) as pil_image:
+            return pytesseract.image_to_string(pil_image, lang=self.lang)
+
+class StubEngine(OcrEngine):
+    """测试用引擎: 不做识别, 返回由图像尺寸构造的固定文本"""
+    name = 'stub'
+    
+    def recognize(self, image):
+        return f"stub ocr {image.width()}x{image.height()}"
+
+OCR_ENGINES = {engine.name: engine for engine in (TesseractEngine, StubEngine)}
+
+def create_engine(name):
+    engine_class = OCR_ENGINES.get(name)
+    if engine_class is None:
+        raise ValueError(f"未知的OCR引擎: {name}")
+    return engine_class()
+
+def ocr_page(path, page, engine_name, dpi=OCR_DPI):
+    """(在工作进程中执行) 渲染一页(从1开始)并识别, 返回文本"""
+    doc = QPdfDocument()
+    if doc.load(path) != QPdfDocument.Error.None_:
+        raise OSError(f"无法加载PDF文档: {path}")
+    try:
+        if not 1 <= page <= doc.pageCount():
+            raise ValueError(f"页码超出范围: {page}")
+        size = (doc.pagePointSize(page - 1) * (dpi / 72.0)).toSize()
+        rendered = doc.render(page - 1, size)
+    finally:
+        doc.close()
+    
+    # 渲染结果背景透明, 合成到白底上再识别
+    image = QImage(rendered.size(), QImage.Format_RGB32)
+    image.fill(QColor(Qt.white))
+    painter = QPainter(image)
+    painter.drawImage(0, 0, rendered)
+    painter.end()
+    return create_engine(engine_name).recognize(image)
+
+class OcrService(BackgroundPoolWorker):
+    """后台OCR: 任务队列保存在数据库中, 由工作进程池渲染并识别, 本线程负责调度和写库
+    
+    结果按(文件哈希, 页码)保存, 已识别的页面不会重复入队; 程序退出时未完成的任务
+    留在队列中, 下次启动后继续。
+    """
+    page_done = Signal(int, int)  # norm_id, 页码
+    norm_queued = Signal(int, int)  # norm_id, 新入队的页数
+    progress = Signal(int, int)  # 本轮已完成页数, 本轮开始时队列中的页数
+    
+    def __init__(self, db, engine_name='tesseract', parent=None, workers=None):
+        super().__init__(workers or max(1, available_cores() - 1), parent)
+        self.db = db
+        self.engine = create_engine(engine_name)
+        self._requests_lock = threading.Lock()
+        self._enqueue_requests = []  # (norm_id, first_page)
+    
+    def engine_available(self):
+        return self.engine.available()
+    
+    def enqueue_norm(self, norm_id, first_page=1):
+        """请求把规范中尚未识别的页面加入队列, first_page优先
+        
+        计算哈希和读取页数可能需要数秒, 在OCR线程中进行; 新入队的页数由norm_queued通知。
+        """
+        with self._requests_lock:
+            self._enqueue_requests.append((norm_id, first_page))
+        self.request_update()
+    
+    def _enqueue_requested(self):
+        """(在OCR线程中执行) 处理enqueue_norm的请求"""
+        with self._requests_lock:
+            requests, self._enqueue_requests = self._enqueue_requests, []
+        for norm_id, first_page in requests:
+            try:
+                queued = self._enqueue(norm_id, first_page)
+            except OSError:
+                queued = 0
+            self.norm_queued.emit(norm_id, queued)
+    
+    def _enqueue(self, norm_id, first_page):
+        norm = self.db.get_norm(norm_id)
+        if norm is None:
+            return 0
+        content_hash = self.db.get_norm_hash(norm_id)
+        if content_hash is None:
+            # 早期导入的文件没有记录哈希, 这里补算
+            content_hash = hash_file(norm['path'])
+            self.db.set_norm_hash(norm_id, content_hash)
+        
+        doc = QPdfDocument()
+        if doc.load(norm['path']) != QPdfDocument.Error.None_:
+            return 0
+        page_count = doc.pageCount()
+        doc.close()
+        return self.db.enqueue_ocr_pages(norm_id, content_hash, range(1, page_count + 1), first_page)
+    
+    def process(self):
+        # 第一次检测引擎在本线程中进行, 不阻塞界面
+        if not self.engine_available():
+            return
+        self._enqueue_requested()
+        self._process()
+    
+    def _process(self):
+        total = self.db.count_ocr_jobs()
+        if not total:
+            return
+        
+        done = 0
+        self.progress.emit(done, total)
+        
+        def handle_result(job, text, error):
+            nonlocal done
+            content_hash, page, norm_id = job
+            if error is not None:
+                # 损坏的页面不再重试, 从队列中移除
+                self.db.drop_ocr_job(content_hash, page)
+            else:
+                self.db.add_ocr_result(content_hash, page, self.engine.name, text, segment_text(text))
+                self.page_done.emit(norm_id, page)
+            done += 1
+            self.progress.emit(min(done, total), total)
+        
+        # 工作进程异常退出时未完成的任务仍在队列中, 下次启动时继续
+        with self.process_pool() as pool:
+            while not self._stop_requested:
+                # 任务完成后才从队列中移除, 本批全部完成后再取下一批
+                jobs = self.db.get_ocr_jobs(OCR_JOB_BATCH)
+                if not jobs:
+                    break
+                tasks = [(ocr_page, (path, page, self.engine.name), (content_hash, page, norm_id))
+                         for content_hash, page, norm_id, path in reversed(jobs)]
+                self.run_tasks(pool, tasks, handle_result)
@@ -0,0 +1,263 @@
+import math
+import time
+from collections import OrderedDict
+from PySide6.QtCore import QObject, QSize, QRect, Signal
+from PySide6.QtGui import QTransform
+from PySide6.QtPdf import QPdfPageRenderer, QPdfDocumentRenderOptions
+from modules.instrumentation import instrumentation
+
+# 渲染缓存默认上限(字节)
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# 翻页后预取前后各多少页
+PREFETCH_PAGES = 2
+
+# 分块渲染: 整页超过该像素数时只渲染视口内的图块, 内存占用与缩放倍数无关
+TILED_RENDER_MIN_PIXELS = 2048 * 2048
+
+# 图块边长(设备像素)
+TILE_SIZE = 512
+
+# 分块渲染时先显示的整页低分辨率底图的像素上限
+PLACEHOLDER_MAX_PIXELS = 1024 * 1024
+
+_ROTATIONS = {
+    0: QPdfDocumentRenderOptions.Rotation.None_,
+    90: QPdfDocumentRenderOptions.Rotation.Clockwise90,
+    180: QPdfDocumentRenderOptions.Rotation.Clockwise180,
+    270: QPdfDocumentRenderOptions.Rotation.Clockwise270,
+}
+
+def page_key(doc_key, page, zoom, rotation):
+    """缓存键: (文档, 页码, 缩放, 旋转), 缩放取三位小数避免浮点误差造成缓存不命中"""
+    return (doc_key, page, round(zoom, 3), rotation % 360)
+
+def rendered_size(point_size, zoom, rotation, dpi):
+    """页面(尺寸point_size, 单位为点)在给定缩放、旋转和屏幕DPI下的像素尺寸"""
+    size = point_size * (zoom * dpi / 72.0)
+    if rotation % 180:
+        size.transpose()
+    return size.toSize()
+
+def tile_key(doc_key, page, zoom, rotation, column, row):
+    """图块缓存键: 页面缓存键 + 图块在未旋转页面上的列、行"""
+    return page_key(doc_key, page, zoom, rotation) + (column, row)
+
+def device_page_size(point_size, zoom, dpi, device_pixel_ratio):
+    """未旋转页面的设备像素尺寸, 图块按此尺寸划分"""
+    size = rendered_size(point_size, zoom, 0, dpi)
+    return QSize(round(size.width() * device_pixel_ratio), round(size.height() * device_pixel_ratio))
+
+def needs_tiles(size):
+    return size.width() * size.height() > TILED_RENDER_MIN_PIXELS
+
+def placeholder_zoom(zoom, size):
+    """分块渲染时底图使用的缩放比例, 像素数不超过PLACEHOLDER_MAX_PIXELS"""
+    pixels = size.width() * size.height()
+    if pixels <= PLACEHOLDER_MAX_PIXELS:
+        return zoom
+    return round(zoom * math.sqrt(PLACEHOLDER_MAX_PIXELS / pixels), 3)
+
+def rotation_transform(rotation, size):
+    """把未旋转页面(尺寸size)上的坐标映射到顺时针旋转rotation度后的页面上"""
+    rotation %= 360
+    transform = QTransform()
+    if rotation == 90:
+        transform.translate(size.height(), 0)
+    elif rotation == 180:
+        transform.translate(size.width(), size.height())
+    elif rotation == 270:
+        transform.translate(0, size.width())
+    return transform.rotate(rotation)
+
+def tile_rect(column, row, size):
+    """图块在未旋转页面上的区域, 页面边缘的图块会被裁小"""
+    rect = QRect(column * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+    return rect.intersected(QRect(0, 0, size.width(), size.height()))
+
+def visible_tiles(area, size):
+    """与未旋转页面上的区域area相交的图块(列, 行)"""
+    area = area.intersected(QRect(0, 0, size.width(), size.height()))
+    if area.isEmpty():
+        return []
+    return [(column, row)
+            for row in range(area.top() // TILE_SIZE, area.bottom() // TILE_SIZE + 1)
+            for column in range(area.left() // TILE_SIZE, area.right() // TILE_SIZE + 1)]
+
+class PageCache:
+    """页面渲染结果的LRU缓存, 按图像占用的字节数限制总大小"""
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __contains__(self, key):
+        return key in self._images
+    
+    def get(self, key):
+        """取缓存图像并计入命中统计, 未命中返回None"""
+        image = self._images.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._images.move_to_end(key)
+        return image
+    
+    def put(self, key, image):
+        old = self._images.pop(key, None)
+        if old is not None:
+            self._bytes -= old.sizeInBytes()
+        cost = image.sizeInBytes()
+        if cost > self.max_bytes:
+            return
+        self._images[key] = image
+        self._bytes += cost
+        while self._bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._bytes -= evicted.sizeInBytes()
+            self.evictions += 1
+    
+    def find_placeholder(self, doc_key, page, rotation):
+        """找同一页面其他缩放比例的缓存图像, 在清晰图像渲染完成前临时拉伸显示"""
+        for key in reversed(self._images):
+            # 图块只覆盖页面的一部分, 不能作为整页底图
+            if len(key) == 4 and key[0] == doc_key and key[1] == page and key[3] == rotation:
+                return self._images[key]
+        return None
+    
+    def discard_document(self, doc_key):
+        """移除某个文档的所有缓存"""
+        for key in [key for key in self._images if key[0] == doc_key]:
+            self._bytes -= self._images.pop(key).sizeInBytes()
+    
+    def stats(self):
+        """命中/未命中次数和内存占用统计"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._images),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+class PageRenderer(QObject):
+    """后台页面渲染: 基于多线程模式的QPdfPageRenderer, 渲染结果写入PageCache
+    
+    除整页外也可以渲染单个图块(setScaledClipRect); QtPdf裁剪渲染不支持旋转,
+    图块按未旋转页面渲染后再旋转图像。
+    """
+    page_ready = Signal(object)  # 缓存键
+    
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.document = None
+        self.doc_key = None
+        self.page_sizes = None
+        self._pending = {}  # requestId -> (缓存键, 设备像素比, 图块需要旋转的角度, 请求时间)
+        self._pending_keys = set()
+        self._renderer = QPdfPageRenderer(self)
+        self._renderer.setRenderMode(QPdfPageRenderer.RenderMode.MultiThreaded)
+        self._renderer.pageRendered.connect(self._on_page_rendered)
+    
+    def set_document(self, document, doc_key, page_sizes=None):
+        """page_sizes为各页尺寸(QSizeF列表, 单位为点), 通常来自文档清单;
+        给出时页面尺寸不再向QtPdf查询, 文档也可以暂缺(None), 加载完成后再设置"""
+        self.document = document
+        self.doc_key = doc_key
+        self.page_sizes = page_sizes
+        # 旧文档尚未返回的渲染结果作废, 避免写入错误的缓存键
+        self._pending.clear()
+        self._pending_keys.clear()
+        self._renderer.setDocument(document)
+    
+    def page_count(self):
+        if self.page_sizes is not None:
+            return len(self.page_sizes)
+        return self.document.pageCount() if self.document is not None else 0
+    
+    def page_point_size(self, page):
+        """某页(从0开始)的尺寸, 单位为点"""
+        if self.page_sizes is not None:
+            return self.page_sizes[page]
+        return self.document.pagePointSize(page)
+    
+    def is_pending(self, key):
+        return key in self._pending_keys
+    
+    def pending_count(self):
+        return len(self._pending)
+    
+    def request(self, page, zoom, rotation, dpi, device_pixel_ratio=1.0):
+        """请求渲染一页(已缓存或正在渲染时忽略), 返回缓存键"""
+        key = page_key(self.doc_key, page, zoom, rotation)
+        if self.document is None or key in self.cache or self.is_pending(key):
+            return key
+        
+        size = rendered_size(self.page_point_size(page), zoom, rotation, dpi)
+        size = QSize(round(size.width() * device_pixel_ratio), round(size.height() * device_pixel_ratio))
+        if size.isEmpty():
+            return key
+        
+        options = QPdfDocumentRenderOptions()
+        options.setRotation(_ROTATIONS[rotation % 360])
+        request_id = self._renderer.requestPage(page, size, options)
+        self._pending[request_id] = (key, device_pixel_ratio, 0, time.perf_counter())
+        self._pending_keys.add(key)
+        return key
+    
+    def request_tile(self, page, zoom, rotation, dpi, device_pixel_ratio, column, row):
+        """请求渲染一个图块(已缓存或正在渲染时忽略), 返回缓存键"""
+        key = tile_key(self.doc_key, page, zoom, rotation, column, row)
+        if self.document is None or key in self.cache or key in self._pending_keys:
+            return key
+        
+        size = device_page_size(self.page_point_size(page), zoom, dpi, device_pixel_ratio)
+        clip = tile_rect(column, row, size)
+        if clip.isEmpty():
+            return key
+        
+        options = QPdfDocumentRenderOptions()
+        options.setScaledSize(size)
+        options.setScaledClipRect(clip)
+        request_id = self._renderer.requestPage(page, clip.size(), options)
+        self._pending[request_id] = (key, device_pixel_ratio, rotation % 360, time.perf_counter())
+        self._pending_keys.add(key)
+        return key
+    
+    def prefetch(self, page, zoom, rotation_of, dpi, device_pixel_ratio=1.0, radius=PREFETCH_PAGES):
+        """预取当前页前后radius页, 由近及远排队; rotation_of(页码)返回该页的旋转角度"""
+        if self.document is None:
+            return
+        # 连续快速翻页时积压的请求已经足够, 不再追加预取
+        if len(self._pending) > 2 * radius + 1:
+            return
+        page_count = self.page_count()
+        for distance in range(1, radius + 1):
+            for neighbour in (page + distance, page - distance):
+                if 0 <= neighbour < page_count:
+                    self.request(neighbour, zoom, rotation_of(neighbour), dpi, device_pixel_ratio)
+    
+    def _on_page_rendered(self, page, image_size, image, options, request_id):
+        pending = self._pending.pop(request_id, None)
+        if pending is None:
+            return
+        key, device_pixel_ratio, tile_rotation, requested = pending
+        self._pending_keys.discard(key)
+        # 从请求到结果返回的时间, 包括在渲染队列中等待的时间
+        instrumentation.record('render.tile' if len(key) > 4 else 'render.page',
+                               (time.perf_counter() - requested) * 1000, key[:2])
+        if image.isNull():
+            return
+        if tile_rotation:
+            image = image.transformed(QTransform().rotate(tile_rotation))
+        image.setDevicePixelRatio(device_pixel_ratio)
+        self.cache.put(key, image)
+        self.page_ready.emit(key)
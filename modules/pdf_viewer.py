@@ -1,74 +1,315 @@
 import os
+import time
+from functools import partial
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                              QSpinBox, QPushButton, QToolBar, QMessageBox)
-from PySide6.QtCore import Qt, Signal, QPointF
-from PySide6.QtGui import QKeySequence, QAction, QWheelEvent, QTransform
-from PySide6.QtPdf import QPdfDocument
-from PySide6.QtPdfWidgets import QPdfView
+                              QSpinBox, QPushButton, QToolBar, QMessageBox,
+                              QLineEdit, QListView, QAbstractScrollArea, QPlainTextEdit,
+                              QScroller, QTreeWidget, QTreeWidgetItem)
+from PySide6.QtCore import Qt, Signal, QTimer, QRect, QRectF, QSize, QSizeF, QPoint
+from PySide6.QtGui import QKeySequence, QAction, QWheelEvent, QPainter, QPalette
+from modules.progress_journal import ProgressJournal
+from modules.name_index import NameIndex
+from modules.fulltext_index import FullTextSearchPanel
+from modules.page_cache import (PageCache, PageRenderer, page_key, tile_key, rendered_size,
+                                device_page_size, needs_tiles, placeholder_zoom,
+                                rotation_transform, tile_rect, visible_tiles)
+from modules.thumbnail_cache import ThumbnailDiskCache, ThumbnailSidebar
+from modules.document_pool import DocumentPool, DocumentLoader
+from modules.document_manifest import read_outline, manifest_is_current
+from modules.norm_model import NormListModel, NORM_ID_ROLE
+from modules.instrumentation import instrumentation
 
-class DraggablePdfView(QPdfView):
-    def __init__(self, parent=None):
+# 搜索框输入防抖间隔(毫秒)
+SEARCH_DEBOUNCE_MS = 150
+
+# 页面四周留白(像素)
+PAGE_MARGIN = 6
+
+# 拖动平移的合并间隔(毫秒), 拖动开始时按屏幕刷新率重新计算
+DEFAULT_FRAME_INTERVAL_MS = 16
+
+# 缩略图磁盘缓存目录
+THUMBNAIL_CACHE_DIR = os.path.join("user_files", ".thumbnails")
+
+class DraggablePdfView(QAbstractScrollArea):
+    """单页PDF视图
+    
+    页面图像按(文档, 页码, 缩放, 旋转)缓存在PageCache中, 旋转在渲染时完成,
+    每页可以有各自的旋转角度; 缓存未命中时交给后台渲染, 期间先拉伸显示同页
+    其他缩放比例的缓存图像。放大后整页过大时只渲染视口内的图块, 图块渲染完成前
+    显示低分辨率的整页底图。各页尺寸可以由文档清单提供, 文档还在加载时就能布局。
+    """
+    def __init__(self, cache=None, parent=None):
         super().__init__(parent)
         self._drag_start_pos = None
-        self._rotation = 0
-        self._transform = QTransform()
+        self._drag_delta = QPoint()
+        self._kinetic = False
+        self.drag_events = 0  # 拖动期间收到的鼠标移动事件数
+        self.drag_frames = 0  # 实际滚动的次数, 每帧至多一次
+        self._rotations = {}  # 页码(从0开始) -> 旋转角度
+        self._default_rotation = 0
+        self._zoom = 1.0
+        self._page = 0
+        self._document = None
+        self._doc_key = None
+        
+        self.cache = cache if cache is not None else PageCache()
+        self.renderer = PageRenderer(self.cache, self)
+        self.renderer.page_ready.connect(self._onPageReady)
+        
+        self.viewport().setBackgroundRole(QPalette.Dark)
+        self.viewport().setAutoFillBackground(True)
+        
+        # 拖动产生的位移先累积, 每帧统一应用一次
+        self._drag_timer = QTimer(self)
+        self._drag_timer.setSingleShot(True)
+        self._drag_timer.setTimerType(Qt.PreciseTimer)
+        self._drag_timer.setInterval(DEFAULT_FRAME_INTERVAL_MS)
+        self._drag_timer.timeout.connect(self._applyDrag)
+    
+    def setKineticScrolling(self, enabled):
+        """开启/关闭惯性滚动, 开启后拖动由QScroller处理"""
+        self._kinetic = enabled
+        if enabled:
+            QScroller.grabGesture(self.viewport(), QScroller.LeftMouseButtonGesture)
+        else:
+            QScroller.ungrabGesture(self.viewport())
+    
+    def kineticScrolling(self):
+        return self._kinetic
+    
+    def setDocument(self, document, doc_key, page_sizes=None):
+        """设置要显示的文档, doc_key用于区分缓存(如文件路径)
+        
+        给出各页尺寸(page_sizes, 来自文档清单)时document可以为None: 先按尺寸布局,
+        页面显示为空白, 文档加载完成后由attachDocument设置。
+        """
+        self._document = document
+        self._doc_key = doc_key
+        self._page = 0
+        self.renderer.set_document(document, doc_key, page_sizes)
+        self._updateScrollBars()
+        self.viewport().update()
+    
+    def attachDocument(self, document):
+        """设置后台加载完成的文档, 页码、缩放和滚动位置保持不变"""
+        self._document = document
+        self.renderer.set_document(document, self._doc_key, self.renderer.page_sizes)
+        self.viewport().update()
+        self._prefetch()
+    
+    def document(self):
+        return self._document
+    
+    def pageCount(self):
+        return self.renderer.page_count()
+    
+    def page(self):
+        return self._page
+    
+    def setPage(self, page):
+        """显示指定页(从0开始), 并预取相邻页面"""
+        self._page = page
+        self._updateScrollBars()
+        self.verticalScrollBar().setValue(0)
+        self.viewport().update()
+        self._prefetch()
+    
+    def zoomFactor(self):
+        return self._zoom
+    
+    def setZoomFactor(self, zoom):
+        self._zoom = zoom
+        self._updateScrollBars()
+        self.viewport().update()
+        self._prefetch()
+    
+    def pageRotation(self, page=None):
+        """某页(从0开始, 默认当前页)的旋转角度"""
+        return self._rotations.get(self._page if page is None else page, self._default_rotation)
+    
+    def setPageRotations(self, rotations, default=0):
+        """设置各页的旋转角度, 未列出的页面使用default"""
+        self._rotations = {page: rotation % 360 for page, rotation in rotations.items()}
+        self._default_rotation = default % 360
+        self._updateScrollBars()
+        self.viewport().update()
+        self._prefetch()
+    
+    def setPageRotation(self, rotation):
+        """设置当前页的旋转角度"""
+        self._rotations[self._page] = rotation % 360
+        self._updateScrollBars()
+        self.viewport().update()
+        self._prefetch()
+    
+    def _hasPage(self):
+        return 0 <= self._page < self.pageCount()
+    
+    def isPageRendered(self):
+        """当前页按当前缩放和旋转的整页图像是否已在缓存中"""
+        return self._hasPage() and page_key(self._doc_key, self._page, self._pageZoom(),
+                                            self.pageRotation()) in self.cache
+    
+    def _deviceSize(self):
+        """当前页未旋转时的设备像素尺寸"""
+        return device_page_size(self.renderer.page_point_size(self._page), self._zoom,
+                                self.logicalDpiX(), self.devicePixelRatioF())
+    
+    def _pageZoom(self):
+        """整页图像的渲染缩放: 需要分块时使用低分辨率底图的缩放比例"""
+        size = self._deviceSize()
+        return placeholder_zoom(self._zoom, size) if needs_tiles(size) else self._zoom
+    
+    def _prefetch(self):
+        if self._hasPage():
+            self.renderer.prefetch(self._page, self._pageZoom(), self.pageRotation,
+                                   self.logicalDpiX(), self.devicePixelRatioF())
+    
+    def _pageSize(self):
+        """当前页面显示尺寸(逻辑像素)"""
+        if not self._hasPage():
+            return QSize()
+        return rendered_size(self.renderer.page_point_size(self._page), self._zoom, self.pageRotation(),
+                             self.logicalDpiX())
+    
+    def _updateScrollBars(self):
+        size = self._pageSize()
+        viewport = self.viewport().size()
+        for bar, content, visible in ((self.horizontalScrollBar(), size.width(), viewport.width()),
+                                      (self.verticalScrollBar(), size.height(), viewport.height())):
+            bar.setRange(0, max(0, content + 2 * PAGE_MARGIN - visible))
+            bar.setPageStep(visible)
+            bar.setSingleStep(20)
+    
+    def _pageRect(self):
+        """页面在视口中的位置: 小于视口时居中, 否则随滚动条偏移"""
+        size = self._pageSize()
+        viewport = self.viewport().size()
+        x = PAGE_MARGIN + max(0, (viewport.width() - size.width() - 2 * PAGE_MARGIN) // 2)
+        y = PAGE_MARGIN + max(0, (viewport.height() - size.height() - 2 * PAGE_MARGIN) // 2)
+        return QRect(x - self.horizontalScrollBar().value(),
+                     y - self.verticalScrollBar().value(),
+                     size.width(), size.height())
+    
+    def _onPageReady(self, key):
+        if key[0] == self._doc_key and key[1] == self._page:
+            self.viewport().update()
     
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and not self._kinetic:
             self._drag_start_pos = event.pos()
+            self._drag_delta = QPoint()
+            screen = self.screen()
+            if screen is not None and screen.refreshRate() > 0:
+                self._drag_timer.setInterval(max(1, int(1000 / screen.refreshRate())))
         super().mousePressEvent(event)
     
     def mouseMoveEvent(self, event):
         if self._drag_start_pos is not None:
-            delta = event.pos() - self._drag_start_pos
-            navigator = self.pageNavigator()
-            current_pos = navigator.currentLocation()
-            navigator.jump(current_pos - delta / self.zoomFactor(), self.zoomFactor())
+            # 高回报率鼠标每帧会产生多个移动事件, 这里只累积位移
+            self._drag_delta += event.pos() - self._drag_start_pos
             self._drag_start_pos = event.pos()
+            self.drag_events += 1
+            if not self._drag_timer.isActive():
+                self._drag_timer.start()
         super().mouseMoveEvent(event)
     
     def mouseReleaseEvent(self, event):
+        if self._drag_start_pos is not None:
+            self._drag_timer.stop()
+            self._applyDrag()
         self._drag_start_pos = None
         super().mouseReleaseEvent(event)
     
-    def setPageRotation(self, rotation):
-        """设置页面旋转角度"""
-        self._rotation = rotation % 360
-        self._updateTransform()
-    
-    def _updateTransform(self):
-        """更新变换矩阵"""
-        self._transform = QTransform()
-        if self._rotation == 90:
-            self._transform.translate(self.height(), 0)
-            self._transform.rotate(90)
-        elif self._rotation == 180:
-            self._transform.translate(self.width(), self.height())
-            self._transform.rotate(180)
-        elif self._rotation == 270:
-            self._transform.translate(0, self.width())
-            self._transform.rotate(270)
+    def _applyDrag(self):
+        """把累积的拖动位移一次性应用到滚动条"""
+        delta = self._drag_delta
+        if delta.isNull():
+            return
+        self._drag_delta = QPoint()
+        self.drag_frames += 1
+        self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - delta.x())
+        self.verticalScrollBar().setValue(self.verticalScrollBar().value() - delta.y())
+    
+    def wheelEvent(self, event):
+        # Ctrl+滚轮交给PdfViewer缩放
+        if event.modifiers() & Qt.ControlModifier:
+            event.ignore()
+            return
+        super().wheelEvent(event)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._updateScrollBars()
+    
+    def scrollContentsBy(self, dx, dy):
         self.viewport().update()
     
     def paintEvent(self, event):
-        """重绘事件"""
-        painter = self.viewport().painter()
-        if painter is None:
+        """重绘事件: 只绘制缓存中的页面图像, 不在界面线程中渲染"""
+        if not self._hasPage():
             return
         
-        painter.save()
-        painter.setTransform(self._transform)
-        super().paintEvent(event)
-        painter.restore()
+        painter = QPainter(self.viewport())
+        rect = self._pageRect()
+        rotation = self.pageRotation()
+        size = self._deviceSize()
+        tiled = needs_tiles(size)
+        zoom = placeholder_zoom(self._zoom, size) if tiled else self._zoom
+        key = page_key(self._doc_key, self._page, zoom, rotation)
+        image = self.cache.get(key)
+        if image is None:
+            self.renderer.request(self._page, zoom, rotation, self.logicalDpiX(), self.devicePixelRatioF())
+            image = self.cache.find_placeholder(self._doc_key, self._page, rotation)
+        
+        # 渲染结果背景透明, 先铺白底
+        painter.fillRect(rect, Qt.white)
+        if image is not None:
+            painter.drawImage(rect, image)
+        if tiled:
+            self._paintTiles(painter, rect, rotation, size, event.rect())
+        painter.end()
+    
+    def _paintTiles(self, painter, rect, rotation, size, exposed):
+        """在底图上绘制已渲染的清晰图块, 缺少的可见图块交给后台渲染"""
+        dpr = self.devicePixelRatioF()
+        transform = rotation_transform(rotation, size)
+        inverse, _ = transform.inverted()
+        
+        # 可见区域换算到未旋转页面的设备像素坐标
+        visible = QRectF(rect.intersected(exposed).translated(-rect.topLeft()))
+        area = inverse.mapRect(QRectF(visible.x() * dpr, visible.y() * dpr,
+                                      visible.width() * dpr, visible.height() * dpr))
+        for column, row in visible_tiles(area.toAlignedRect(), size):
+            tile = self.cache.get(tile_key(self._doc_key, self._page, self._zoom, rotation, column, row))
+            if tile is None:
+                self.renderer.request_tile(self._page, self._zoom, rotation, self.logicalDpiX(), dpr, column, row)
+                continue
+            target = transform.mapRect(QRectF(tile_rect(column, row, size)))
+            painter.drawImage(QRectF(rect.x() + target.x() / dpr, rect.y() + target.y() / dpr,
+                                     target.width() / dpr, target.height() / dpr), tile)
 
 class PdfViewer(QWidget):
-    def __init__(self, db):
+    ocr_requested = Signal(int, int)  # norm_id, 当前页码
+    
+    def __init__(self, db_executor):
         super().__init__()
-        self.db = db
+        # 数据库查询都提交给数据库线程, 结果到达后再更新界面
+        self.db_executor = db_executor
         self.current_norm = None
+        self._opening = None  # 正在读取的规范(norm_id, 页码, 开始时间), 用于丢弃过期的结果
+        self._loading = None  # 后台加载中的当前文档(路径, 开始时间)
+        self._restore_scroll = None
+        self._saved_views = {}  # 上次会话中尚未重新打开的文档: 路径 -> (页码, 缩放)
+        self.progress_journal = ProgressJournal(db_executor, self)
+        self.name_index = NameIndex()
+        self._name_index_stale = True
+        self._name_index_loading = False
+        self._name_index_generation = 0
         self.setup_ui()
         self.setup_shortcuts()
-        self.refresh_norms()
+        self.norm_model.fetchMore()
     
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -82,18 +323,36 @@ class PdfViewer(QWidget):
         # 搜索框
         self.search_box = QLineEdit()
         self.search_box.setPlaceholderText("搜索规范...")
-        self.search_box.textChanged.connect(self.search_norms)
         layout.addWidget(self.search_box)
         
+        # 输入停顿后再查询, 避免每次按键都重新过滤
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_norms)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        
         # 规范列表
-        self.norm_list = QListWidget()
-        self.norm_list.itemClicked.connect(self.load_norm)
+        self.norm_model = NormListModel(self.db_executor, self)
+        self.norm_list = QListView()
+        self.norm_list.setUniformItemSizes(True)
+        self.norm_list.setModel(self.norm_model)
+        self.norm_list.clicked.connect(self.load_norm)
         layout.addWidget(self.norm_list)
         
+        # 全文检索
+        self.fulltext_panel = FullTextSearchPanel(self.db_executor)
+        self.fulltext_panel.hit_activated.connect(self.open_norm)
+        layout.addWidget(self.fulltext_panel)
+        
         # PDF查看器
         self.pdf_view = DraggablePdfView()
-        self.pdf_doc = QPdfDocument()
-        self.pdf_view.setDocument(self.pdf_doc)
+        
+        # 最近打开的文档保持打开, 来回切换时不重新解析
+        self.document_pool = DocumentPool(on_evict=self.pdf_view.cache.discard_document)
+        # 有文档清单的文档在后台加载, 加载期间先按清单布局
+        self.document_loader = DocumentLoader(self)
+        self.document_loader.loaded.connect(self._on_document_loaded)
         
         # 工具栏
         self.toolbar = QToolBar()
@@ -123,12 +382,37 @@ class PdfViewer(QWidget):
         self.rotate_btn.clicked.connect(self.rotate_page)
         self.toolbar.addWidget(self.rotate_btn)
         
+        # 惯性滚动开关
+        self.kinetic_btn = QPushButton("惯性滚动")
+        self.kinetic_btn.setCheckable(True)
+        self.kinetic_btn.toggled.connect(self.pdf_view.setKineticScrolling)
+        self.toolbar.addWidget(self.kinetic_btn)
+        
         # OCR按钮
         self.ocr_btn = QPushButton("OCR识别")
         self.ocr_btn.clicked.connect(self.run_ocr)
         self.toolbar.addWidget(self.ocr_btn)
         
-        layout.addWidget(self.pdf_view)
+        # 目录(书签) + 缩略图导航栏 + 页面视图
+        view_layout = QHBoxLayout()
+        self.toc_tree = QTreeWidget()
+        self.toc_tree.setHeaderHidden(True)
+        self.toc_tree.setFixedWidth(220)
+        self.toc_tree.itemClicked.connect(self.open_outline_item)
+        self.toc_tree.hide()
+        view_layout.addWidget(self.toc_tree)
+        self.thumbnail_bar = ThumbnailSidebar(ThumbnailDiskCache(THUMBNAIL_CACHE_DIR))
+        self.thumbnail_bar.page_selected.connect(self.page_spin.setValue)
+        view_layout.addWidget(self.thumbnail_bar)
+        view_layout.addWidget(self.pdf_view, 1)
+        
+        # OCR文本层: 扫描版页面识别出的文本, 可选中复制
+        self.ocr_text_view = QPlainTextEdit()
+        self.ocr_text_view.setReadOnly(True)
+        self.ocr_text_view.setFixedWidth(280)
+        self.ocr_text_view.hide()
+        view_layout.addWidget(self.ocr_text_view)
+        layout.addLayout(view_layout, 1)
     
     def setup_shortcuts(self):
         """设置快捷键"""
@@ -174,57 +458,272 @@ class PdfViewer(QWidget):
             super().wheelEvent(event)
     
     def refresh_norms(self, category=None):
-        """刷新规范列表"""
-        self.norm_list.clear()
-        norms = self.db.get_norms(category)
-        for norm in norms:
-            self.norm_list.addItem(norm['name'])
+        """刷新规范列表, 列表模型按需分批读取数据库"""
+        self.norm_model.set_category(category)
+        # 名称索引在下次搜索时再同步, 不搜索就不必读出全部名称
+        self._name_index_stale = True
+        self._name_index_loading = False
+        self._name_index_generation += 1
+        self.refilter()
+    
+    def on_norms_changed(self, inserted, updated, deleted):
+        """数据库的变更通知: 增量更新列表和名称索引, 不重新读取整个列表"""
+        self.norm_model.apply_changes(inserted, updated, deleted)
+        if self._name_index_loading:
+            # 正在读取的名称不一定包含这些变更, 丢弃后重新读取
+            self._name_index_loading = False
+            self._name_index_generation += 1
+            self.search_norms()
+            return
+        if self._name_index_stale:
+            return
+        
+        for norm_id in deleted:
+            self.name_index.remove(norm_id)
+        changed = list(inserted) + list(updated)
+        if changed:
+            self.db_executor.submit('get_norm_entries', changed,
+                                    callback=partial(self._on_entries_changed, self._name_index_generation))
+        elif deleted:
+            self.refilter()
+    
+    def _on_entries_changed(self, generation, entries):
+        if generation != self._name_index_generation:
+            return
+        category = self.norm_model.category()
+        for norm_id, name, norm_category, _ in entries:
+            if category is None or norm_category == category:
+                self.name_index.add(norm_id, name)
+            else:
+                self.name_index.remove(norm_id)
+        self.refilter()
+    
+    def refilter(self):
+        """搜索框有内容时按当前的名称索引重新过滤"""
+        if self.search_box.text().strip():
+            self.search_norms()
     
     def search_norms(self):
-        """搜索规范"""
-        keyword = self.search_box.text().lower()
-        norms = self.db.get_norms()
-        self.norm_list.clear()
-        for norm in norms:
-            if keyword in norm['name'].lower():
-                self.norm_list.addItem(norm['name'])
-    
-    def load_norm(self, item):
+        """搜索规范(支持名称子串和拼音首字母)"""
+        keyword = self.search_box.text()
+        if not keyword.strip():
+            self.norm_model.clear_filter()
+            return
+        
+        if self._name_index_stale:
+            # 先由数据库线程读出全部名称, 到达后再检索当时的关键词
+            if not self._name_index_loading:
+                self._name_index_loading = True
+                self.db_executor.submit('get_norm_names', self.norm_model.category(),
+                                        callback=partial(self._on_names_loaded, self._name_index_generation),
+                                        errback=partial(self._on_names_failed, self._name_index_generation))
+            return
+        
+        with instrumentation.span('search.names', keyword):
+            self.norm_model.set_filter(self.name_index.search(keyword), self.name_index.name)
+    
+    def _on_names_loaded(self, generation, rows):
+        if generation != self._name_index_generation:
+            return
+        self.name_index.sync(rows)
+        self._name_index_stale = False
+        self._name_index_loading = False
+        self.search_norms()
+    
+    def _on_names_failed(self, generation, error):
+        if generation == self._name_index_generation:
+            # 索引仍为过期状态, 下次搜索时重新读取
+            self._name_index_loading = False
+        raise error
+    
+    def is_busy(self):
+        """是否还在等待数据库线程返回列表、名称索引或要打开的规范, 或者当前文档还在后台加载"""
+        return (self.norm_model.is_loading() or self._name_index_loading or self._opening is not None
+                or self._loading is not None)
+    
+    def load_norm(self, index):
         """加载选中的规范"""
-        norm_name = item.text()
-        norms = self.db.get_norms()
-        norm = next((n for n in norms if n['name'] == norm_name), None)
-        
-        if norm and os.path.exists(norm['path']):
-            self.current_norm = norm
-            
-            # 加载PDF文档
-            self.pdf_doc.close()
-            if self.pdf_doc.load(norm['path']):
-                # 更新页面导航
-                page_count = self.pdf_doc.pageCount()
-                self.page_spin.setMaximum(page_count)
-                self.total_pages_label.setText(f"/ {page_count}")
-                
-                # 恢复阅读进度和旋转
-                self.page_spin.setValue(norm['last_page'])
-                self.pdf_view.setPageRotation(norm['rotation'])
-                
-                # 跳转到保存的页面
-                self.go_to_page(norm['last_page'])
-            else:
+        self.open_norm(index.data(NORM_ID_ROLE))
+    
+    def open_norm(self, norm_id, page=None):
+        """按id加载规范, page为空时恢复上次的阅读进度
+        
+        规范记录、各页旋转和文档清单由数据库线程读取, 到达后再打开文档; 期间又打开了其他规范时丢弃结果。
+        """
+        if self.current_norm and self.current_norm['id'] == norm_id and page:
+            # 已打开的文档只需翻页
+            self.page_spin.setValue(page)
+            return
+        
+        # 切换文档前先提交上一个文档的进度, 与下面的查询同为INTERACTIVE优先级, 保证读到的是最新状态
+        self.progress_journal.flush()
+        opening = self._opening = (norm_id, page, time.perf_counter())
+        self.db_executor.submit('get_norm', norm_id, callback=partial(self._on_norm_loaded, opening),
+                                errback=partial(self._on_open_failed, opening))
+    
+    def _on_norm_loaded(self, opening, norm):
+        if opening is not self._opening:
+            return
+        if not norm or not os.path.exists(norm['path']):
+            self._opening = None
+            return
+        # 同一优先级按提交顺序执行, 清单到达时旋转已经读出
+        rotations = self.db_executor.submit('get_page_rotations', norm['id'])
+        self.db_executor.submit('get_document_manifest', norm['id'],
+                                callback=partial(self._show_norm, opening, norm, rotations),
+                                errback=partial(self._on_open_failed, opening))
+    
+    def _on_open_failed(self, opening, error):
+        if opening is not self._opening:
+            return
+        self._opening = None
+        QMessageBox.warning(self, "错误", f"无法读取规范: {error}")
+    
+    def _show_norm(self, opening, norm, rotations, manifest):
+        if opening is not self._opening:
+            return
+        if rotations.exception() is not None:
+            self._on_open_failed(opening, rotations.exception())
+            return
+        self._opening = None
+        _, page, started = opening
+        rotations = rotations.result()
+        path = norm['path']
+        
+        # 清单与文件一致时按清单布局, 文档在后台加载; 池中的文档直接取出;
+        # 其余(尚未生成清单或文件已变化)只能先加载文档
+        if manifest is not None and not (manifest['page_count'] and manifest_is_current(manifest, path)):
+            manifest = None
+        if manifest is not None and path not in self.document_pool:
+            entry = None
+        else:
+            entry = self.document_pool.acquire(path)
+            if entry is None:
                 QMessageBox.warning(self, "错误", "无法加载PDF文档")
+                return
+        
+        self.save_view_state()
+        self.current_norm = norm
+        document = entry.document if entry is not None else None
+        page_sizes = [QSizeF(*size) for size in manifest['page_sizes']] if manifest is not None else None
+        self.pdf_view.setDocument(document, path, page_sizes)
+        if entry is None:
+            self._loading = (path, started)
+            self.document_loader.load(path)
+        else:
+            self._loading = None
+            self.document_pool.trim()
+        
+        # 更新页面导航和目录
+        page_count = self.pdf_view.pageCount()
+        self.page_spin.setMaximum(page_count)
+        self.total_pages_label.setText(f"/ {page_count}")
+        self.thumbnail_bar.set_document(path, page_count)
+        self.show_outline(manifest['outline'] if manifest is not None else read_outline(document))
+        
+        # 恢复各页旋转、阅读进度和缩放, 池中文档以离开时的状态为准
+        self.pdf_view.setPageRotations({page - 1: rotation for page, rotation in rotations.items()},
+                                       norm['rotation'])
+        saved_page, saved_zoom = self._saved_views.pop(path, (None, None))
+        if entry is not None and entry.zoom is not None:
+            saved_page, saved_zoom = entry.page, entry.zoom
+        if saved_zoom is not None:
+            self.pdf_view.setZoomFactor(saved_zoom)
+        last_page = page or saved_page or norm['last_page']
+        self.page_spin.setValue(last_page)
+        
+        # 跳转到保存的页面
+        self.go_to_page(last_page)
+        instrumentation.record('viewer.open_norm', (time.perf_counter() - started) * 1000, norm['name'])
+        
+        if self._restore_scroll is not None:
+            # 视图布局完成后滚动条范围才正确, 推迟恢复滚动位置
+            horizontal, vertical = self._restore_scroll
+            self._restore_scroll = None
+            QTimer.singleShot(0, lambda: self.scroll_to(horizontal, vertical))
+    
+    def _on_document_loaded(self, path, document):
+        """后台加载的文档到达; 期间已切换到其他文档时关闭"""
+        if self._loading is None or path != self._loading[0]:
+            if document is not None:
+                document.close()
+                document.deleteLater()
+            return
+        _, started = self._loading
+        self._loading = None
+        if document is None:
+            QMessageBox.warning(self, "错误", "无法加载PDF文档")
+            return
+        
+        self.document_pool.add(path, document)
+        self.pdf_view.attachDocument(document)
+        self.document_pool.trim()
+        instrumentation.record('viewer.document_ready', (time.perf_counter() - started) * 1000, path)
+    
+    def show_outline(self, outline):
+        """显示文档的书签目录, outline为[(标题, 页码(从0开始), 子项列表), ...]; 没有书签时隐藏"""
+        self.toc_tree.clear()
+        
+        def add_items(parent, items):
+            for title, page, children in items:
+                item = QTreeWidgetItem(parent, [title])
+                item.setData(0, Qt.UserRole, page)
+                add_items(item, children)
+        
+        add_items(self.toc_tree, outline)
+        self.toc_tree.setVisible(bool(outline))
+    
+    def open_outline_item(self, item):
+        """跳转到书签所在页, 文档还在加载时同样可用"""
+        page = item.data(0, Qt.UserRole)
+        if page is not None and page >= 0:
+            self.page_spin.setValue(page + 1)
+    
+    def session_state(self):
+        """打开的文档(最久未使用的在前)及其页码和缩放, 以及当前文档的滚动位置; 没有打开文档时返回None"""
+        if not self.current_norm:
+            return None
+        self.save_view_state()
+        documents = [{'path': path, 'page': page, 'zoom': zoom}
+                     for path, (page, zoom) in self._saved_views.items() if path not in self.document_pool]
+        documents += [{'path': entry.path, 'page': entry.page, 'zoom': entry.zoom}
+                      for entry in self.document_pool.entries() if entry.page is not None]
+        return {
+            'current': self.current_norm['id'],
+            'documents': documents,
+            'scroll': [self.pdf_view.horizontalScrollBar().value(),
+                       self.pdf_view.verticalScrollBar().value()],
+        }
+    
+    def restore_session(self, state):
+        """恢复session_state()保存的会话: 只立即打开当前文档
+        
+        其余文档记下页码和缩放, 第一次切换过去时再加载并恢复, 启动时不逐个解析PDF。
+        """
+        self._saved_views = {document['path']: (document['page'], document['zoom'])
+                             for document in state.get('documents', [])}
+        # 当前文档打开后再恢复滚动位置
+        self._restore_scroll = state.get('scroll', (0, 0))
+        self.open_norm(state['current'])
+    
+    def scroll_to(self, horizontal, vertical):
+        self.pdf_view.horizontalScrollBar().setValue(horizontal)
+        self.pdf_view.verticalScrollBar().setValue(vertical)
+    
+    def save_view_state(self):
+        """记下当前文档的页码和缩放, 切换回来时恢复"""
+        entry = self.document_pool.peek(self.current_norm['path']) if self.current_norm else None
+        if entry is not None:
+            entry.save_view(self.page_spin.value(), self.pdf_view.zoomFactor())
     
     def go_to_page(self, page):
         """跳转到指定页面"""
-        if 1 <= page <= self.pdf_doc.pageCount():
-            self.pdf_view.pageNavigator().jump(page - 1, QPointF(0, 0))
+        if 1 <= page <= self.pdf_view.pageCount():
+            self.pdf_view.setPage(page - 1)
+            self.thumbnail_bar.set_current_page(page)
+            self.show_ocr_text()
             if self.current_norm:
-                self.db.update_norm_progress(
-                    self.current_norm['id'], 
-                    page, 
-                    self.pdf_view._rotation
-                )
+                self.progress_journal.record(self.current_norm['id'], page)
     
     def prev_page(self):
         """上一页"""
@@ -235,7 +734,7 @@ class PdfViewer(QWidget):
     def next_page(self):
         """下一页"""
         current = self.page_spin.value()
-        if current < self.pdf_doc.pageCount():
+        if current < self.pdf_view.pageCount():
             self.page_spin.setValue(current + 1)
     
     def zoom_in(self):
@@ -253,20 +752,39 @@ class PdfViewer(QWidget):
         if not self.current_norm:
             return
         
-        current_rotation = self.pdf_view._rotation
-        new_rotation = (current_rotation + 90) % 360
+        new_rotation = (self.pdf_view.pageRotation() + 90) % 360
         self.pdf_view.setPageRotation(new_rotation)
         
-        # 更新数据库中的旋转状态
-        self.db.update_norm_progress(
-            self.current_norm['id'],
-            self.page_spin.value(),
-            new_rotation
-        )
+        # 只旋转当前页, 旋转状态按页保存; 与读取旋转的查询同为INTERACTIVE优先级, 按提交顺序执行
+        self.db_executor.submit('set_page_rotation', self.current_norm['id'], self.page_spin.value(),
+                                new_rotation)
+    
+    def render_cache_stats(self):
+        """页面渲染缓存的命中率和内存占用"""
+        return self.pdf_view.cache.stats()
     
     def run_ocr(self):
-        """执行OCR识别"""
-        QMessageBox.information(self, "OCR", "OCR功能需要额外安装依赖库如pytesseract")
-        # 实际实现需要安装:
-        # pip install pytesseract pillow
-        # 并下载Tesseract OCR引擎
\ No newline at end of file
+        """对当前规范执行OCR识别, 从当前页开始"""
+        if self.current_norm:
+            self.ocr_requested.emit(self.current_norm['id'], self.page_spin.value())
+    
+    def show_ocr_text(self):
+        """显示当前页的OCR文本, 未识别的页面隐藏文本层"""
+        if not self.current_norm:
+            self.ocr_text_view.hide()
+            return
+        location = (self.current_norm['id'], self.page_spin.value())
+        self.db_executor.submit('get_ocr_text', *location, callback=partial(self._on_ocr_text, location))
+    
+    def _on_ocr_text(self, location, text):
+        # 文本到达前已经翻到其他页时丢弃
+        if not self.current_norm or location != (self.current_norm['id'], self.page_spin.value()):
+            return
+        if text:
+            self.ocr_text_view.setPlainText(text)
+        self.ocr_text_view.setVisible(bool(text))
+    
+    def on_ocr_page_done(self, norm_id, page):
+        """后台OCR完成一页"""
+        if self.current_norm and self.current_norm['id'] == norm_id and self.page_spin.value() == page:
+            self.show_ocr_text()
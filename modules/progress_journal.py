@@ -0,0 +1,41 @@
+from PySide6.QtCore import QObject, QTimer
+from modules.db_executor import INTERACTIVE
+
+class ProgressJournal(QObject):
+    """阅读进度的延迟写入日志
+    
+    翻页时只在内存中记录每个规范的最新进度, 同一norm_id的多次更新会合并为一条,
+    由定时器、切换文档和程序退出时交给数据库线程批量写入。
+    """
+    def __init__(self, db_executor, parent=None, interval_ms=2000):
+        super().__init__(parent)
+        self.db_executor = db_executor
+        self._pending = {}  # norm_id -> 页码
+        
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+    
+    def record(self, norm_id, page):
+        """记录进度, 只保留每个规范的最新页码"""
+        self._pending[norm_id] = page
+        if not self._timer.isActive():
+            self._timer.start()
+    
+    def pending_count(self):
+        return len(self._pending)
+    
+    def flush(self):
+        """把积压的进度一次性提交给数据库线程, 返回Future(没有积压时返回None)
+        
+        写入只有一条批量UPDATE, 使用INTERACTIVE优先级: 定时器提交的写入如果排在
+        后台请求之后, 随后打开文档时的INTERACTIVE查询会先执行并读到旧进度。
+        """
+        self._timer.stop()
+        if not self._pending:
+            return None
+        
+        updates = [(page, norm_id) for norm_id, page in self._pending.items()]
+        self._pending.clear()
+        return self.db_executor.submit('update_norms_last_page', updates, priority=INTERACTIVE)
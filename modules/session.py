@@ -0,0 +1,55 @@
+import json
+import os
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPixmap
+
+# 会话快照目录
+SESSION_DIR = os.path.join("user_files", ".session")
+
+# 页面显示区域的截图按此比例缩小后以JPEG保存, 启动时拉伸显示, 只用于文档加载完成前的第一帧
+SNAPSHOT_SCALE = 0.5
+SNAPSHOT_QUALITY = 70
+
+class SessionStore:
+    """上次会话的状态(当前标签页、打开的文档及其页码/缩放)和页面显示区域的截图
+    
+    状态以JSON保存在设置的session/state中, 截图保存在SESSION_DIR下。
+    """
+    def __init__(self, settings, directory=SESSION_DIR):
+        self.settings = settings
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "snapshot.jpg")
+    
+    def load(self):
+        """读取上次保存的状态, 没有或无法解析时返回None"""
+        text = self.settings.get("session/state")
+        if not text:
+            return None
+        try:
+            state = json.loads(text)
+        except (TypeError, ValueError):
+            return None
+        return state if isinstance(state, dict) else None
+    
+    def save(self, state, snapshot=None):
+        """保存状态; snapshot为页面显示区域的截图(QPixmap), 为None时删除旧截图"""
+        self.settings.set("session/state", json.dumps(state, ensure_ascii=False))
+        if snapshot is None or snapshot.isNull():
+            self._remove_snapshot()
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        small = snapshot.scaled(snapshot.size() * SNAPSHOT_SCALE, Qt.IgnoreAspectRatio,
+                                Qt.SmoothTransformation)
+        if not small.save(self.snapshot_path, "JPG", SNAPSHOT_QUALITY):
+            self._remove_snapshot()
+    
+    def snapshot(self):
+        """上次保存的截图, 不存在时返回None"""
+        pixmap = QPixmap(self.snapshot_path)
+        return None if pixmap.isNull() else pixmap
+    
+    def _remove_snapshot(self):
+        try:
+            os.remove(self.snapshot_path)
+        except OSError:
+            pass
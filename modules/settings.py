@@ -7,6 +7,13 @@ class SettingsManager:
     def get(self, key, default=None):
         return self.settings.value(key, default)
     
+    def get_bool(self, key, default=False):
+        # ini格式下布尔值保存为字符串"true"/"false"
+        value = self.get(key, default)
+        if isinstance(value, str):
+            return value.lower() == 'true'
+        return bool(value)
+    
     def set(self, key, value):
         self.settings.setValue(key, value)
     
@@ -0,0 +1,41 @@
+import time
+from PySide6.QtCore import QObject, QEvent
+
+class StartupProfiler(QObject):
+    """启动耗时分析: 记录各阶段耗时, 主窗口第一次绘制后回调
+    
+    阶段耗时为相邻两次mark之间的时间, 第一阶段从start(通常是进程开始导入模块时)算起。
+    """
+    def __init__(self, start=None, parent=None):
+        super().__init__(parent)
+        self.start = start if start is not None else time.perf_counter()
+        self._last = self.start
+        self.phases = []  # (阶段名称, 耗时秒)
+        self._on_first_paint = None
+    
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+    
+    def watch_first_paint(self, widget, callback):
+        """widget第一次收到绘制事件时记录"首次绘制"阶段并调用callback"""
+        self._on_first_paint = callback
+        widget.installEventFilter(self)
+    
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self._on_first_paint is not None:
+            obj.removeEventFilter(self)
+            self.mark("首次绘制")
+            callback, self._on_first_paint = self._on_first_paint, None
+            callback()
+        return False
+    
+    def report(self):
+        """文本报告, 每行依次为阶段耗时、累计耗时和阶段名称"""
+        lines = []
+        total = 0.0
+        for phase, seconds in self.phases:
+            total += seconds
+            lines.append(f"{seconds * 1000:>8.1f} ms {total * 1000:>8.1f} ms  {phase}")
+        return "\n".join(lines)
@@ -0,0 +1,243 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from PySide6.QtWidgets import QListView, QAbstractItemView
+from PySide6.QtCore import Qt, QThread, Signal, QSize, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QImage, QColor, QPainter
+from PySide6.QtPdf import QPdfDocument
+
+# 缩略图宽度(像素), 高度按页面比例
+THUMBNAIL_WIDTH = 96
+
+# 磁盘缓存默认上限, 超出后按最近使用时间淘汰到90%
+DEFAULT_DISK_CACHE_BYTES = 200 * 1024 * 1024
+
+# 内存中保留的缩略图数量
+MEMORY_THUMBNAILS = 400
+
+# 待生成队列长度上限, 快速滚动时丢弃已经滚出视野的旧请求
+MAX_PENDING_REQUESTS = 64
+
+def file_identity(path):
+    """文件标识: 路径 + 大小 + 修改时间, 文件变化后缩略图自动失效"""
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+class ThumbnailDiskCache:
+    """缩略图磁盘缓存, 文件保存为 root/<文件标识>/<宽度>_<页码>.png"""
+    def __init__(self, root, max_bytes=DEFAULT_DISK_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._total_bytes = None  # 第一次写入时(在缩略图线程中)再统计, 启动时不遍历缓存目录
+    
+    def path_for(self, file_key, page, width):
+        return os.path.join(self.root, file_key, f"{width}_{page}.png")
+    
+    def load(self, file_key, page, width):
+        """读取缓存的缩略图, 不存在时返回None"""
+        path = self.path_for(file_key, page, width)
+        image = QImage(path)
+        if image.isNull():
+            return None
+        try:
+            # 更新访问时间, 作为淘汰依据
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+    
+    def store(self, file_key, page, width, image):
+        path = self.path_for(file_key, page, width)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not image.save(path, "PNG"):
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._entries())
+            else:
+                self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _entries(self):
+        """所有缓存文件的(修改时间, 路径, 大小)"""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+    
+    def _evict(self):
+        """删除最久未使用的缩略图, 直到总大小降到上限的90%"""
+        target = self.max_bytes * 0.9
+        for _, path, size in sorted(self._entries()):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError:
+                continue
+        for dirpath, dirnames, filenames in os.walk(self.root, topdown=False):
+            if dirpath != self.root and not dirnames and not filenames:
+                os.rmdir(dirpath)
+
+class ThumbnailWorker(QThread):
+    """缩略图生成线程: 优先读磁盘缓存, 未命中时用独立的QPdfDocument渲染"""
+    thumbnail_ready = Signal(str, int, QImage)  # 文件标识, 页码(从0开始), 图像
+    
+    def __init__(self, disk_cache, parent=None):
+        super().__init__(parent)
+        self.disk_cache = disk_cache
+        self._condition = threading.Condition()
+        self._requests = OrderedDict()  # (文件标识, 页码) -> 文件路径
+        self._stopping = False
+    
+    def request(self, path, file_key, page):
+        with self._condition:
+            key = (file_key, page)
+            # 重复请求移到队尾, 队尾的请求最先处理(最近滚动到的行)
+            self._requests.pop(key, None)
+            self._requests[key] = path
+            while len(self._requests) > MAX_PENDING_REQUESTS:
+                self._requests.popitem(last=False)
+            self._condition.notify()
+    
+    def clear(self):
+        with self._condition:
+            self._requests.clear()
+    
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self.wait()
+    
+    def run(self):
+        document = QPdfDocument()
+        loaded_path = None
+        while True:
+            with self._condition:
+                while not self._requests and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    break
+                (file_key, page), path = self._requests.popitem(last=True)
+            
+            image = self.disk_cache.load(file_key, page, THUMBNAIL_WIDTH)
+            if image is None:
+                if path != loaded_path:
+                    document.close()
+                    loaded_path = path if document.load(path) == QPdfDocument.Error.None_ else None
+                if loaded_path is None or page >= document.pageCount():
+                    continue
+                size = document.pagePointSize(page)
+                height = max(1, round(THUMBNAIL_WIDTH * size.height() / max(size.width(), 1)))
+                image = document.render(page, QSize(THUMBNAIL_WIDTH, height))
+                if image.isNull():
+                    continue
+                # 渲染结果背景透明, 合成到白底上再保存
+                image = self._on_white(image)
+                self.disk_cache.store(file_key, page, THUMBNAIL_WIDTH, image)
+            self.thumbnail_ready.emit(file_key, page, image)
+        document.close()
+    
+    @staticmethod
+    def _on_white(image):
+        result = QImage(image.size(), QImage.Format_RGB32)
+        result.fill(QColor(Qt.white))
+        painter = QPainter(result)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        return result
+
+class ThumbnailModel(QAbstractListModel):
+    """页面缩略图模型: 只有视图请求图标(即可见的行)时才生成缩略图"""
+    def __init__(self, worker, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.worker.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self._path = None
+        self._file_key = None
+        self._page_count = 0
+        self._images = OrderedDict()  # 页码 -> QImage
+    
+    def set_document(self, path, page_count):
+        self.beginResetModel()
+        self.worker.clear()
+        self._path = path
+        self._file_key = file_identity(path) if path else None
+        self._page_count = page_count
+        self._images.clear()
+        self.endResetModel()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._page_count
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        page = index.row()
+        if role == Qt.DisplayRole:
+            return str(page + 1)
+        if role == Qt.DecorationRole:
+            image = self._images.get(page)
+            if image is None:
+                self.worker.request(self._path, self._file_key, page)
+                return None
+            self._images.move_to_end(page)
+            return image
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+    
+    def _on_thumbnail_ready(self, file_key, page, image):
+        if file_key != self._file_key or page >= self._page_count:
+            return
+        self._images[page] = image
+        while len(self._images) > MEMORY_THUMBNAILS:
+            self._images.popitem(last=False)
+        index = self.index(page)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+class ThumbnailSidebar(QListView):
+    """页面缩略图导航栏"""
+    page_selected = Signal(int)  # 页码(从1开始)
+    
+    def __init__(self, disk_cache, parent=None):
+        super().__init__(parent)
+        self.worker = ThumbnailWorker(disk_cache, self)
+        self.thumbnail_model = ThumbnailModel(self.worker, self)
+        self.setModel(self.thumbnail_model)
+        
+        # 统一行高: 视图只需为可见行取数据, 不会遍历全部页面
+        self.setUniformItemSizes(True)
+        self.setIconSize(QSize(THUMBNAIL_WIDTH, round(THUMBNAIL_WIDTH * 1.42)))
+        self.setViewMode(QListView.ListMode)
+        self.setFlow(QListView.TopToBottom)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setFixedWidth(THUMBNAIL_WIDTH + 70)
+        self.clicked.connect(lambda index: self.page_selected.emit(index.row() + 1))
+        self.worker.start(QThread.LowPriority)
+    
+    def set_document(self, path, page_count):
+        self.thumbnail_model.set_document(path, page_count)
+    
+    def set_current_page(self, page):
+        """同步当前页(从1开始), 不触发page_selected"""
+        index = self.thumbnail_model.index(page - 1)
+        if index.isValid():
+            self.setCurrentIndex(index)
+            self.scrollTo(index)
+    
+    def shutdown(self):
+        self.worker.stop()
@@ -0,0 +1,69 @@
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import tempfile
+import unittest
+from unittest import mock
+from PySide6.QtGui import QGuiApplication
+from modules.database import NormDatabase
+from modules.folder_sync import FolderSync
+
+class FolderSyncTest(unittest.TestCase):
+    """文件夹同步: 未能完整扫描的目录下的规范不能被当作已删除"""
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QGuiApplication.instance() or QGuiApplication([])
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, 'norms')
+        self.db = NormDatabase(os.path.join(self.tmp.name, 'norms.db'))
+        self.sync = FolderSync(self.db, [self.folder])
+        self.paths = [self.write('GB 50010.pdf'), self.write('sub', 'GB 50011.pdf'),
+                      self.write('sub', 'deep', 'GB 50017.pdf'), self.write('.hidden', 'GB 50009.pdf')]
+    
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+    
+    def write(self, *parts):
+        path = os.path.join(self.folder, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4 ' + path.encode())
+        return path
+    
+    def known_paths(self):
+        return {row[1] for row in self.db.get_files_under(self.folder)}
+    
+    def test_unreadable_subdirectory_keeps_its_norms(self):
+        summary = self.sync.sync_folder(self.folder)
+        self.assertEqual(summary['added'], 3)
+        # 隐藏目录下的文件不导入, 但已在库中时不能被删除
+        hidden = self.paths[3]
+        self.db.apply_file_changes(added=[(os.path.basename(hidden), hidden, 'hidden', 1, 1.0)])
+        before = self.known_paths()
+        self.assertEqual(before, set(self.paths))
+        
+        unreadable = os.path.join(self.folder, 'sub')
+        scandir = os.scandir
+        
+        def flaky_scandir(path):
+            if path == unreadable:
+                raise PermissionError(13, 'Permission denied', path)
+            return scandir(path)
+        
+        with mock.patch('modules.dir_scanner.os.scandir', flaky_scandir):
+            summary = self.sync.sync_folder(self.folder)
+        self.assertEqual(summary['removed'], 0)
+        self.assertEqual(self.known_paths(), before)
+    
+    def test_deleted_file_is_removed(self):
+        self.sync.sync_folder(self.folder)
+        os.remove(self.paths[2])
+        summary = self.sync.sync_folder(self.folder)
+        self.assertEqual(summary['removed'], 1)
+        self.assertEqual(self.known_paths(), set(self.paths[:2]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import tempfile
+import unittest
+from unittest import mock
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QGuiApplication, QPainter, QPdfWriter, QPageSize
+from modules.database import NormDatabase
+from modules.ocr import OcrService
+
+PAGES = 3
+
+def write_pdf(path, pages):
+    writer = QPdfWriter(path)
+    writer.setPageSize(QPageSize(QPageSize.A4))
+    painter = QPainter(writer)
+    for page in range(pages):
+        if page:
+            writer.newPage()
+        painter.drawText(QPointF(100, 100), f"第{page + 1}页")
+    painter.end()
+
+class OcrServiceTest(unittest.TestCase):
+    """用StubEngine执行一轮OCR: 结果写入ocr_pages和ocr_page_text, 已识别的页面不再入队"""
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QGuiApplication.instance() or QGuiApplication([])
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = NormDatabase(os.path.join(self.tmp.name, 'norms.db'))
+        path = os.path.join(self.tmp.name, 'GB 50010.pdf')
+        write_pdf(path, PAGES)
+        self.db.add_norm('GB 50010.pdf', path)
+        self.norm_id = self.db.get_norm_names(None)[0][0]
+        self.service = OcrService(self.db, 'stub', workers=1)
+        self.queued = []
+        self.service.norm_queued.connect(lambda norm_id, queued: self.queued.append(queued))
+    
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+    
+    def run_once(self):
+        # 不启动线程, 直接在当前线程中处理一轮
+        with mock.patch.object(self.service, 'request_update'):
+            self.service.enqueue_norm(self.norm_id)
+        self.service.process()
+    
+    def count(self, table):
+        return self.db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    
+    def test_process_with_stub_engine(self):
+        self.run_once()
+        self.assertEqual(self.queued, [PAGES])
+        self.assertEqual(self.count('ocr_pages'), PAGES)
+        self.assertEqual(self.count('ocr_page_text'), PAGES)
+        self.assertEqual(self.db.count_ocr_jobs(), 0)
+        self.assertTrue(self.db.get_ocr_text(self.norm_id, 1).startswith('stub ocr'))
+        
+        self.run_once()
+        self.assertEqual(self.queued, [PAGES, 0])
+        self.assertEqual(self.count('ocr_pages'), PAGES)
+
+if __name__ == '__main__':
+    unittest.main()